@@ -55,6 +55,7 @@ from .interp import (
     interp_cubic_spline,
     interp_spacing,
     interp_time,
+    interp_time_batch,
 )
 
 from .network_graph import graph
@@ -82,6 +83,7 @@ from .denoising_encoder import (
 
 from .weather.data_store import WeatherDataStore
 from .discretize.h3 import Discretizer
+from .discretize.aggregate import CellAggregator
 
 LOGLEVEL = os.environ.get("LOGLEVEL", "INFO")
 logging.basicConfig(format="%(message)s", level=LOGLEVEL, datefmt="%Y-%m-%d %I:%M:%S")
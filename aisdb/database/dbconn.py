@@ -196,6 +196,34 @@ class SQLiteDBConn(_DBConn, sqlite3.Connection):
 
             self.commit()
 
+    def add_h3_column(self, month):
+        """add column ``h3`` for precomputed H3 cell indexes to the position
+        reports table of the given month, if it does not already exist
+
+        args:
+            month (str)
+                string with format YYYYmm
+        """
+        month = _validate_month(month)
+        cur = self.cursor()
+        cur.execute(f"SELECT name FROM pragma_table_info('ais_{month}_dynamic')")
+        if "h3" not in (row["name"] for row in cur.fetchall()):
+            cur.execute(f"ALTER TABLE ais_{month}_dynamic ADD COLUMN h3 INTEGER")
+        cur.close()
+
+    def create_h3_index(self, month, verbose=True):
+        """index column ``h3`` of the position reports table of the given
+        month. see :meth:`add_h3_column`
+        """
+        month = _validate_month(month)
+        if verbose:
+            print(f"indexing h3 cells of {month}...")
+        self.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{month}_dynamic_h3 "
+            f"ON ais_{month}_dynamic (h3)"
+        )
+        self.commit()
+
 
 # default to local SQLite database
 DBConn = SQLiteDBConn
@@ -401,6 +429,36 @@ class PostgresDBConn(_DBConn, psycopg.Connection):
             )
         dbconn.commit()
 
+    def add_h3_column(self, month):
+        """add column ``h3`` for precomputed H3 cell indexes to the position
+        reports table of the given month, if it does not already exist
+
+        args:
+            month (str)
+                string with format YYYYmm
+        """
+        month = _validate_month(month)
+        self.conn.execute(
+            psycopg.sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS h3 BIGINT").format(
+                psycopg.sql.Identifier(f"ais_{month}_dynamic")
+            )
+        )
+
+    def create_h3_index(self, month, verbose=True):
+        """index column ``h3`` of the position reports table of the given
+        month. see :meth:`add_h3_column`
+        """
+        month = _validate_month(month)
+        if verbose:
+            print(f"indexing h3 cells of {month}...")
+        self.conn.execute(
+            psycopg.sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} (h3)").format(
+                psycopg.sql.Identifier(f"idx_{month}_dynamic_h3"),
+                psycopg.sql.Identifier(f"ais_{month}_dynamic"),
+            )
+        )
+        self.conn.commit()
+
     def deduplicate_dynamic_msgs(self, month: str, verbose=True):
         month = _validate_month(month)
         dbconn = self.conn
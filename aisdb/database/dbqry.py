@@ -184,29 +184,13 @@ class DBQuery(UserDict):
         if len(cur.fetchall()) == 0:  # pragma: no cover
             warnings.warn(f"No data for selected time range! {rng_string}")
 
-    def gen_qry(
-        self, fcn=sqlfcn.crawl_dynamic, reaggregate_static=False, verbose=False
-    ):
-        """queries the database using the supplied SQL function.
+    def _prepare_tables(self, reaggregate_static=False, verbose=False):
+        """check that the queried months overlap the database, and create
+        any missing aggregate or dynamic tables for them.
 
-        args:
-            self (UserDict)
-                Dictionary containing keyword arguments
-            fcn (function)
-                Callback function that will generate SQL code using
-                the args stored in self
-            reaggregate_static (bool)
-                If True, the metadata aggregate tables will be regenerated
-                from
-            verbose (bool)
-                Log info to stdout
-
-        yields:
-            numpy array of rows for each unique MMSI
-            arrays are sorted by MMSI
-            rows are sorted by time
+        returns:
+            False if the query can be skipped, otherwise True
         """
-
         # initialize dbconn, run query
         assert "dbpath" not in self.data.keys()
         db_rng = self.dbconn.db_daterange
@@ -214,15 +198,15 @@ class DBQuery(UserDict):
         if not self.dbconn.db_daterange:
             if verbose:
                 print("skipping query (empty database)...")
-            return
+            return False
         elif self["start"].date() > db_rng["end"]:
             if verbose:
                 print("skipping query (out of timerange)...")
-            return
+            return False
         elif self["end"].date() < db_rng["start"]:
             if verbose:
                 print("skipping query (out of timerange)...")
-            return
+            return False
 
         assert isinstance(db_rng["start"], date)
         assert isinstance(db_rng["end"], date)
@@ -251,7 +235,35 @@ class DBQuery(UserDict):
                 )
             else:
                 assert False
+        return True
+
+    def gen_qry(
+        self, fcn=sqlfcn.crawl_dynamic, reaggregate_static=False, verbose=False
+    ):
+        """queries the database using the supplied SQL function.
 
+        args:
+            self (UserDict)
+                Dictionary containing keyword arguments
+            fcn (function)
+                Callback function that will generate SQL code using
+                the args stored in self
+            reaggregate_static (bool)
+                If True, the metadata aggregate tables will be regenerated
+                from
+            verbose (bool)
+                Log info to stdout
+
+        yields:
+            numpy array of rows for each unique MMSI
+            arrays are sorted by MMSI
+            rows are sorted by time
+        """
+
+        if not self._prepare_tables(reaggregate_static, verbose):
+            return
+
+        cur = self.dbconn.cursor()
         qry = fcn(**self.data)
 
         if "limit" in self.data.keys():
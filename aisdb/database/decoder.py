@@ -164,6 +164,7 @@ def decode_msgs(
     raw_insertion=True,
     verbose=True,
     timescaledb=False,
+    h3_resolution=None,
 ):
     """
     Decode messages from filepaths and insert them into a database.
@@ -178,6 +179,10 @@ def decode_msgs(
     :param raw_insertion: whether to insert messages without indexing them (default is True)
     :param verbose: whether to print verbose output (default is True)
     :param timescaledb: whether to insert data to a database with timescale extension (default is False)
+    :param h3_resolution: if given, the H3 cell of each position at this resolution is stored in an indexed
+        column ``h3`` of the position reports tables, for use with
+        :func:`aisdb.database.sqlfcn_callbacks.in_timerange_h3`. Positions with missing or "not available"
+        coordinates are stored with a NULL cell (default is None)
     :return: None
     """
     if not isinstance(dbconn, (SQLiteDBConn, PostgresDBConn)):  # pragma: no cover
@@ -295,6 +300,8 @@ def decode_msgs(
         for month in months:
             dbconn.execute(create_dynamic_table_stmt.format(month))
             dbconn.execute(create_static_table_stmt.format(month))
+            if h3_resolution is not None:
+                dbconn.add_h3_column(month)
             if not raw_insertion:
                 dbconn.drop_indexes(month, verbose, timescaledb)
 
@@ -308,6 +315,7 @@ def decode_msgs(
             workers=workers,
             type_preference=type_preference,
             allow_swap=False,
+            h3_resolution=h3_resolution,
         )
 
     elif isinstance(dbconn, SQLiteDBConn):
@@ -315,6 +323,8 @@ def decode_msgs(
             create_table_stmt = f.read()
         for month in months:
             dbconn.execute(create_table_stmt.format(month))
+            if h3_resolution is not None:
+                dbconn.add_h3_column(month)
         completed_files = decoder(
             dbpath=dbconn.dbpath,
             psql_conn_string="",
@@ -324,6 +334,7 @@ def decode_msgs(
             workers=workers,
             type_preference=type_preference,
             allow_swap=False,
+            h3_resolution=h3_resolution,
         )
     else:
         assert False
@@ -351,6 +362,10 @@ def decode_msgs(
     except OSError as err:
         print(f"Error cleaning temporary files: {err}")
 
+    if h3_resolution is not None:
+        for month in months:
+            dbconn.create_h3_index(month, verbose)
+
     if isinstance(dbconn, PostgresDBConn):
         if not raw_insertion:
             for month in months:
@@ -1,5 +1,8 @@
 import warnings
 
+import numpy as np
+
+from aisdb.discretize.aggregate import cell_to_children_range
 from aisdb.gis import dt_2_epoch, shiftcoord
 
 
@@ -113,3 +116,86 @@ def valid_mmsi(*, alias="m123", **_):
     """
     return f"""{alias}.mmsi >= 201000000 AND
     {alias}.mmsi < 776000000 """
+
+
+def in_mmsi_shard(*, alias, shard, shards, **_):
+    """SQL callback selecting vessel identifiers assigned to a shard, for
+    partitioning a query between multiple processes. vessels are assigned
+    to shards by the remainder of mmsi divided by the number of shards
+
+    args:
+        alias (string)
+            the 'alias' in a 'WITH tablename AS alias ...' SQL statement
+        shard (int)
+            index of the selected shard, in range(shards)
+        shards (int)
+            total number of shards
+
+    returns:
+        SQL code (string)
+    """
+    return f"""({alias}.mmsi % {int(shards)}) = {int(shard)}"""
+
+
+def in_h3_cells(*, alias, h3_resolution, cells=None, polygon=None, **_):
+    """SQL callback restricting vessels to a set of H3 cells, using the
+    ``h3`` column populated at ingest time. see the ``h3_resolution``
+    argument of :func:`aisdb.database.decoder.decode_msgs`
+
+    cells may be of any resolution up to `h3_resolution`, such as the
+    compacted output of :func:`h3.compact_cells`. each cell is matched by
+    the range of index values spanned by its descendants, so the query
+    can be answered from the index on column ``h3``
+
+    args:
+        alias (string)
+            the 'alias' in a 'WITH tablename AS alias ...' SQL statement
+        h3_resolution (int)
+            resolution of the cells stored in the database
+        cells (array of int or str)
+            H3 cell indexes, as integers or hexadecimal strings
+        polygon (shapely.geometry.Polygon)
+            if `cells` is not given, the cells with centers inside this
+            polygon will be selected instead
+
+    returns:
+        SQL code (string)
+    """
+    h3_resolution = int(h3_resolution)
+    if cells is None:
+        from aisdb.discretize.h3 import Discretizer
+
+        cells = Discretizer(h3_resolution).get_cells_from_polygon(polygon)
+    cells = np.array(
+        [int(c, 16) if isinstance(c, str) else int(c) for c in cells],
+        dtype=np.uint64,
+    )
+    if cells.size == 0:
+        return "1 = 0"
+
+    lo, hi = cell_to_children_range(cells, h3_resolution)
+    order = np.argsort(lo)
+    lo, hi = lo[order], hi[order]
+    # merge overlapping and adjacent ranges
+    reach = np.maximum.accumulate(hi)
+    start = np.r_[True, lo[1:] > reach[:-1] + np.uint64(1)]
+    end = np.r_[start[1:], True]
+    lo, hi = lo[start], reach[end]
+
+    single = lo == hi
+    terms = [
+        f"{alias}.h3 BETWEEN {int(a)} AND {int(b)}"
+        for a, b in zip(lo[~single], hi[~single])
+    ]
+    if single.any():
+        terms.append(f"{alias}.h3 IN ({', '.join(str(int(c)) for c in lo[single])})")
+    return _or_balanced(terms)
+
+
+def _or_balanced(terms):
+    # nest OR terms as a balanced tree, as long chains of OR exceed the
+    # expression depth limit of the SQLite parser
+    if len(terms) == 1:
+        return f"({terms[0]})"
+    mid = len(terms) // 2
+    return f"({_or_balanced(terms[:mid])} OR {_or_balanced(terms[mid:])})"
@@ -9,6 +9,7 @@ import numpy as np
 from aisdb.database.sql_query_strings import (
     has_mmsi,
     in_bbox,
+    in_h3_cells,
     in_mmsi,
     in_timerange,
     valid_mmsi,
@@ -43,6 +44,9 @@ in_time_bbox_validmmsi = lambda **kwargs: f'''\
     {valid_mmsi(**kwargs)} '''
 in_time_mmsi = lambda **kwargs: f'''\
     {in_timerange(**kwargs)} AND {valid_mmsi(**kwargs)}'''
+in_timerange_h3 = lambda **kwargs: f'''\
+    {in_timerange(**kwargs)} AND
+    {in_h3_cells(**kwargs)}'''
 in_timerange_hasmmsi = lambda **kwargs: f'''\
     {in_timerange(**kwargs)} AND {has_mmsi(**kwargs)}'''
 in_timerange_inmmsi = lambda **kwargs: f'''\
@@ -1,99 +1,18 @@
 import os
 import warnings
-from functools import reduce
 import numpy as np
-from aisdb.aisdb import encoder_score_fcn
-from aisdb.gis import delta_knots, delta_meters
+from aisdb.aisdb import encoder_pathway_labels
 from aisdb.webdata.shore_dist import download_unzip
 
 import geopandas as gpd
+import shapely
 from shapely.errors import GEOSException
-from shapely.geometry import Point, MultiPoint
-from shapely import prepare
+from shapely import contains_xy, prepare
+from shapely.strtree import STRtree
 import pickle
+from functools import partial
 
-
-def _score_idx(scores):
-    """Returns indices of score array where value at index is equal to the
-    highest score. In tie cases, the last index will be selected
-    """
-    assert len(scores) > 0
-    return np.where(scores == np.max(scores))[0][-1]
-
-
-def _segments_idx(track, distance_threshold, speed_threshold, **_):
-    segments_idx1 = reduce(
-        np.append,
-        (
-            [0],
-            np.where(delta_knots(track) > speed_threshold)[0] + 1,
-            [track["time"].size],
-        ),
-    )
-    segments_idx2 = reduce(
-        np.append,
-        (
-            [0],
-            np.where(delta_meters(track) > distance_threshold)[0] + 1,
-            [track["time"].size],
-        ),
-    )
-
-    return reduce(np.union1d, (segments_idx1, segments_idx2))
-
-
-def _scoresarray(
-    track, *, pathways, i, segments_idx, distance_threshold, speed_threshold, minscore
-):
-    scores = np.array(
-        [
-            encoder_score_fcn(
-                x1=pathway["lon"][-1],
-                y1=pathway["lat"][-1],
-                t1=pathway["time"][-1],
-                x2=track["lon"][segments_idx[i]],
-                y2=track["lat"][segments_idx[i]],
-                t2=track["time"][segments_idx[i]],
-                dist_thresh=distance_threshold,
-                speed_thresh=speed_threshold,
-            )
-            for pathway in pathways
-        ],
-        dtype=np.float32,
-    )
-    highscore = (
-        scores[np.where(scores == np.max(scores))[0][0]]
-        if scores.size > 0
-        else minscore
-    )
-    return scores, highscore
-
-
-def _append_highscore(track, *, highscoreidx, pathways, i, segments_idx):
-    return dict(
-        **{k: track[k] for k in track["static"]},
-        **{
-            k: np.append(
-                pathways[highscoreidx][k],
-                track[k][segments_idx[i] : segments_idx[i + 1]],
-            )
-            for k in track["dynamic"]
-        },
-        static=track["static"],
-        dynamic=track["dynamic"],
-    )
-
-
-def _split_pathway(track, *, i, segments_idx):
-    path = dict(
-        **{k: track[k] for k in track["static"]},
-        **{
-            k: track[k][segments_idx[i] : segments_idx[i + 1]] for k in track["dynamic"]
-        },
-        static=track["static"],
-        dynamic=track["dynamic"],
-    )
-    return path
+from aisdb.proc_util import _install_store, _read_store_meta
 
 
 def encode_score(track, distance_threshold, speed_threshold, minscore):
@@ -117,47 +36,33 @@ def encode_score(track, distance_threshold, speed_threshold, minscore):
     """
     assert "time" in track.keys()
     assert len(track["time"]) > 0
-    params = dict(
-        distance_threshold=distance_threshold,
-        speed_threshold=speed_threshold,
-        minscore=minscore,
+    labels = np.array(
+        encoder_pathway_labels(
+            x=track["lon"],
+            y=track["lat"],
+            t=track["time"],
+            distance_threshold=distance_threshold,
+            speed_threshold=speed_threshold,
+            minscore=minscore,
+        ),
+        dtype=int,
     )
-    segments_idx = _segments_idx(track, **params)
-    pathways = []
-    warned = False
-    for i in range(segments_idx.size - 1):
-        if len(pathways) == 0:
-            path = _split_pathway(track, i=i, segments_idx=segments_idx)
-            assert path is not None
-            pathways.append(path)
-            continue
-        elif not warned and len(pathways) > 100:
-            warnings.warn(f"excessive number of pathways! mmsi={track['mmsi']}")
-            warned = True
-        assert len(track["time"]) > 0, f"{track=}"
-
-        scores, highscore = _scoresarray(
-            track, pathways=pathways, i=i, segments_idx=segments_idx, **params
+    npaths = labels.max() + 1
+    if npaths > 100:
+        warnings.warn(f"excessive number of pathways! mmsi={track['mmsi']}")
+
+    # gather the points of each pathway with a single index per pathway
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(npaths + 1))
+    for label in range(npaths):
+        idx = order[bounds[label] : bounds[label + 1]]
+        pathway = dict(
+            **{k: track[k] for k in track["static"]},
+            **{k: track[k][idx] for k in track["dynamic"]},
+            static=set(track["static"]).union({"label"}),
+            dynamic=track["dynamic"],
         )
-        assert len(scores) > 0, f"{track}"
-        if highscore >= minscore:
-            highscoreidx = _score_idx(scores)
-            pathways[highscoreidx] = _append_highscore(
-                track,
-                highscoreidx=highscoreidx,
-                pathways=pathways,
-                i=i,
-                segments_idx=segments_idx,
-            )
-        else:
-            path = _split_pathway(track, i=i, segments_idx=segments_idx)
-            assert path is not None
-            pathways.append(path.copy())
-
-    for pathway, label in zip(pathways, range(len(pathways))):
         pathway["label"] = label
-        pathway["static"] = set(pathway["static"]).union({"label"})
-        assert "label" in pathway.keys()
         assert "time" in pathway.keys(), f"{pathway=}"
         yield pathway
 
@@ -259,10 +164,232 @@ def remove_pings_wrt_speed(tracks, speed_threshold):
         yield from update_dict_(tr__)
 
 
+def _is_cache_current(cache_path, source_path):
+    return os.path.isfile(cache_path) and os.path.getmtime(
+        cache_path
+    ) >= os.path.getmtime(source_path)
+
+
+def _save_array(path, arr):
+    """write a .npy file atomically, so that concurrent readers never see a
+    partially written cache"""
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+# size in degrees of the grid tiles used to find candidate polygon parts
+_PART_TILE_DEGREES = 1.0
+
+
+def _parts_store_path(pkl_path):
+    return f"{pkl_path}.parts"
+
+
+def _parts_store_current(pkl_path, meta):
+    stat = os.stat(pkl_path)
+    return meta["source_size"] == stat.st_size and meta["source_mtime"] == stat.st_mtime
+
+
+def _build_parts_store(pkl_path):
+    """split a pickled geometry into polygon parts, and save them next to
+    the pickle as concatenated WKB with an offsets array, the bounds of
+    each part, and a grid of tiles listing the parts whose bounds overlap
+    each tile
+    """
+    with open(pkl_path, "rb") as f:
+        parts = shapely.get_parts(pickle.load(f))
+    wkb = shapely.to_wkb(parts)
+    offsets = np.cumsum([0, *map(len, wkb)], dtype=np.int64)
+    bounds = shapely.bounds(parts)
+    xmin, ymin = bounds[:, :2].min(axis=0)
+    xmax, ymax = bounds[:, 2:].max(axis=0)
+    shape = (
+        max(1, int(np.ceil((ymax - ymin) / _PART_TILE_DEGREES))),
+        max(1, int(np.ceil((xmax - xmin) / _PART_TILE_DEGREES))),
+    )
+
+    # enumerate the tiles covered by the bounds of each part
+    c0, r0, c1, r1 = (
+        np.clip(
+            np.floor((bounds[:, i] - origin) / _PART_TILE_DEGREES), 0, n - 1
+        ).astype(np.int64)
+        for i, origin, n in (
+            (0, xmin, shape[1]),
+            (1, ymin, shape[0]),
+            (2, xmin, shape[1]),
+            (3, ymin, shape[0]),
+        )
+    )
+    width = c1 - c0 + 1
+    counts = width * (r1 - r0 + 1)
+    part_idx = np.repeat(np.arange(len(parts), dtype=np.int32), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    width = np.repeat(width, counts)
+    tile = (np.repeat(r0, counts) + k // width) * shape[1] + (
+        np.repeat(c0, counts) + k % width
+    )
+    order = np.argsort(tile, kind="stable")
+    tile_offsets = np.searchsorted(tile[order], np.arange(shape[0] * shape[1] + 1))
+
+    def save(tmppath):
+        np.save(
+            os.path.join(tmppath, "wkb.npy"),
+            np.frombuffer(b"".join(wkb), dtype=np.uint8),
+        )
+        np.save(os.path.join(tmppath, "offsets.npy"), offsets)
+        np.save(os.path.join(tmppath, "bounds.npy"), bounds)
+        np.save(os.path.join(tmppath, "tile_offsets.npy"), tile_offsets)
+        np.save(os.path.join(tmppath, "tile_parts.npy"), part_idx[order])
+
+    stat = os.stat(pkl_path)
+    meta = dict(
+        source_size=stat.st_size,
+        source_mtime=stat.st_mtime,
+        total_bounds=[float(xmin), float(ymin), float(xmax), float(ymax)],
+        tile_degrees=_PART_TILE_DEGREES,
+        tile_shape=list(shape),
+    )
+    _install_store(
+        _parts_store_path(pkl_path),
+        save,
+        meta,
+        is_current=partial(_parts_store_current, pkl_path),
+    )
+
+
+class _GeometryParts:
+    def __init__(self, pkl_path):
+        """polygon parts of a pickled geometry, memory-mapped from the parts
+        store next to the pickle file. the store is built on first use.
+
+        parts are only parsed from WKB and prepared when a queried position
+        falls in a tile overlapping their bounds, and are then kept for
+        later queries
+        """
+        storepath = _parts_store_path(pkl_path)
+        meta = _read_store_meta(storepath)
+        if meta is None or not _parts_store_current(pkl_path, meta):
+            _build_parts_store(pkl_path)
+            meta = _read_store_meta(storepath)
+        self.total_bounds = meta["total_bounds"]
+        self.tile_degrees = meta["tile_degrees"]
+        self.tile_shape = tuple(meta["tile_shape"])
+        self.wkb, self.offsets, self.bounds, self.tile_offsets, self.tile_parts = (
+            np.load(os.path.join(storepath, f"{name}.npy"), mmap_mode="r")
+            for name in ("wkb", "offsets", "bounds", "tile_offsets", "tile_parts")
+        )
+        self.parsed = np.full(len(self.bounds), None, dtype=object)
+        self._tree = None
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def geometries(self, idx):
+        """parsed and prepared polygon parts at the given indices"""
+        idx = np.asarray(idx, dtype=np.int64)
+        missing = np.unique(idx[np.equal(self.parsed[idx], None)])
+        if len(missing) > 0:
+            geoms = shapely.from_wkb(
+                [
+                    self.wkb[self.offsets[i] : self.offsets[i + 1]].tobytes()
+                    for i in missing
+                ]
+            )
+            prepare(geoms)
+            self.parsed[missing] = geoms
+        return self.parsed[idx]
+
+    @property
+    def tree(self):
+        """STRtree of all parts. parses every part on first use"""
+        if self._tree is None:
+            self._tree = STRtree(self.geometries(np.arange(len(self))))
+        return self._tree
+
+    def candidates(self, x, y):
+        """pairs of position and part indices, where the position lies
+        within the bounds of the part
+        """
+        xmin, ymin, xmax, ymax = self.total_bounds
+        inside = np.flatnonzero((x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+        col = np.minimum(
+            ((x[inside] - xmin) // self.tile_degrees).astype(np.int64),
+            self.tile_shape[1] - 1,
+        )
+        row = np.minimum(
+            ((y[inside] - ymin) // self.tile_degrees).astype(np.int64),
+            self.tile_shape[0] - 1,
+        )
+        tile = row * self.tile_shape[1] + col
+        starts = self.tile_offsets[tile]
+        counts = self.tile_offsets[tile + 1] - starts
+        pt_idx = np.repeat(inside, counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        part_idx = self.tile_parts[np.repeat(starts, counts) + k]
+        b = self.bounds[part_idx]
+        px, py = x[pt_idx], y[pt_idx]
+        hit = (px >= b[:, 0]) & (px <= b[:, 2]) & (py >= b[:, 1]) & (py <= b[:, 3])
+        return pt_idx[hit], part_idx[hit]
+
+    def contains_xy(self, x, y):
+        """boolean mask of positions contained by any part"""
+        result = np.zeros(len(x), dtype=bool)
+        pt_idx, part_idx = self.candidates(x, y)
+        hits = contains_xy(self.geometries(part_idx), x[pt_idx], y[pt_idx])
+        result[pt_idx[hits]] = True
+        return result
+
+
+# polygon parts of each loaded geometry file, keyed by path and
+# modification time. instances in the same process share parsed parts
+_geometry_parts = {}
+
+
+def _load_geometry_parts(pkl_path):
+    key = (os.path.abspath(pkl_path), os.stat(pkl_path).st_mtime_ns)
+    if key not in _geometry_parts:
+        _geometry_parts[key] = _GeometryParts(pkl_path)
+    return _geometry_parts[key]
+
+
 class InlandDenoising:
+    """remove track positions that fall on land, but not within inland water
+    features
+
+    on first use, the polygon parts of each pickled geometry are saved next
+    to it in a store of memory-mapped arrays (e.g. land.pkl.parts).
+    subsequent instances in any process load the store without unpickling,
+    and only parse the parts near queried positions
+
+    args:
+        data_dir (string)
+            folder where land and water geometries should be stored
+        land_cache (string)
+            filename of pickled land geometry in data_dir
+        water_cache (string)
+            filename of pickled water geometry in data_dir
+        mask_resolution (float)
+            optional grid cell size in degrees. if given, a raster mask of
+            grid cells that are entirely clean or entirely noisy is
+            computed, and only positions in the remaining cells near
+            coastlines are checked against the geometries
+    """
+
     data_url = "https://github.com/MAPS-Lab/AISdb/releases/download/data-v1/geo_land_water_NorthAmerica.7z"
 
-    def __init__(self, data_dir, land_cache="land.pkl", water_cache="water.pkl"):
+    # raster mask cell classes
+    _MASK_UNKNOWN = 0
+    _MASK_NOISY = 1
+    _MASK_CLEAN = 2
+
+    def __init__(
+        self,
+        data_dir,
+        land_cache="land.pkl",
+        water_cache="water.pkl",
+        mask_resolution=None,
+    ):
         download_unzip(self.data_url, data_dir, bytesize=337401807)
         self.land_path = os.path.join(data_dir, land_cache)
         self.water_path = os.path.join(data_dir, water_cache)
@@ -273,12 +400,14 @@ class InlandDenoising:
             f"Water file not found at {self.water_path}"
         )
 
-        # Load geometries during initialization
-        with open(self.land_path, "rb") as f1, open(self.water_path, "rb") as f2:
-            self.land_geom = pickle.load(f1)
-            self.water_geom = pickle.load(f2)
-            prepare(self.land_geom)
-            prepare(self.water_geom)
+        # memory-map the polygon parts of each geometry, which are parsed
+        # on first use
+        self.land_parts = _load_geometry_parts(self.land_path)
+        self.water_parts = _load_geometry_parts(self.water_path)
+
+        self.mask = None
+        if mask_resolution is not None:
+            self._load_mask(mask_resolution)
 
     def __enter__(self):
         return self
@@ -287,44 +416,106 @@ class InlandDenoising:
         # Cleanup if needed
         pass
 
+    @staticmethod
+    def _within(tree, geoms):
+        """boolean mask of geometries entirely within any indexed part"""
+        result = np.zeros(len(geoms), dtype=bool)
+        result[tree.query(geoms, predicate="within")[0]] = True
+        return result
+
+    @staticmethod
+    def _intersects(tree, geoms):
+        """boolean mask of geometries intersecting any indexed part"""
+        result = np.zeros(len(geoms), dtype=bool)
+        result[tree.query(geoms, predicate="intersects")[0]] = True
+        return result
+
+    def _load_mask(self, resolution):
+        """classify grid cells covering the land geometry as entirely noisy
+        (within land and not touching water), entirely clean (outside of
+        land, or within water), or unknown.
+
+        the mask is cached next to the land geometry file, and memory-mapped
+        on subsequent use
+        """
+        xmin, ymin, xmax, ymax = self.land_parts.total_bounds
+        self.mask_origin = (xmin, ymin)
+        self.mask_resolution = resolution
+
+        mask_path = f"{self.land_path}.mask_{resolution:g}.npy"
+        if _is_cache_current(mask_path, self.land_path) and _is_cache_current(
+            mask_path, self.water_path
+        ):
+            self.mask = np.load(mask_path, mmap_mode="r")
+            return
+
+        xs = np.arange(xmin, xmax + resolution, resolution)
+        ys = np.arange(ymin, ymax + resolution, resolution)
+        x0, y0 = np.meshgrid(xs[:-1], ys[:-1])
+        cells = shapely.box(x0, y0, x0 + resolution, y0 + resolution).ravel()
+
+        # cells are only classified when they lie within a single polygon
+        # part, otherwise positions in them are checked individually
+        noisy = self._within(self.land_parts.tree, cells) & ~self._intersects(
+            self.water_parts.tree, cells
+        )
+        clean = ~self._intersects(self.land_parts.tree, cells) | self._within(
+            self.water_parts.tree, cells
+        )
+        mask = np.full(len(cells), self._MASK_UNKNOWN, dtype=np.uint8)
+        mask[noisy] = self._MASK_NOISY
+        mask[clean] = self._MASK_CLEAN
+
+        self.mask = mask.reshape(x0.shape)
+        _save_array(mask_path, self.mask)
+
+    def _mask_lookup(self, lon, lat):
+        """raster mask class for each position. positions outside of the
+        mask extent are unknown
+        """
+        classes = np.full(len(lon), self._MASK_UNKNOWN, dtype=np.uint8)
+        if self.mask is None:
+            return classes
+        col = np.floor((lon - self.mask_origin[0]) / self.mask_resolution)
+        row = np.floor((lat - self.mask_origin[1]) / self.mask_resolution)
+        inside = (
+            (col >= 0)
+            & (col < self.mask.shape[1])
+            & (row >= 0)
+            & (row < self.mask.shape[0])
+        )
+        classes[inside] = self.mask[row[inside].astype(int), col[inside].astype(int)]
+        return classes
+
+    def noisy_points(self, lon, lat):
+        """boolean mask of positions within land, but not within water.
+        positions are checked against the indexed polygon parts in batches,
+        after being classified by the raster mask if one was computed
+        """
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        classes = self._mask_lookup(lon, lat)
+        noisy = classes == self._MASK_NOISY
+
+        unknown = np.flatnonzero(classes == self._MASK_UNKNOWN)
+        in_land = unknown[self.land_parts.contains_xy(lon[unknown], lat[unknown])]
+        in_water = self.water_parts.contains_xy(lon[in_land], lat[in_land])
+        noisy[in_land[~in_water]] = True
+        return noisy
+
     def filter_noisy_points(self, tracks: iter) -> dict:
         """
         Filter points that fall in land but not in water features.
         """
         print("Processing trajectories...")
         for i, traj in enumerate(tracks):
-            # Create points for batch processing
-            try:
-                points = MultiPoint(
-                    [(lon, lat) for lon, lat in zip(traj["lon"], traj["lat"])]
-                )
-            except (GEOSException, ValueError, TypeError) as e:
-                warnings.warn(f"skipping trajectory {i}, invalid points: {e}")
-                continue
-
             # Find points in land but not in water
             try:
-                if hasattr(points, "geoms"):
-                    noisy_mask = [
-                        self.land_geom.contains(point)
-                        and not self.water_geom.contains(point)
-                        for point in points.geoms
-                    ]
-                else:
-                    noisy_mask = [
-                        self.land_geom.contains(points)
-                        and not self.water_geom.contains(points)
-                    ]
-            except GEOSException as e:
+                clean_mask = ~self.noisy_points(traj["lon"], traj["lat"])
+            except (GEOSException, ValueError, TypeError) as e:
                 warnings.warn(f"skipping trajectory {i}, containment check failed: {e}")
                 continue
 
-            noisy_indices = np.where(noisy_mask)[0]
-
-            # Create boolean mask for clean points
-            clean_mask = np.ones(len(traj["time"]), dtype=bool)
-            clean_mask[noisy_indices] = False
-
             # Create cleaned trajectory
             cleaned_traj = dict(
                 **{k: traj[k] for k in traj["static"]},
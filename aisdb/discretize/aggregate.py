@@ -0,0 +1,373 @@
+"""aggregate vessel traffic statistics into H3 cells.
+
+tracks are streamed through a :class:`CellAggregator`, which maintains
+per-cell counters at one or more H3 resolutions. counters are stored as
+parallel numpy arrays keyed by a sorted array of ``np.uint64`` cell
+indexes, so aggregates stay compact, can be pickled, and can be merged
+with aggregates computed by other processes.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+from aisdb.aisdb import latlng_to_cells
+
+# bit layout of a 64-bit H3 index: 4 resolution bits at offset 52, then
+# one 3-bit digit per resolution 1-15, with unused digits set to 7
+_RES_SHIFT = 52
+_RES_MASK = 0xF << _RES_SHIFT
+
+_SUMS = ("points", "dwell_seconds", "sog_sum", "sog_count")
+
+
+def cell_to_parent(cells, resolution):
+    """parents of an array of H3 cells at a coarser resolution, computed
+    directly from the index bit layout
+
+    args:
+        cells (array of np.uint64)
+            H3 cell indexes at `resolution` or finer
+        resolution (int)
+            parent resolution
+
+    returns:
+        array of np.uint64
+    """
+    digits = (1 << (3 * (15 - resolution))) - 1
+    keep = np.uint64(~(_RES_MASK | digits) & 0xFFFFFFFFFFFFFFFF)
+    fill = np.uint64((resolution << _RES_SHIFT) | digits)
+    return (np.asarray(cells, dtype=np.uint64) & keep) | fill
+
+
+def cell_to_children_range(cells, resolution):
+    """inclusive range of index values spanned by the descendants of each
+    H3 cell at a finer resolution. descendants share the bits of their
+    ancestor, so all cells at `resolution` within an ancestor cell fall
+    between ``lo`` and ``hi``, and a set of cells of mixed resolution
+    can be matched against an indexed column of cells with one range
+    comparison per cell. cells finer than `resolution` are replaced by
+    their parent at `resolution`
+
+    args:
+        cells (array of np.uint64)
+            H3 cell indexes, possibly of mixed resolutions
+        resolution (int)
+            resolution of the descendants
+
+    returns:
+        lo, hi (arrays of np.uint64)
+    """
+    cells = np.asarray(cells, dtype=np.uint64)
+    res = ((cells & np.uint64(_RES_MASK)) >> np.uint64(_RES_SHIFT)).astype(np.int64)
+    finer = res > resolution
+    cells = np.where(finer, cell_to_parent(cells, resolution), cells)
+    res = np.minimum(res, resolution)
+    hi = (cells & np.uint64(~_RES_MASK & 0xFFFFFFFFFFFFFFFF)) | np.uint64(
+        resolution << _RES_SHIFT
+    )
+    # digits of resolutions res+1 to `resolution` vary between descendants
+    span = (np.uint64(1) << (3 * (15 - res)).astype(np.uint64)) - np.uint64(
+        1 << (3 * (15 - resolution))
+    )
+    return hi & ~span, hi
+
+
+def _mmsi_key(mmsi):
+    """integer vessel identifier. tracks segmented by
+    :func:`aisdb.track_gen.split_tracks` are labelled '<mmsi>-<segment>'"""
+    try:
+        return int(mmsi)
+    except ValueError:
+        return int(str(mmsi).split("-", 1)[0])
+
+
+def _hash64(values):
+    """splitmix64 finalizer, used to spread vessel identifiers uniformly
+    over 64 bits for HyperLogLog registers"""
+    with np.errstate(over="ignore"):
+        x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(values):
+    values = np.asarray(values, dtype=np.uint64).copy()
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= np.uint64(1 << shift)
+        length[big] += shift
+        values[big] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def _hll_registers(mmsi, precision):
+    """HyperLogLog register index and rank for each vessel identifier"""
+    hashed = _hash64(mmsi)
+    idx = (hashed >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashed & np.uint64((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - _bit_length(rest) + 1
+    return idx, rank.astype(np.uint8)
+
+
+def _hll_estimate(registers):
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(int)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    small = (estimate <= 2.5 * m) & (zeros > 0)
+    estimate[small] = m * np.log(m / zeros[small])
+    return estimate
+
+
+def _unique_pairs(cells, mmsi):
+    order = np.lexsort((mmsi, cells))
+    cells, mmsi = cells[order], mmsi[order]
+    keep = np.ones(len(cells), dtype=bool)
+    keep[1:] = (cells[1:] != cells[:-1]) | (mmsi[1:] != mmsi[:-1])
+    return cells[keep], mmsi[keep]
+
+
+class CellAggregator:
+    """per-cell vessel traffic statistics at one or more H3 resolutions.
+
+    for each cell, the following are counted:
+
+    - ``points``: number of vessel positions
+    - ``vessels``: number of unique MMSIs, either exact or estimated
+      with HyperLogLog
+    - ``dwell_seconds``: time spent by vessels in the cell, computed by
+      attributing the interval until the next position to the cell of
+      each position
+    - ``mean_sog``: mean speed over ground of positions in the cell
+
+    tracks are buffered and reduced in batches of `flush_points`
+    positions. aggregators built in separate worker processes can be
+    pickled and combined with :meth:`merge`.
+
+    args:
+        resolutions (iterable of int)
+            H3 resolutions to aggregate. positions are assigned to cells
+            independently at each resolution
+        unique (str)
+            ``exact`` to count unique MMSIs with a set of
+            (cell, mmsi) pairs, or ``hll`` for fixed-size HyperLogLog
+            estimates
+        hll_precision (int)
+            HyperLogLog precision. each cell uses ``2**hll_precision``
+            bytes, with a relative error of about
+            ``1.04 / sqrt(2**hll_precision)``
+        max_gap (datetime.timedelta)
+            intervals between consecutive positions are clipped to this
+            length when computing dwell time
+        flush_points (int)
+            number of buffered positions at which buffered tracks are
+            reduced into the aggregate
+
+    >>> import numpy as np
+    >>> from aisdb.discretize.aggregate import CellAggregator
+    >>> tracks = [dict(
+    ...     mmsi=316000000, lon=np.array([-63.5, -63.5]),
+    ...     lat=np.array([44.6, 44.6]), time=np.array([0, 60]),
+    ...     sog=np.array([4.0, 6.0]), static={'mmsi'},
+    ...     dynamic={'lon', 'lat', 'time', 'sog'})]
+    >>> agg = CellAggregator(resolutions=(6, 8)).update(tracks)
+    >>> agg.rollup(4)  # parent cells of the resolution 6 aggregate
+    >>> table = agg.table(8)
+    >>> table['points'], table['vessels'], table['dwell_seconds'], table['mean_sog']
+    (array([2]), array([1]), array([60.]), array([5.]))
+    """
+
+    def __init__(
+        self,
+        resolutions=(6,),
+        unique="exact",
+        hll_precision=10,
+        max_gap=timedelta(hours=1),
+        flush_points=2**20,
+    ):
+        assert unique in ("exact", "hll"), f"unknown unique counter {unique}"
+        assert 4 <= hll_precision <= 16
+        self.resolutions = sorted(set(resolutions))
+        self.unique = unique
+        self.hll_precision = hll_precision
+        self.max_gap = max_gap.total_seconds()
+        self.flush_points = flush_points
+        self._pending = []
+        self._npending = 0
+        self._states = {res: self._empty_state() for res in self.resolutions}
+
+    def __getstate__(self):
+        self.flush()
+        return self.__dict__
+
+    def _empty_state(self):
+        state = dict(
+            cell=np.empty(0, dtype=np.uint64),
+            points=np.empty(0, dtype=np.int64),
+            dwell_seconds=np.empty(0, dtype=float),
+            sog_sum=np.empty(0, dtype=float),
+            sog_count=np.empty(0, dtype=np.int64),
+        )
+        if self.unique == "exact":
+            state["pair_cell"] = np.empty(0, dtype=np.uint64)
+            state["pair_mmsi"] = np.empty(0, dtype=np.uint64)
+        else:
+            state["registers"] = np.empty((0, 1 << self.hll_precision), np.uint8)
+        return state
+
+    def add_track(self, track):
+        """buffer the positions of a single track"""
+        n = len(track["time"])
+        if n == 0:
+            return
+        time = np.asarray(track["time"], dtype=np.int64)
+        dwell = np.zeros(n, dtype=float)
+        dwell[:-1] = np.clip(np.diff(time), 0, self.max_gap)
+        if "sog" in track.keys():
+            sog = np.asarray(track["sog"], dtype=float)
+        else:
+            sog = np.full(n, np.nan)
+        self._pending.append(
+            dict(
+                lon=np.asarray(track["lon"], dtype=float),
+                lat=np.asarray(track["lat"], dtype=float),
+                mmsi=np.full(n, _mmsi_key(track["mmsi"]), dtype=np.uint64),
+                dwell_seconds=dwell,
+                sog=sog,
+            )
+        )
+        self._npending += n
+        if self._npending >= self.flush_points:
+            self.flush()
+
+    def update(self, tracks):
+        """buffer every track from an iterable of tracks. returns self"""
+        for track in tracks:
+            self.add_track(track)
+        return self
+
+    def aggregate(self, tracks):
+        """generator variant of :meth:`update`, which yields each track
+        unchanged after it has been counted"""
+        for track in tracks:
+            self.add_track(track)
+            yield track
+
+    def flush(self):
+        """reduce buffered positions into the aggregate"""
+        if not self._pending:
+            return
+        points = {
+            k: np.concatenate([p[k] for p in self._pending])
+            for k in self._pending[0].keys()
+        }
+        self._pending, self._npending = [], 0
+        for res in self.resolutions:
+            cells = np.array(
+                latlng_to_cells(points["lon"], points["lat"], res), dtype=np.uint64
+            )
+            valid = cells != 0
+            state = self._reduce_points(
+                cells[valid], **{k: v[valid] for k, v in points.items()}
+            )
+            self._states[res] = self._merge_states(self._states[res], state)
+
+    def _reduce_points(self, cells, *, mmsi, dwell_seconds, sog, **_):
+        ucell, inv = np.unique(cells, return_inverse=True)
+        has_sog = ~np.isnan(sog)
+        state = dict(
+            cell=ucell,
+            points=np.bincount(inv, minlength=len(ucell)),
+            dwell_seconds=np.bincount(inv, dwell_seconds, minlength=len(ucell)),
+            sog_sum=np.bincount(inv[has_sog], sog[has_sog], minlength=len(ucell)),
+            sog_count=np.bincount(inv[has_sog], minlength=len(ucell)),
+        )
+        pair_cell, pair_mmsi = _unique_pairs(cells, mmsi)
+        if self.unique == "exact":
+            state["pair_cell"], state["pair_mmsi"] = pair_cell, pair_mmsi
+        else:
+            registers = np.zeros((len(ucell), 1 << self.hll_precision), np.uint8)
+            idx, rank = _hll_registers(pair_mmsi, self.hll_precision)
+            rows = np.searchsorted(ucell, pair_cell)
+            np.maximum.at(registers, (rows, idx), rank)
+            state["registers"] = registers
+        return state
+
+    def _merge_states(self, *states):
+        """combine aggregate states, which may contain repeated cells"""
+        cells = np.concatenate([s["cell"] for s in states])
+        ucell, inv = np.unique(cells, return_inverse=True)
+        merged = dict(cell=ucell)
+        for key in _SUMS:
+            values = np.concatenate([s[key] for s in states])
+            merged[key] = np.bincount(inv, values, minlength=len(ucell)).astype(
+                values.dtype
+            )
+        if self.unique == "exact":
+            merged["pair_cell"], merged["pair_mmsi"] = _unique_pairs(
+                np.concatenate([s["pair_cell"] for s in states]),
+                np.concatenate([s["pair_mmsi"] for s in states]),
+            )
+        else:
+            registers = np.zeros((len(ucell), 1 << self.hll_precision), np.uint8)
+            np.maximum.at(
+                registers, inv, np.concatenate([s["registers"] for s in states])
+            )
+            merged["registers"] = registers
+        return merged
+
+    def merge(self, other):
+        """add the counts of another aggregator, such as one built in a
+        worker process, to this one. returns self"""
+        assert self.unique == other.unique, "unique counters must match"
+        assert self.hll_precision == other.hll_precision or self.unique == "exact"
+        self.flush()
+        other.flush()
+        for res, state in other._states.items():
+            if res in self._states:
+                self._states[res] = self._merge_states(self._states[res], state)
+            else:
+                self._states[res] = self._merge_states(state)
+                self.resolutions = sorted(self._states.keys())
+        return self
+
+    def rollup(self, resolution):
+        """aggregate the parent cells at a coarser resolution, from the
+        closest finer aggregated resolution. unlike aggregating positions at
+        `resolution` directly, parent cells follow the H3 hierarchy, so
+        the roll-up of a region contains exactly the counts of its
+        children"""
+        self.flush()
+        finer = [res for res in self._states.keys() if res > resolution]
+        assert finer, f"no aggregated resolution finer than {resolution}"
+        state = dict(self._states[min(finer)])
+        state["cell"] = cell_to_parent(state["cell"], resolution)
+        if self.unique == "exact":
+            state["pair_cell"] = cell_to_parent(state["pair_cell"], resolution)
+        self._states[resolution] = self._merge_states(state)
+        self.resolutions = sorted(self._states.keys())
+
+    def table(self, resolution):
+        """per-cell statistics at the given resolution, as a dictionary of
+        columns sorted by cell: ``cell``, ``points``, ``vessels``,
+        ``dwell_seconds``, ``mean_sog``"""
+        self.flush()
+        state = self._states[resolution]
+        if self.unique == "exact":
+            vessels = np.bincount(
+                np.searchsorted(state["cell"], state["pair_cell"]),
+                minlength=len(state["cell"]),
+            )
+        else:
+            vessels = _hll_estimate(state["registers"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_sog = state["sog_sum"] / state["sog_count"]
+        return dict(
+            cell=state["cell"],
+            points=state["points"],
+            vessels=vessels,
+            dwell_seconds=state["dwell_seconds"],
+            mean_sog=mean_sog,
+        )
@@ -1,8 +1,11 @@
 import h3
 import numpy as np
 import matplotlib.pyplot as plt
-import geopandas as gpd
-from shapely.geometry import Polygon
+import shapely
+from shapely.geometry import Polygon, shape
+
+from aisdb.aisdb import latlng_to_cells
+from aisdb.proj import get_transformer
 
 
 class Discretizer:
@@ -23,6 +26,19 @@ class Discretizer:
         :return: H3 index as a string
         """
         return h3.latlng_to_cell(lat, lon, self.resolution)
+
+    def get_h3_indexes(self, lat, lon):
+        """
+        Get the H3 indices for arrays of latitude and longitude points in a single call.
+        
+        :param lat: Array of latitudes
+        :param lon: Array of longitudes
+        :return: H3 indices as a np.uint64 array. Invalid coordinates are assigned the null index 0.
+            Use h3.int_to_str to convert an index to its hexadecimal string form
+        """
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        return np.array(latlng_to_cells(lon, lat, self.resolution), dtype=np.uint64)
     
     def get_polygon_from_cells(self, cells, tight=True):
         """
@@ -34,27 +50,38 @@ class Discretizer:
         """
         return h3.cells_to_h3shape(cells,  tight=tight)
 
+    def get_cells_from_polygon(self, polygon, compact=True):
+        """
+        Get the H3 cells whose centers lie within a polygon.
+        
+        :param polygon: Shapely Polygon or MultiPolygon in (lon, lat) coordinates, or any object with a __geo_interface__
+        :param compact: If True, complete sets of sibling cells are replaced by their parent cell
+        :return: H3 indices as a np.uint64 array
+        """
+        cells = h3.geo_to_cells(polygon, self.resolution)
+        if compact:
+            cells = h3.compact_cells(cells)
+        return np.array([h3.str_to_int(cell) for cell in cells], dtype=np.uint64)
+
     def yield_tracks_discretized_by_indexes(self, tracks):
         """
         Get H3 indices for a generator of tracks and yield updated tracks.
         
         :param tracks: Generator yielding dictionaries with 'lat' and 'lon' arrays
-        :yield: Each track dictionary with an added 'h3_index' list of H3 indices
+        :yield: Each track dictionary with an added 'h3_index' np.uint64 array of H3 indices
         """
         for track in tracks:
-            longitudes = np.array(track['lon'])
-            latitudes = np.array(track['lat'])
-            track['h3_index'] = [self.get_h3_index(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+            track['h3_index'] = self.get_h3_indexes(track['lat'], track['lon'])
             yield track
 
     def get_hexagon_area_at_latitude(self,lat):
         """ 
         Generate a single hexagon at a specific latitude and calculate its area. 
         """
-        hex_boundary = self.get_polygon_from_cells([self.get_h3_index(lat, 0)], tight=False)
-        gdf_hex = gpd.GeoDataFrame({'geometry': [hex_boundary]}, crs='EPSG:4326')
-        gdf_hex = gdf_hex.to_crs(epsg=32619)  # Convert to UTM for accurate area calculation
-        return gdf_hex.geometry.area.iloc[0] / 1000000  # Convert to square kilometers
+        hex_boundary = shape(self.get_polygon_from_cells([self.get_h3_index(lat, 0)], tight=False).__geo_interface__)
+        transformer = get_transformer(4326, 32619)  # Convert to UTM for accurate area calculation
+        hex_utm = shapely.transform(hex_boundary, lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])))
+        return hex_utm.area / 1000000  # Convert to square kilometers
     
     def describe(self,plot=True):
         """
@@ -7,14 +7,33 @@ from datetime import datetime, timedelta
 from functools import partial
 
 import numpy as np
+import shapely
 import shapely.geometry
 import shapely.ops
-from aisdb.aisdb import haversine
-from shapely.geometry import Polygon, MultiPolygon, LineString, Point
+from aisdb.aisdb import (
+    haversine,
+    haversine_consecutive,
+    haversine_to_point,
+    knots_consecutive,
+)
+from shapely.geometry import Polygon, MultiPolygon, LineString
+from shapely.strtree import STRtree
 
 from aisdb.proc_util import glob_files
 
 
+def _haversine_pairs(x1, y1, x2, y2):
+    """great circle distance in meters between each pair of coordinates.
+    uses the mean earth radius, matching :func:`aisdb.aisdb.haversine`
+    """
+    x1, y1, x2, y2 = (np.radians(np.asarray(v, dtype=float)) for v in (x1, y1, x2, y2))
+    a = (
+        np.sin((y2 - y1) / 2) ** 2
+        + np.cos(y1) * np.cos(y2) * np.sin((x2 - x1) / 2) ** 2
+    )
+    return 2 * 6371008.8 * np.arcsin(np.sqrt(a))
+
+
 def shiftcoord(x, rng=180):
     """Correct longitude coordinates to be within range(-180, 180)
     using a linear shift and modulus.
@@ -117,15 +136,7 @@ def delta_meters(track, rng=None):
     """
     rng = range(len(track["time"])) if rng is None else rng
     return np.array(
-        list(
-            map(
-                haversine,
-                track["lon"][rng][:-1],
-                track["lat"][rng][:-1],
-                track["lon"][rng][1:],
-                track["lat"][rng][1:],
-            )
-        )
+        haversine_consecutive(track["lon"][rng], track["lat"][rng]), dtype=float
     )
 
 
@@ -176,9 +187,15 @@ def delta_knots(track, rng=None):
         >>> trk_1 = tracks_short[0]
         >>> rt_ = aisdb.gis.delta_knots(trk_1)
     """
+    if isinstance(track["time"], list):
+        track["time"] = np.array(track["time"])
     rng = range(len(track["time"])) if rng is None else rng
-    ds = np.array([np.max((1, s)) for s in delta_seconds(track, rng)], dtype=object)
-    return delta_meters(track, rng) / ds * 1.9438445
+    return np.array(
+        knots_consecutive(
+            track["lon"][rng], track["lat"][rng], track["time"][rng].astype(float)
+        ),
+        dtype=float,
+    )
 
 
 def radial_coordinate_boundary(x, y, radius=100000):
@@ -250,11 +267,10 @@ def vesseltrack_3D_dist(tracks, x1, y1, z1, colname="distance_metres"):
     """
     for track in tracks:
         track["dynamic"] = track["dynamic"].union(set([colname]))
-        dists = [
-            distance3D(x1=x1, y1=y1, x2=x, y2=y, depth_metres=z1)
-            for x, y in zip(track["lon"], track["lat"])
-        ]
-        track[colname] = np.array(dists, dtype=object)
+        dists = np.array(
+            haversine_to_point(track["lon"], track["lat"], x1, y1), dtype=float
+        )
+        track[colname] = np.sqrt(dists**2 + abs(z1) ** 2)
         yield track
 
 
@@ -269,11 +285,11 @@ def mask_in_radius_2D(tracks, xy, distance_meters):
         maximum distance in meters
     """
     for track in tracks:
-        mask = [
-            haversine(track["lon"][i], track["lat"][i], xy[0], xy[1]) < distance_meters
-            for i in range(len(track["time"]))
-        ]
-        if sum(mask) == 0:
+        mask = (
+            np.array(haversine_to_point(track["lon"], track["lat"], xy[0], xy[1]))
+            < distance_meters
+        )
+        if not mask.any():
             continue
         yield dict(
             **{k: track[k] for k in track["static"]},
@@ -297,6 +313,10 @@ class Domain:
             will be split into their component polygons, named
             by suffixing the zone name with the part index
 
+    each zone is assigned a stable integer code in the order zones are
+    given, starting from 1. code 0 is reserved for positions outside of
+    all zones ('Z0'). ``zone_names`` maps codes back to zone names
+
     >>> domain = Domain(name='example', zones=[{
     ...     'name': 'zone1',
     ...     'geometry': shapely.geometry.Polygon([(-40,60), (-40, 61), (-41, 61), (-41, 60), (-40, 60)])
@@ -305,6 +325,8 @@ class Domain:
     attr:
         self.name
         self.zones
+        self.zone_ids
+        self.zone_names
         self.boundary
         self.minX
         self.minY
@@ -325,10 +347,7 @@ class Domain:
     def _zone_max_radius(self, geom, zone_x, zone_y):
         """computes the maximum distance to the centroid"""
         return np.max(
-            [
-                haversine(geom.centroid.x, geom.centroid.y, x2, y2)
-                for x2, y2 in zip(zone_x, zone_y)
-            ]
+            haversine_to_point(zone_x, zone_y, geom.centroid.x, geom.centroid.y)
         )
 
     def _add_zone(self, name, x, y):
@@ -449,6 +468,29 @@ class Domain:
         assert self.minX < self.maxX
         assert self.minY < self.maxY
 
+        # zone centroids and radii as arrays for vectorized distance checks
+        self._centroids_x = np.array(
+            [z["geometry"].centroid.x for z in self.zones.values()], dtype=float
+        )
+        self._centroids_y = np.array(
+            [z["geometry"].centroid.y for z in self.zones.values()], dtype=float
+        )
+        self._maxradius = np.array(
+            [z["maxradius"] for z in self.zones.values()], dtype=float
+        )
+
+        # spatial index over prepared zone geometries for batched containment
+        self._zone_geoms = np.array(
+            [z["geometry"] for z in self.zones.values()], dtype=object
+        )
+        shapely.prepare(self._zone_geoms)
+        self._tree = STRtree(self._zone_geoms)
+
+        # integer zone codes, with code 0 reserved for 'Z0'
+        self.zone_ids = {name: i + 1 for i, name in enumerate(self.zones.keys())}
+        self.zone_names = np.array(["Z0", *self.zones.keys()], dtype=object)
+        self.zone_dtype = np.min_scalar_type(len(self.zones))
+
         self.boundary = {
             "xmin": self.minX,
             "xmax": self.maxX,
@@ -496,25 +538,81 @@ class Domain:
         assert float(x) or x == 0.0, f"{type(x)} {x=}{y=}"
         assert float(y) or y == 0.0, f"{type(y)} {x=}{y=}"
         assert isinstance(self.zones, dict)
-        dist_to_centroids = {}
-        for name, z in self.zones.items():
-            dist_to_centroids.update(
-                {
-                    name: haversine(
-                        x,
-                        y,
-                        z["geometry"].centroid.x,
-                        z["geometry"].centroid.y,
-                    )
-                    - z["maxradius"]
-                }
+        dists = (
+            np.array(
+                haversine_to_point(self._centroids_x, self._centroids_y, x, y),
+                dtype=float,
+            )
+            - self._maxradius
+        )
+        return dict(zip(self.zones.keys(), dists))
+
+    def points_in_polygons(self, x, y):
+        """Returns the integer code of the zone containing each of the given
+        coordinates, or 0 for coordinates outside of all zones.
+        Zone names can be looked up from codes using ``self.zone_names``.
+        if there are multiple zones containing a coordinate pair,
+        the zone with the nearest centroid will be selected.
+
+        candidate zones are found using a spatial index over zone bounding
+        boxes, followed by a vectorized containment check on prepared
+        zone geometries.
+
+        args:
+            x (array of float)
+                longitude values
+            y (array of float)
+                latitude values
+
+        returns:
+            numpy.ndarray of unsigned integer zone codes
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        assert x.shape == y.shape, f"{x.shape=} {y.shape=}"
+        assert len(self.zones) > 0
+        zone_codes = np.zeros(x.size, dtype=self.zone_dtype)
+        if x.size == 0:
+            return zone_codes
+
+        # first pass filter using the bounding boxes of zone geometries
+        pt_idx, candidates = self._tree.query(shapely.points(x, y))
+        contained = shapely.contains_xy(
+            self._zone_geoms[candidates], x[pt_idx], y[pt_idx]
+        )
+        pt_idx, candidates = pt_idx[contained], candidates[contained]
+
+        if pt_idx.size == 0:
+            return zone_codes
+
+        # select the zone containing each point. overlapping zones are
+        # resolved using distance to centroid, subtracting the maximum zone
+        # radius. tree query results are sorted by point, so the candidates
+        # of each point form a contiguous segment, and the first candidate
+        # with the least distance in each segment is selected
+        dists = (
+            _haversine_pairs(
+                self._centroids_x[candidates],
+                self._centroids_y[candidates],
+                x[pt_idx],
+                y[pt_idx],
             )
-        return dist_to_centroids
+            - self._maxradius[candidates]
+        )
+        starts = np.flatnonzero(np.r_[True, pt_idx[1:] != pt_idx[:-1]])
+        counts = np.diff(np.r_[starts, pt_idx.size])
+        nearest = np.flatnonzero(
+            dists == np.repeat(np.minimum.reduceat(dists, starts), counts)
+        )
+        nearest = nearest[np.r_[True, pt_idx[nearest][1:] != pt_idx[nearest][:-1]]]
+        zone_codes[pt_idx[nearest]] = candidates[nearest] + 1
+        return zone_codes
 
     def point_in_polygon(self, x, y):
         """Returns the zone containing the given coordinates.
         if there are multiple zones containing the coordinates,
         the zone with the nearest centroid will be selected.
+        See :meth:`points_in_polygons` for the batched version
 
         args:
             x (float)
@@ -524,21 +622,7 @@ class Domain:
         """
         assert float(x) or x == 0.0, f"{type(x)} {x=}{y=}"
         assert float(y) or y == 0.0, f"{type(y)} {x=}{y=}"
-        assert len(self.zones) > 0
-        # first pass filter using distance to centroid, subtracting max radius.
-        # discard all geometry with a distance over zero
-        nearest = {
-            k: v
-            for k, v in sorted(
-                self.nearest_polygons_to_point(x, y).items(), key=lambda item: item[1]
-            )
-            if v < 0
-        }
-        # check for zone containment, starting with the nearest centroid
-        for key, value in nearest.items():
-            if self.zones[key]["geometry"].contains(Point(x, y)):
-                return key
-        return "Z0"
+        return self.zone_names[self.points_in_polygons([x], [y])[0]]
 
     def split_geom(self, zone):
         """Ensure that the zone doesn't intersect longitude 180 or -180.
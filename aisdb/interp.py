@@ -10,12 +10,9 @@ import warnings
 from datetime import timedelta
 
 import numpy as np
-from pyproj import Transformer, Geod
-
 from scipy.interpolate import CubicSpline
 
-_TO_MERCATOR = Transformer.from_crs(4326, 3857, always_xy=True)
-_FROM_MERCATOR = Transformer.from_crs(3857, 4326, always_xy=True)
+from aisdb.proj import azimuth, get_transformer
 
 
 def _interp1d(sample_x, xp, fp):
@@ -40,18 +37,16 @@ def np_interp_linear(track, key, intervals):
     )
 
 
-def _interp_position_linear(
-    track, intervals, fwd_trans=_TO_MERCATOR, back_trans=_FROM_MERCATOR
-):
+def _interp_position_linear(track, intervals, crs=4326):
     """linear resampling of positions in projected space.
     single vectorized transform per track
     """
-    x, y = fwd_trans.transform(track["lon"], track["lat"])
+    x, y = get_transformer(crs, 3857).transform(track["lon"], track["lat"])
     t = track["time"].astype(int)
     samples = intervals.astype(int)
     xi = _interp1d(samples, t, x.astype(float))
     yi = _interp1d(samples, t, y.astype(float))
-    return back_trans.transform(xi, yi)
+    return get_transformer(3857, crs).transform(xi, yi)
 
 
 def interp_time(tracks, step: timedelta = timedelta(minutes=10)):
@@ -118,7 +113,9 @@ def interp_time(tracks, step: timedelta = timedelta(minutes=10)):
     return
 
 
-def geo_interp_time(tracks, step=timedelta(minutes=10), original_crs=4269):
+def geo_interp_time(
+    tracks, step=timedelta(minutes=10), original_crs=4269, approximate=False
+):
     """Geometric interpolation on vessel trajectory, assumes default EPSG:4269
 
     args:
@@ -127,6 +124,10 @@ def geo_interp_time(tracks, step=timedelta(minutes=10), original_crs=4269):
             uses mmsi as key with columns: time lon lat cog sog name .. etc
         step (datetime.timedelta)
             interpolation interval
+        approximate (bool)
+            if True, recompute courses with a local equirectangular
+            approximation instead of WGS84 geodesics. see
+            :func:`aisdb.proj.azimuth`
 
     returns:
         dictionary of interpolated tracks
@@ -156,10 +157,6 @@ def geo_interp_time(tracks, step=timedelta(minutes=10), original_crs=4269):
         ...     print(tr)
 
     """
-    new_crs = 3857
-    fwd_trans = Transformer.from_crs(original_crs, new_crs, always_xy=True)
-    back_trans = Transformer.from_crs(new_crs, original_crs, always_xy=True)
-    geod = Geod(ellps="WGS84")
     for track in tracks:
         if track["time"].size <= 1:
             warnings.warn("cannot interpolate track of length 1, skipping...")
@@ -175,11 +172,15 @@ def geo_interp_time(tracks, step=timedelta(minutes=10), original_crs=4269):
         )
         if "lat" in track["dynamic"]:
             itr["lon"], itr["lat"] = _interp_position_linear(
-                track, intervals, fwd_trans, back_trans
+                track, intervals, crs=original_crs
             )
             if "cog" in track["dynamic"]:
-                courses, _, _ = geod.inv(
-                    itr["lon"][:-1], itr["lat"][:-1], itr["lon"][1:], itr["lat"][1:]
+                courses = azimuth(
+                    itr["lon"][:-1],
+                    itr["lat"][:-1],
+                    itr["lon"][1:],
+                    itr["lat"][1:],
+                    approximate=approximate,
                 )
                 itr["cog"] = np.append(courses, track["cog"][-1])
         for key in track["dynamic"]:
@@ -192,7 +193,7 @@ def geo_interp_time(tracks, step=timedelta(minutes=10), original_crs=4269):
     return
 
 
-def interp_spacing(spacing: int, tracks, crs=4269):
+def interp_spacing(spacing: int, tracks, crs=4269, approximate=False):
     """resample vessel trajectory at a regular distance interval
 
         args:
@@ -201,6 +202,9 @@ def interp_spacing(spacing: int, tracks, crs=4269):
                 uses mmsi as key with columns: time lon lat cog sog name .. etc
             spacing (int)
                 interpolation interval in meters
+            approximate (bool)
+                if True, recompute courses with a local equirectangular
+                approximation instead of WGS84 geodesics
 
         returns:
             dictionary of interpolated tracks
@@ -231,18 +235,13 @@ def interp_spacing(spacing: int, tracks, crs=4269):
     >>> for tr in tracks__:
     ...    print(tr)
     """
-    crs2 = 3857
-    transformer = Transformer.from_crs(crs, crs2, always_xy=True)
-    inv_transformer = Transformer.from_crs(crs2, crs, always_xy=True)
-    geod = Geod(ellps="WGS84")
-
     for track in tracks:
         if track["time"].size <= 1:
             warnings.warn("cannot interpolate track of length 1, skipping...")
             continue
 
         # respace the coordinates in projected space
-        x, y = transformer.transform(track["lon"], track["lat"])
+        x, y = get_transformer(crs, 3857).transform(track["lon"], track["lat"])
         if len(x) == 1:
             continue
         xd = np.diff(x)
@@ -256,9 +255,13 @@ def interp_spacing(spacing: int, tracks, crs=4269):
         t = np.hstack([np.arange(0, total_dist, spacing), [total_dist]])
         xi = _interp1d(t, u, x)
         yi = _interp1d(t, u, y)
-        track["lon"], track["lat"] = inv_transformer.transform(xi, yi)
-        courses, _, _ = geod.inv(
-            track["lon"][:-1], track["lat"][:-1], track["lon"][1:], track["lat"][1:]
+        track["lon"], track["lat"] = get_transformer(3857, crs).transform(xi, yi)
+        courses = azimuth(
+            track["lon"][:-1],
+            track["lat"][:-1],
+            track["lon"][1:],
+            track["lat"][1:],
+            approximate=approximate,
         )
         if "cog" in track:
             track["cog"] = np.append(courses, track["cog"][-1])
@@ -297,16 +300,14 @@ def cubic_spline(times, values, intervals):
         raise
 
 
-def _interp_position_spline(
-    track, intervals, fwd_trans=_TO_MERCATOR, back_trans=_FROM_MERCATOR
-):
+def _interp_position_spline(track, intervals, crs=4326):
     """cubic spline resampling of positions in projected space"""
-    x, y = fwd_trans.transform(track["lon"], track["lat"])
+    x, y = get_transformer(crs, 3857).transform(track["lon"], track["lat"])
     xi = cubic_spline(track["time"], x, intervals)
     yi = cubic_spline(track["time"], y, intervals)
     if xi is None or yi is None:
         return None, None
-    return back_trans.transform(xi, yi)
+    return get_transformer(3857, crs).transform(xi, yi)
 
 
 def interp_cubic_spline(tracks, step: timedelta = timedelta(minutes=10)):
@@ -354,3 +355,154 @@ def interp_cubic_spline(tracks, step: timedelta = timedelta(minutes=10)):
         yield itr
 
     return
+
+
+def _sample_grid(first, last, step_seconds):
+    """regular sample times for each track, concatenated. as in
+    :func:`_intervals`, the last sample is the first one at or after
+    `last`. returns the sample times, the index of the track each
+    sample belongs to, and the sample offsets of each track"""
+    nsamples = -((first - last) // step_seconds) + 1
+    out_offsets = np.concatenate(([0], np.cumsum(nsamples)))
+    owner = np.repeat(np.arange(len(nsamples)), nsamples)
+    k = np.arange(out_offsets[-1]) - out_offsets[:-1][owner]
+    return first[owner] + k * step_seconds, owner, out_offsets
+
+
+def interp_time_batch(
+    columns,
+    offsets,
+    step: timedelta = timedelta(minutes=10),
+    kind="linear",
+    crs=4326,
+    geodesic_cog=False,
+    approximate=False,
+):
+    """interpolate many tracks at a regular time interval in one pass.
+
+    tracks are given as a column store: each dynamic key maps to the
+    concatenation of that column for every track, and track ``i`` spans
+    rows ``offsets[i]:offsets[i + 1]``. positions are projected to
+    EPSG:3857 with a single transform call for all tracks and resampled
+    there, as in :func:`interp_time`. other columns are resampled over
+    time.
+
+    args:
+        columns (dict)
+            concatenated dynamic columns, including ``time``. each track
+            must be sorted by time
+        offsets (array of int)
+            row offsets of each track, of length ``ntracks + 1``
+        step (datetime.timedelta)
+            interpolation interval
+        kind (str)
+            ``linear``, matching :func:`interp_time`, or ``cubic``,
+            matching :func:`interp_cubic_spline`
+        crs (int)
+            coordinate reference system of ``lon`` and ``lat``
+        geodesic_cog (bool)
+            if True, recompute ``cog`` from the interpolated positions,
+            matching :func:`geo_interp_time`
+        approximate (bool)
+            if True, recompute ``cog`` with a local equirectangular
+            approximation instead of WGS84 geodesics
+
+    returns:
+        (columns, offsets) of the interpolated tracks. tracks of length
+        1 or less are skipped, and have an empty range in the returned
+        offsets
+
+    Example:
+        >>> import numpy as np
+        >>> from datetime import timedelta
+        >>> from aisdb.interp import interp_time_batch
+
+        >>> columns = dict(
+        ...     lon=np.array([-45.0, -44.0, -60.0, -61.0, -62.0]),
+        ...     lat=np.array([60.0, 61.0, 45.0, 45.0, 45.0]),
+        ...     time=np.array([0, 3600, 0, 600, 1200]),
+        ... )
+        >>> offsets = np.array([0, 2, 5])
+        >>> icolumns, ioffsets = interp_time_batch(
+        ...     columns, offsets, step=timedelta(minutes=30))
+        >>> ioffsets
+        array([0, 3, 5])
+    """
+    assert kind in ("linear", "cubic"), f"unknown interpolation kind {kind}"
+    offsets = np.asarray(offsets, dtype=np.int64)
+    time = np.asarray(columns["time"], dtype=np.int64)
+    assert offsets[-1] == len(time)
+    step_seconds = int(step.total_seconds())
+
+    counts = np.diff(offsets)
+    valid = counts > 1
+    if not valid.all():
+        warnings.warn(
+            f"cannot interpolate {np.count_nonzero(~valid)} tracks of length "
+            "1 or less, skipping..."
+        )
+    # skipped tracks end one step before they start, giving no samples
+    first = np.zeros(len(counts), dtype=np.int64)
+    first[valid] = time[offsets[:-1][valid]]
+    last = first - step_seconds
+    last[valid] = time[offsets[1:][valid] - 1]
+    samples, owner, out_offsets = _sample_grid(first, last, step_seconds)
+
+    keys = [k for k in columns.keys() if k not in ("time", "lon", "lat")]
+    values = [np.asarray(columns[k], dtype=float) for k in keys]
+    positional = "lon" in columns or "lat" in columns
+    if positional:
+        x, y = get_transformer(crs, 3857).transform(columns["lon"], columns["lat"])
+        values = [np.asarray(x, dtype=float), np.asarray(y, dtype=float), *values]
+
+    if kind == "linear":
+        # shift each track onto a shared, strictly increasing time axis,
+        # with a gap between consecutive tracks, so that every column of
+        # every track can be resampled with a single call to np.interp
+        point_owner = np.repeat(np.arange(len(counts)), counts)
+        span = np.where(valid, last - first, 0) + 1
+        base = np.concatenate(([0], np.cumsum(span)[:-1]))
+        shift = base - first
+        keep = valid[point_owner]
+        xp = (time + shift[point_owner])[keep]
+        sample_x = np.minimum(samples, last[owner]) + shift[owner]
+        resampled = [
+            _interp1d(sample_x, xp, v[keep]) if xp.size else np.empty(0) for v in values
+        ]
+    else:
+        # splines are fitted per track, for all columns at once
+        stacked = np.column_stack(values) if values else np.empty((len(time), 0))
+        out = np.full((len(samples), stacked.shape[1]), np.nan)
+        for i in np.flatnonzero(valid):
+            rows = slice(offsets[i], offsets[i + 1])
+            unique_times, unique_idx = np.unique(time[rows], return_index=True)
+            if len(unique_times) < 2:
+                warnings.warn("not enough unique time points to fit a spline")
+                continue
+            spline = CubicSpline(x=unique_times, y=stacked[rows][unique_idx])
+            out[out_offsets[i] : out_offsets[i + 1]] = spline(
+                samples[out_offsets[i] : out_offsets[i + 1]]
+            )
+        resampled = list(out.T)
+
+    itr = dict(time=samples.astype(int))
+    if positional:
+        itr["lon"], itr["lat"] = get_transformer(3857, crs).transform(
+            resampled[0], resampled[1]
+        )
+        resampled = resampled[2:]
+    itr.update(zip(keys, resampled))
+
+    if geodesic_cog and positional and "cog" in columns:
+        courses = azimuth(
+            itr["lon"][:-1],
+            itr["lat"][:-1],
+            itr["lon"][1:],
+            itr["lat"][1:],
+            approximate=approximate,
+        )
+        itr["cog"] = np.append(courses, np.nan)
+        ends = out_offsets[1:][valid] - 1
+        itr["cog"][ends] = np.asarray(columns["cog"])[offsets[1:][valid] - 1]
+
+    return itr, out_offsets
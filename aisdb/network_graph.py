@@ -4,11 +4,10 @@ trajectory statistics within the overall domain
 """
 
 import os
-import pickle
-import re
-import tempfile
 import types
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import timedelta
 from functools import partial, reduce
 
@@ -16,57 +15,27 @@ import numpy as np
 
 import aisdb
 from aisdb.database import sqlfcn
-from aisdb.database.dbconn import SQLiteDBConn, ConnectionType
+from aisdb.database.dbconn import ConnectionType, PostgresDBConn, SQLiteDBConn
+from aisdb.database.dbqry import DBQuery
+from aisdb.database.sql_query_strings import in_mmsi_shard
 from aisdb.denoising_encoder import encode_greatcircledistance
 from aisdb.gis import (
     delta_knots,
     delta_meters,
-    epoch_2_dt,
 )
 from aisdb.interp import interp_time
 from aisdb.proc_util import _sanitize
-from aisdb.proc_util import _segment_rng
 from aisdb.track_gen import (
     TrackGen,
     fence_tracks,
     split_timedelta,
 )
 from aisdb.webdata.bathymetry import Gebco
-from aisdb.webdata.marinetraffic import vessel_info, VesselInfo
+from aisdb.webdata.marinetraffic import vessel_info, VesselInfo, VesselMetadata
 from aisdb.webdata.shore_dist import ShoreDist, PortDist
 from aisdb.wsa import wetted_surface_area
 
 
-def _fstr(s):
-    return f"{float(s):.2f}"
-
-
-def _depth_nonnegative(track, zoneset):
-    """returns absolute value of bathymetric depths with topographic heights
-    converted to 0
-    """
-    return np.array([d if d >= 0 else 0 for d in track["depth_metres"][zoneset]])
-
-
-def _time_in_shoredist_rng(track, subset, dist0=0.01, dist1=5):
-    """returns minutes spent within kilometers range from shore"""
-    return sum(
-        t
-        for t in map(
-            len,
-            _segment_rng(
-                {
-                    "time": track["time"][subset][
-                        [dist0 <= d <= dist1 for d in track["km_from_shore"][subset]]
-                    ]
-                },
-                maxdelta=timedelta(minutes=1),
-                key="time",
-            ),
-        )
-    )
-
-
 def _staticinfo(track, domain):
     """collect categorical vessel data as a dictionary"""
     static = {"mmsi": track["mmsi"]}
@@ -81,235 +50,431 @@ def _staticinfo(track, domain):
     return static
 
 
-def _transitinfo(track, zoneset, interp_resolution=timedelta(hours=1)):
-    """aggregate statistics on vessel network graph connectivity"""
+def _segment_reduce(ufunc, values, starts, stops, empty=np.nan):
+    """apply ufunc.reduceat() to values over each index range [start, stop)
+
+    ranges must be sorted, but may overlap by one index as consecutive
+    transits do. empty ranges are assigned the value of ``empty``
+    """
+    result = np.full(len(starts), empty, dtype=float)
+    nonempty = stops > starts
+    if values.size > 0 and nonempty.any():
+        # interleave bounds, and pad so that a stop index may equal values.size
+        idx = np.column_stack((starts[nonempty], stops[nonempty])).ravel()
+        padded = np.append(values, values[-1:])
+        result[nonempty] = ufunc.reduceat(padded, idx)[::2]
+    return result
+
+
+def _transit_bounds(in_zone):
+    """index ranges [start, stop) of each zone transit in a track.
+
+    consecutive transits share the boundary position, and the final
+    range extends to the end of the track
+    """
+    transits = np.flatnonzero(np.diff(in_zone.astype(np.int32))) + 1
+    starts = transits if len(transits) > 0 else np.array([0])
+    stops = np.append(transits[1:] + 1, len(in_zone))
+    return starts, stops
+
+
+def _transitinfo(track, starts, stops, domain):
+    """aggregate statistics on vessel network graph connectivity for each
+    transit range of a track.
+
+    per-position and pairwise quantities are computed once for the whole
+    track, and then reduced over each transit range. results are returned
+    as numeric column arrays with one element per transit. timestamps are
+    given in epoch seconds, and statistics which are undefined for a
+    single position transit are NaN
 
+    args:
+        track (dict)
+            vessel trajectory with zone codes appended by
+            :func:`aisdb.track_gen.fence_tracks`
+        starts (np.ndarray)
+            first index of each transit
+        stops (np.ndarray)
+            index following the last position of each transit
+        domain (:class:`aisdb.gis.Domain`)
+            domain used to compute zone codes
+
+    returns:
+        dict of column arrays
+    """
+    starts = np.asarray(starts)
+    stops = np.asarray(stops)
+    last = stops - 1
+    count = stops - starts
     dynamic = {}
 
     # geofencing
+    src_zone = track["in_zone"][starts]
+    rcv_zone = track["in_zone"][last]
     dynamic.update(
         dict(
-            src_zone=int(re.sub("[^0-9]", "", track["in_zone"][zoneset][0])),
-            rcv_zone=int(re.sub("[^0-9]", "", track["in_zone"][zoneset][-1])),
-            transit_nodes=f"{track['in_zone'][zoneset][0]}_{track['in_zone'][zoneset][-1]}",
+            src_zone=src_zone,
+            rcv_zone=rcv_zone,
+            transit_nodes=domain.zone_names[src_zone]
+            + "_"
+            + domain.zone_names[rcv_zone],
         )
     )
 
     # timestamp info
+    time = np.asarray(track["time"], dtype=np.int64)
+    first_seen = time[starts].astype("datetime64[s]")
     dynamic.update(
         dict(
-            first_seen_in_zone=epoch_2_dt(track["time"][zoneset][0]).strftime(
-                "%Y-%m-%d %H:%M UTC"
-            ),
-            last_seen_in_zone=epoch_2_dt(track["time"][zoneset][-1]).strftime(
-                "%Y-%m-%d %H:%M UTC"
-            ),
-            year=epoch_2_dt(track["time"][zoneset][0]).year,
-            month=epoch_2_dt(track["time"][zoneset][0]).month,
-            day=epoch_2_dt(track["time"][zoneset][0]).day,
+            first_seen_in_zone=time[starts],
+            last_seen_in_zone=time[last],
+            year=first_seen.astype("datetime64[Y]").astype(int) + 1970,
+            month=first_seen.astype("datetime64[M]").astype(int) % 12 + 1,
+            day=(
+                first_seen.astype("datetime64[D]") - first_seen.astype("datetime64[M]")
+            ).astype(int)
+            + 1,
         )
     )
 
-    # distance travelled
+    # distance travelled.
+    # pairwise distances between first and last position of each transit
+    endpoints = np.column_stack((starts, last)).ravel()
+    meters = delta_meters(track)
     dynamic.update(
         dict(
-            total_distance_meters=np.sum(delta_meters(track, zoneset[[0, -1]])).astype(
-                int
-            ),
-            cumulative_distance_meters=np.sum(delta_meters(track, zoneset)).astype(int),
+            total_distance_meters=delta_meters(track, endpoints)[::2].astype(int),
+            cumulative_distance_meters=_segment_reduce(
+                np.add, meters, starts, last, empty=0
+            ).astype(int),
         )
     )
+
     # shore dist
     if "km_from_shore" in track.keys():
+        shore = np.asarray(track["km_from_shore"], dtype=float)
         dynamic.update(
             dict(
-                min_shore_dist=f"{np.min(track['km_from_shore'][zoneset]):.2f}",
-                avg_shore_dist=f"{np.average(track['km_from_shore'][zoneset]):.2f}"
-                if "km_from_shore" in track.keys()
-                else None,
-                max_shore_dist=f"{np.max(track['km_from_shore'][zoneset]):.2f}"
-                if "km_from_shore" in track.keys()
-                else None,
+                min_shore_dist=_segment_reduce(np.minimum, shore, starts, stops),
+                avg_shore_dist=_segment_reduce(np.add, shore, starts, stops) / count,
+                max_shore_dist=_segment_reduce(np.maximum, shore, starts, stops),
             )
         )
         # elapsed time in distance from shore
-        dynamic.update(
-            dict(
-                minutes_within_10m_5km_shoredist=_time_in_shoredist_rng(
-                    track, zoneset, 0.01, 5
-                ),
-                minutes_within_30m_20km_shoredist=_time_in_shoredist_rng(
-                    track, zoneset, 0.03, 20
-                ),
-                minutes_within_100m_50km_shoredist=_time_in_shoredist_rng(
-                    track, zoneset, 0.1, 50
-                ),
-            )
-        )
+        for key, dist0, dist1 in (
+            ("minutes_within_10m_5km_shoredist", 0.01, 5),
+            ("minutes_within_30m_20km_shoredist", 0.03, 20),
+            ("minutes_within_100m_50km_shoredist", 0.1, 50),
+        ):
+            in_rng = ((dist0 <= shore) & (shore <= dist1)).astype(int)
+            dynamic[key] = _segment_reduce(
+                np.add, in_rng, starts, stops, empty=0
+            ).astype(int)
 
     # port dist
     if "km_from_port" in track.keys():
+        port = np.asarray(track["km_from_port"], dtype=float)
         dynamic.update(
             dict(
-                min_port_dist=_fstr(np.min(track["km_from_port"][zoneset])),
-                avg_port_dist=_fstr(np.average(track["km_from_port"][zoneset]))
-                if "km_from_port" in track.keys()
-                else None,
-                max_port_dist=_fstr(np.max(track["km_from_port"][zoneset]))
-                if "km_from_port" in track.keys()
-                else None,
+                min_port_dist=_segment_reduce(np.minimum, port, starts, stops),
+                avg_port_dist=_segment_reduce(np.add, port, starts, stops) / count,
+                max_port_dist=_segment_reduce(np.maximum, port, starts, stops),
             )
         )
 
-    # depth charts
+    # depth charts.
+    # topographic heights and missing depths are converted to 0
     if "depth_metres" in track.keys():
+        depth = np.asarray(track["depth_metres"], dtype=float)
+        depth = np.maximum(np.nan_to_num(depth, nan=0.0), 0)
         dynamic.update(
             dict(
-                min_depth=_fstr(np.min(_depth_nonnegative(track, zoneset)))
-                if "depth_metres" in track.keys()
-                else None,
-                avg_depth=_fstr(np.average(_depth_nonnegative(track, zoneset)))
-                if "depth_metres" in track.keys()
-                else None,
-                max_depth=_fstr(np.max(_depth_nonnegative(track, zoneset)))
-                if "depth_metres" in track.keys()
-                else None,
+                min_depth=_segment_reduce(np.minimum, depth, starts, stops),
+                avg_depth=_segment_reduce(np.add, depth, starts, stops) / count,
+                max_depth=_segment_reduce(np.maximum, depth, starts, stops),
             )
         )
 
     # computed velocity (knots)
+    knots = delta_knots(track)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        velocity_avg = _segment_reduce(np.add, knots, starts, last) / (count - 1)
     dynamic.update(
         dict(
-            velocity_knots_min=f"{np.min(delta_knots(track, zoneset)):.2f}"
-            if len(zoneset) > 1
-            else "NULL",
-            velocity_knots_avg=f"{np.average(delta_knots(track, zoneset)):.2f}"
-            if len(zoneset) > 1
-            else "NULL",
-            velocity_knots_max=f"{np.max(delta_knots(track, zoneset)):.2f}"
-            if len(zoneset) > 1
-            else "NULL",
+            velocity_knots_min=_segment_reduce(np.minimum, knots, starts, last),
+            velocity_knots_avg=velocity_avg,
+            velocity_knots_max=_segment_reduce(np.maximum, knots, starts, last),
         )
     )
 
     # elapsed time spent in zones
     dynamic.update(
         dict(
-            minutes_spent_in_zone=_fstr(
-                (
-                    epoch_2_dt(track["time"][zoneset][-1])
-                    - epoch_2_dt(track["time"][zoneset][0])
-                ).total_seconds()
-                / 60
-            )
-            if len(zoneset) > 1
-            else "NULL",
+            minutes_spent_in_zone=np.where(
+                count > 1, (time[last] - time[starts]) / 60, np.nan
+            ),
         )
     )
 
     return dynamic
 
 
-def _serialize_network_edge(tracks, domain, tmp_dir):
+def _csv_column(key, column):
+    """format a column of network edge values for CSV output"""
+    if key in ("first_seen_in_zone", "last_seen_in_zone"):
+        minutes = column.astype("datetime64[s]").astype("datetime64[m]")
+        isoformat = np.char.replace(np.datetime_as_string(minutes), "T", " ")
+        return np.char.add(isoformat, " UTC")
+    if column.dtype.kind == "f":
+        return np.where(np.isnan(column), "NULL", np.char.mod("%.2f", column))
+    return column.astype(str)
+
+
+def _serialize_network_edge(tracks, domain, edges):
     """at each track position where the zone changes, a transit
-    index is recorded, and trajectory statistics are aggregated for this
-    index range using _staticinfo() and _transitinfo()
+    index is recorded, and trajectory statistics are aggregated for all
+    transit index ranges at once using _staticinfo() and _transitinfo()
 
-    results will be serialized as binary files labelled by mmsi into the
-    'tmp_dir' directory, as defined in the config file. see graph() for
-    deserialization and concatenation of results
+    results are appended to 'edges' as a batch of column arrays, with one
+    row per transit. see _edge_columns() for concatenation of results
 
     args:
         tracks: dict
             dictionary of vessel trajectory data, as output by
             ais.track_gen.TrackGen() or its wrapper functions
+        domain (:class:`aisdb.gis.Domain`)
+            domain used to compute zone codes
+        edges (list)
+            network edge batches will be appended to this list
 
     returns: None
     """
     for track in tracks:
         assert isinstance(track, dict)
         assert len(track["time"]) > 0
-        filepath = os.path.join(tmp_dir, str(track["mmsi"]).zfill(9))
         assert "in_zone" in track.keys(), "need to append zone info from fence_tracks"
 
-        with open(filepath, "ab") as f:
-            transits = np.where(track["in_zone"][:-1] != track["in_zone"][1:])[0] + 1
-
-            for i in range(len(transits) - 1):
-                rng = np.array(range(transits[i], transits[i + 1] + 1))
-                track_stats = _staticinfo(track, domain)
-                track_stats.update(_transitinfo(track, rng))
-                pickle.dump(track_stats, f)
-
-            i0 = transits[-1] if len(transits) >= 1 else 0
-            rng = np.array(range(i0, len(track["in_zone"])))
-            track_stats = _staticinfo(track, domain)
-            track_stats.update(_transitinfo(track, rng))
-            track_stats["rcv_zone"] = "NULL"
-            track_stats["transit_nodes"] = track_stats["src_zone"]
-            pickle.dump(track_stats, f)
+        starts, stops = _transit_bounds(track["in_zone"])
+        columns = {
+            key: np.full(len(starts), val, dtype=object)
+            for key, val in _staticinfo(track, domain).items()
+        }
+        columns.update(_transitinfo(track, starts, stops, domain))
+
+        # the final transit has no receiving zone
+        columns["rcv_zone"] = columns["rcv_zone"].astype(object)
+        columns["rcv_zone"][-1] = "NULL"
+        columns["transit_nodes"][-1] = str(columns["src_zone"][-1])
+
+        edges.append(columns)
         yield
 
 
-def _aggregate_output(outputfile, tmp_dir, filters=None):
-    """concatenate serialized output from geofence()
+def _edge_columns(edges):
+    """concatenate network edge batches from _serialize_network_edge() into
+    a single dictionary of column arrays, sorted by MMSI.
+    columns missing from a batch are filled with None
+    """
+    keys = list(dict.fromkeys(key for batch in edges for key in batch.keys()))
+    columns = {
+        key: np.concatenate(
+            [
+                batch[key]
+                if key in batch.keys()
+                else np.full(len(batch["mmsi"]), None, dtype=object)
+                for batch in edges
+            ]
+        )
+        for key in keys
+    }
+    order = np.argsort(columns["mmsi"], kind="stable")
+    return {key: col[order] for key, col in columns.items()}
+
+
+def _aggregate_output(outputfile, edges, filters=None):
+    """concatenate network edges from _serialize_network_edge() and write
+    them to CSV
 
     args:
         outputfile (string)
             filepath location to output CSV data
-        tmp_dir (string)
-            files will temporarily be placed here while processing
+        edges (list)
+            network edge batches, as appended by _serialize_network_edge()
         filters (list)
             list of callback functions. each callable function should
-            accept a dictionary describing a network edge as input. if any
-            return True, the edge will be filtered from the output rows.
+            accept a dictionary of network edge column arrays as input,
+            and return a boolean array. rows where any filter returns True
+            will be filtered from the output.
             see _staticinfo() and _transitinfo() for more info on
             network edge dict keys
 
             for example, to filter all rows where the max speed exceeds 50
-            knots, and filter non-transiting vessels from zone Z0:
+            knots, and filter non-transiting vessels from zone Z0 (zone
+            code 0, see :class:`aisdb.gis.Domain`):
 
     >>> filters = [
-    ...     lambda r: float(r['velocity_knots_max']) > 50,
-    ...     lambda r: r['src_zone'] == '0' and r['rcv_zone'] == 'NULL'
+    ...     lambda e: e['velocity_knots_max'] > 50,
+    ...     lambda e: (e['src_zone'] == 0) & (e['rcv_zone'] == 'NULL')
     ...     ]
     """
-    if filters is None:
-        filters = [lambda row: False]
     assert os.path.isdir(os.path.dirname(outputfile)), f"no directory for {outputfile}!"
-
-    picklefiles = [
-        os.path.join(tmp_dir, fname)
-        for fname in sorted(os.listdir(tmp_dir))
-        if "_" not in fname
-    ]
-    assert len(picklefiles) > 0, "failed to geofence any data..."
+    assert len(edges) > 0, "failed to geofence any data..."
+
+    columns = _edge_columns(edges)
+    rows = len(columns["mmsi"])
+    if filters is not None:
+        with np.errstate(invalid="ignore"):
+            mask = reduce(
+                np.logical_or,
+                [np.asarray(f(columns), dtype=bool) for f in filters],
+                np.zeros(rows, dtype=bool),
+            )
+        columns = {key: col[~mask] for key, col in columns.items()}
 
     with open(outputfile, "w") as output:
-        with open(picklefiles[0], "rb") as f0:
-            getrow = pickle.load(f0)
-            output.write(",".join(map(str, getrow.keys())) + "\n")
-
-        for picklefile in picklefiles:
-            results = []
-            with open(picklefile, "rb") as f:
-                while True:
-                    try:
-                        getrow = pickle.load(f)
-                    except EOFError:
-                        break
-                    if not reduce(
-                        np.logical_or, [f(getrow) for f in filters]
-                    ):  # pragma: no cover
-                        results.append(",".join(map(str, getrow.values())))
-
-            if len(results) == 0:
-                warnings.warn(f"no results for {outputfile}")
-            else:
-                output.write("\n".join(results) + "\n")
-
-            os.remove(picklefile)
-        output.close()
+        output.write(",".join(columns.keys()) + "\n")
+        if len(columns["mmsi"]) == 0:
+            warnings.warn(f"no results for {outputfile}")
+        else:
+            formatted = [_csv_column(key, col) for key, col in columns.items()]
+            output.write("\n".join(map(",".join, zip(*formatted))) + "\n")
+
+
+def _graph_edges(
+    rowgen,
+    *,
+    domain,
+    vinfoDB,
+    data_dir,
+    maxdelta,
+    speed_threshold,
+    distance_threshold,
+    interp_delta,
+    minscore,
+    decimate,
+):
+    """run the network graph processing pipeline on database rows, and
+    return the resulting network edge batches. see graph() for args.
+
+    tracks are streamed through each step of the pipeline, so that only
+    one vessel trajectory is held in memory at a time. the network edges
+    of each trajectory, one row of summary statistics per zone transit,
+    are accumulated in memory and returned, since the output is sorted by
+    MMSI before being written
+    """
+    edges = []
+    with ExitStack() as rasters:
+        tracks = TrackGen(rowgen, decimate)
+
+        # raster sources stay open while the track generators are consumed,
+        # so that tracks are processed one at a time instead of in lists
+        if data_dir is not None:
+            pdist = rasters.enter_context(PortDist(data_dir))
+            sdist = rasters.enter_context(ShoreDist(data_dir))
+            bathy = rasters.enter_context(Gebco(data_dir))
+            tracks = pdist.get_distance(tracks)
+            tracks = sdist.get_distance(tracks)
+            tracks = bathy.merge_tracks(tracks)
+
+        # configure processing pipeline
+        serialize_edges = partial(_serialize_network_edge, domain=domain, edges=edges)
+        geofence = partial(fence_tracks, domain=domain)
+        interp = partial(interp_time, step=interp_delta)
+        encode_tracks = partial(
+            encode_greatcircledistance,
+            distance_threshold=distance_threshold,
+            minscore=minscore,
+            speed_threshold=speed_threshold,
+        )
+        timesplit = partial(split_timedelta, maxdelta=maxdelta)
+        vinfo = partial(vessel_info, dbconn=vinfoDB)
+
+        # pipeline execution order
+        tracks = vinfo(tracks)
+        tracks = wetted_surface_area(tracks)
+        tracks = timesplit(tracks)
+        tracks = encode_tracks(tracks)
+        tracks = interp(tracks)
+        tracks = geofence(tracks)
+        result = serialize_edges(tracks)
+
+        for res in result:
+            assert res is None
+
+    return edges
+
+
+def _prebuilt_sql(*, sql, **_):
+    """query function returning SQL code generated ahead of time"""
+    return sql
+
+
+def _shard_callback(callback, shard, shards):
+    """restrict an SQL callback to vessels in the given MMSI shard"""
+    return lambda **kwargs: (
+        f"{callback(**kwargs)} AND "
+        f"{in_mmsi_shard(shard=shard, shards=shards, **kwargs)}"
+    )
+
+
+def _graph_shard(
+    sql, *, dbpath, connection_string, trafficDBpath, qry_args, verbose, **pipeline
+):
+    """worker process for a single MMSI shard of a parallel network graph.
+    opens new database connections, and returns network edge batches
+    """
+    if dbpath is not None:
+        dbconn = SQLiteDBConn(dbpath)
+        vinfo = VesselInfo(trafficDBpath)
+        # memory-mapped from the store written by the parent process
+        vinfoDB = vinfo.metadata
+    else:
+        dbconn = PostgresDBConn(connection_string)
+        vinfo = None
+        vinfoDB = VesselMetadata(dbconn)
+
+    try:
+        qry = DBQuery(dbconn=dbconn, sql=sql, **qry_args)
+        rowgen = qry.gen_qry(fcn=_prebuilt_sql, verbose=verbose)
+        return _graph_edges(rowgen, vinfoDB=vinfoDB, **pipeline)
+    finally:
+        if vinfo is not None:
+            vinfo.close()
+        dbconn.close()
+
+
+def _graph_edges_parallel(
+    qry, *, workers, dbconn, trafficDBpath, qryfcn, verbose, **pipeline
+):
+    """partition the query by MMSI into one shard per worker, and run the
+    network graph pipeline for each shard in a process pool. each worker
+    opens its own database connections and receives a copy of the domain.
+    network edge batches from each worker are concatenated
+    """
+    # create any missing tables once, before workers query them concurrently
+    if not qry._prepare_tables(verbose=verbose):
+        return []
+
+    qry_args = {key: qry[key] for key in ("start", "end") if key in qry.keys()}
+    shard_sql = [
+        qryfcn(
+            **{**qry.data, "callback": _shard_callback(qry["callback"], shard, workers)}
+        )
+        for shard in range(workers)
+    ]
+    run_shard = partial(
+        _graph_shard,
+        dbpath=dbconn.dbpath if isinstance(dbconn, SQLiteDBConn) else None,
+        connection_string=getattr(dbconn, "connection_string", None),
+        trafficDBpath=trafficDBpath,
+        qry_args=qry_args,
+        verbose=verbose,
+        **pipeline,
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [
+            batch for edges in executor.map(run_shard, shard_sql) for batch in edges
+        ]
 
 
 def graph(
@@ -328,6 +493,7 @@ def graph(
     qryfcn=sqlfcn.crawl_dynamic_static,
     decimate: float = 0.0001,
     verbose: bool = False,
+    workers: int = 1,
 ):
     """Compute network graph of vessel movements within domain zones.
     Zone polygons will be used as network nodes, with graph edges
@@ -367,6 +533,12 @@ def graph(
             minimum score for segments to be considered sequential. See
             :func:`aisdb.denoising_encoder.encode_greatcircledistance` for
             more info
+        workers (int)
+            number of processes used to compute the network graph. if
+            greater than 1, the query will be partitioned by MMSI, and each
+            partition will be processed by a worker process with its own
+            database connection. queries with a limit are only supported
+            with a single worker
 
     Network graph activity is computed following these steps:
 
@@ -440,7 +612,10 @@ def graph(
     >>> os.remove(os.path.join('testdata', 'test_graph.csv'))
 
     process the vessel movement graph edges.
-    caution: this may consume a large amount of memory
+    tracks are streamed through the pipeline one at a time, so memory used
+    for trajectories scales with the largest vessel trajectory rather than
+    the query size. network edges, one row per zone transit, are kept in
+    memory until the CSV output is written
     """
     assert not isinstance(qry, types.GeneratorType), (
         'Got a generator for "qry" arg instead of DBQuery'
@@ -450,6 +625,12 @@ def graph(
         f"Not a DBQuery object! Got {qry}"
     )
 
+    if workers > 1 and "limit" in qry.keys():
+        raise ValueError(
+            "a query limit cannot be used with workers > 1, since it would "
+            "apply to each MMSI partition rather than to the whole query"
+        )
+
     if not isinstance(
         dbconn,
         (
@@ -461,59 +642,39 @@ def graph(
     if isinstance(dbconn, ConnectionType.SQLITE.value):
         assert trafficDBpath is not None
         assert isinstance(trafficDBpath, str)
-        vinfoDB = VesselInfo(trafficDBpath).trafficDB
+        vinfoDB = VesselInfo(trafficDBpath).metadata
     else:
-        vinfoDB = dbconn
-
-    rowgen = qry.gen_qry(fcn=qryfcn, verbose=verbose)
-    tracks = TrackGen(rowgen, decimate)
-
-    if data_dir is not None:
-        with PortDist(data_dir) as pdist:
-            tracks = list(pdist.get_distance(tracks))
-
-    if data_dir is not None:
-        with ShoreDist(data_dir) as sdist:
-            tracks = list(sdist.get_distance(tracks))
-
-    if data_dir is not None:
-        with Gebco(data_dir) as bathy:
-            tracks = list(bathy.merge_tracks(tracks))
-
-    # initialize raster data sources
-    if not os.path.isdir("/tmp"):  # pragma: no cover
-        os.mkdir("/tmp")
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        if os.environ.get("DEBUG"):
-            print(f"network graph {tmp_dir = }")
-            print(f"\n{domain.name=} {domain.boundary=}")
+        vinfoDB = VesselMetadata(dbconn)
+
+    if os.environ.get("DEBUG"):
+        print(f"\n{domain.name=} {domain.boundary=}")
+
+    pipeline = dict(
+        domain=domain,
+        data_dir=data_dir,
+        maxdelta=maxdelta,
+        speed_threshold=speed_threshold,
+        distance_threshold=distance_threshold,
+        interp_delta=interp_delta,
+        minscore=minscore,
+        decimate=decimate,
+    )
 
-        # configure processing pipeline
-        serialize_CSV = partial(_serialize_network_edge, domain=domain, tmp_dir=tmp_dir)
-        geofence = partial(fence_tracks, domain=domain)
-        interp = partial(interp_time, step=interp_delta)
-        encode_tracks = partial(
-            encode_greatcircledistance,
-            distance_threshold=distance_threshold,
-            minscore=minscore,
-            speed_threshold=speed_threshold,
+    if workers > 1:
+        edges = _graph_edges_parallel(
+            qry,
+            workers=workers,
+            dbconn=dbconn,
+            trafficDBpath=trafficDBpath,
+            qryfcn=qryfcn,
+            verbose=verbose,
+            **pipeline,
         )
-        timesplit = partial(split_timedelta, maxdelta=maxdelta)
-        vinfo = partial(vessel_info, dbconn=vinfoDB)
-
-        # pipeline execution order
-        tracks = vinfo(tracks)
-        tracks = wetted_surface_area(tracks)
-        tracks = timesplit(tracks)
-        tracks = encode_tracks(tracks)
-        tracks = interp(tracks)
-        tracks = geofence(tracks)
-        result = serialize_CSV(tracks)
-
-        for res in result:
-            assert res is None
+    else:
+        rowgen = qry.gen_qry(fcn=qryfcn, verbose=verbose)
+        edges = _graph_edges(rowgen, vinfoDB=vinfoDB, **pipeline)
 
-        if os.listdir(tmp_dir) == []:
-            warnings.warn(f"no data for {outputfile}, skipping...\n")
-        else:
-            _aggregate_output(outputfile=outputfile, tmp_dir=tmp_dir)
+    if len(edges) == 0:
+        warnings.warn(f"no data for {outputfile}, skipping...\n")
+    else:
+        _aggregate_output(outputfile=outputfile, edges=edges)
@@ -1,14 +1,17 @@
 import csv
 import io
+import json
 import os
 import re
+import shutil
+import tempfile
 import typing
 from datetime import datetime, timedelta, timezone
 from functools import partial, reduce
 from tempfile import SpooledTemporaryFile
 import numpy as np
-from pyproj import Geod
-from aisdb.aisdb import haversine
+from aisdb.aisdb import haversine_consecutive
+from aisdb.proj import azimuth
 
 
 def _sanitize(s):
@@ -70,11 +73,7 @@ def _segment_rng(track, maxdelta, key="time") -> filter:
 
 def _track_distance(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
     """Calculate the Haversine distance for consecutive points."""
-    distances = np.zeros(len(lat) - 1)
-    for i in range(1, len(lat)):
-        distances[i - 1] = haversine(lat[i - 1], lon[i - 1], lat[i], lon[i])
-
-    return distances
+    return np.array(haversine_consecutive(lon, lat), dtype=float)
 
 
 def _segment_rng_all(
@@ -85,6 +84,7 @@ def _segment_rng_all(
     minspeed: float,
     min_segment_length: int,
     max_direction_change: float,
+    approximate: bool = False,
 ):
     """
     Identifies split points in an AIS track based on time, speed, course, and distance criteria.
@@ -105,6 +105,8 @@ def _segment_rng_all(
         The minimum required length (number of points) for a segment. Segments shorter than this length are ignored.
     max_direction_change : int
         The maximum allowed course-over-ground (COG) or calculated course change (in degrees) before creating a split.
+    approximate : bool
+        If True, calculate courses with a local equirectangular approximation instead of WGS84 geodesics.
 
     Yields:
     -------
@@ -137,9 +139,10 @@ def _segment_rng_all(
     cog_splits = np.nonzero(cog_diff >= max_direction_change)[0] + 1
 
     # Course splits
-    geod = Geod(ellps="WGS84")  # Define the ellipsoid
-    azimuth, _, _ = geod.inv(lon_vec[:-1], lat_vec[:-1], lon_vec[1:], lat_vec[1:])
-    course_vec = (azimuth + 360) % 360
+    course_vec = azimuth(
+        lon_vec[:-1], lat_vec[:-1], lon_vec[1:], lat_vec[1:], approximate=approximate
+    )
+    course_vec = (course_vec + 360) % 360
     course_diff = np.abs(np.diff(course_vec))
     course_diff = np.minimum(course_diff, 360 - course_diff)
     course_splits = np.nonzero(course_diff >= max_direction_change)[0] + 1
@@ -464,3 +467,68 @@ def getfiledate(filename, source=None):
                 if n >= 10000:
                     return False  # Date not found within first 10,000 lines
             return False  # Date not found in the file
+
+
+def _read_store_meta(storepath):
+    """returns the contents of meta.json in a store directory, or None if
+    the store is missing"""
+    metapath = os.path.join(storepath, "meta.json")
+    if not os.path.isfile(metapath):
+        return None
+    with open(metapath, "r") as f:
+        return json.load(f)
+
+
+def _install_store(storepath, save, meta, is_current):
+    """build a store directory of arrays, and move it into place at
+    storepath. processes reading the store never see it partially written.
+
+    an existing store is only replaced if it is not current, since another
+    process may have just built it and be loading arrays from it. if
+    another process installs its store first, that store is kept. in
+    either case, callers should read the store at storepath afterwards
+
+    args:
+        storepath (string)
+            directory where the store is installed
+        save (callable)
+            writes the arrays of the store into the directory passed as
+            its only argument
+        meta (dict)
+            JSON-serializable metadata, saved as meta.json
+        is_current (callable)
+            returns True if the metadata of an existing store shows that
+            it does not need to be rebuilt
+    """
+    parent = os.path.dirname(os.path.abspath(storepath))
+    os.makedirs(parent, exist_ok=True)
+    tmppath = tempfile.mkdtemp(dir=parent)
+    stalepath = None
+    try:
+        save(tmppath)
+        with open(os.path.join(tmppath, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        existing = _read_store_meta(storepath)
+        if existing is not None and is_current(existing):
+            shutil.rmtree(tmppath, ignore_errors=True)
+            return
+        if os.path.isdir(storepath):
+            # move the stale store aside instead of deleting it in place, so
+            # that it is never replaced by a partially deleted directory
+            stalepath = f"{tmppath}.stale"
+            try:
+                os.replace(storepath, stalepath)
+            except FileNotFoundError:
+                stalepath = None
+        try:
+            os.replace(tmppath, storepath)
+        except OSError:
+            # another process installed its store first
+            shutil.rmtree(tmppath, ignore_errors=True)
+    except (Exception, KeyboardInterrupt):
+        shutil.rmtree(tmppath, ignore_errors=True)
+        raise
+    finally:
+        if stalepath is not None:
+            shutil.rmtree(stalepath, ignore_errors=True)
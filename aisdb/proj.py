@@ -0,0 +1,75 @@
+"""cached coordinate transformers and geodesic helpers.
+
+constructing a pyproj Transformer or Geod is far more expensive than
+using one, and Transformer objects must not be shared between threads.
+instances are therefore cached per thread, keyed by source and
+destination CRS, and reused for the life of the process.
+"""
+
+import threading
+
+import numpy as np
+from pyproj import Geod, Transformer
+
+# WGS84 first eccentricity squared
+_E2 = 0.00669437999014
+
+_local = threading.local()
+
+
+def get_transformer(src, dst):
+    """cached Transformer from CRS `src` to CRS `dst`, with
+    ``always_xy=True`` so that coordinates are ordered (lon, lat)
+
+    args:
+        src (int, str, or pyproj.CRS)
+            source coordinate reference system, e.g. 4326
+        dst (int, str, or pyproj.CRS)
+            destination coordinate reference system, e.g. 3857
+
+    returns:
+        pyproj.Transformer
+    """
+    transformers = _local.__dict__.setdefault("transformers", {})
+    key = (src, dst)
+    if key not in transformers:
+        transformers[key] = Transformer.from_crs(src, dst, always_xy=True)
+    return transformers[key]
+
+
+def get_geod(ellps="WGS84"):
+    """cached Geod for the given ellipsoid"""
+    geods = _local.__dict__.setdefault("geods", {})
+    if ellps not in geods:
+        geods[ellps] = Geod(ellps=ellps)
+    return geods[ellps]
+
+
+def azimuth(lon1, lat1, lon2, lat2, approximate=False):
+    """forward azimuth in degrees from each point 1 to the corresponding
+    point 2, in the range [-180, 180]
+
+    args:
+        lon1, lat1, lon2, lat2 (array of float)
+            coordinates in degrees
+        approximate (bool)
+            if True, use a local equirectangular approximation of the
+            WGS84 ellipsoid rather than solving the geodesic. for
+            points a few kilometres apart, as between consecutive
+            vessel positions, the error is a small fraction of a degree
+
+    returns:
+        array of float
+    """
+    if not approximate:
+        courses, _, _ = get_geod().inv(lon1, lat1, lon2, lat2)
+        return np.asarray(courses, dtype=float)
+
+    lon1, lat1 = np.asarray(lon1, dtype=float), np.asarray(lat1, dtype=float)
+    lon2, lat2 = np.asarray(lon2, dtype=float), np.asarray(lat2, dtype=float)
+    phi = np.radians((lat1 + lat2) / 2)
+    # ratio of the prime vertical and meridional radii of curvature
+    ratio = (1 - _E2 * np.sin(phi) ** 2) / (1 - _E2)
+    dx = np.radians((lon2 - lon1 + 180) % 360 - 180) * np.cos(phi) * ratio
+    dy = np.radians(lat2 - lat1)
+    return np.degrees(np.arctan2(dx, dy))
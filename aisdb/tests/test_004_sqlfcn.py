@@ -2,8 +2,13 @@ import os
 from datetime import datetime, timedelta
 
 import numpy as np
+from shapely.geometry import box
 
-from aisdb import sqlfcn, sqlfcn_callbacks
+from aisdb import sqlfcn, sqlfcn_callbacks, sqlpath
+from aisdb.database.dbconn import SQLiteDBConn
+from aisdb.database.sql_query_strings import in_mmsi_shard
+from aisdb.discretize.aggregate import cell_to_parent
+from aisdb.discretize.h3 import Discretizer
 
 y, x = 44., -63.
 start = datetime(2021, 5, 1)
@@ -57,3 +62,42 @@ def test_callbacks(tmpdir):
         txt = sqlfcn.crawl_dynamic_static(dbpath=dbpath, months=months, callback=callback, mmsi=316000000,
                                           mmsis=[316000000], **kwargs)
         print(txt)
+
+
+def test_in_mmsi_shard():
+    txt = in_mmsi_shard(alias="d", shard=1, shards=4, mmsi=316000000)
+    assert txt == "(d.mmsi % 4) = 1"
+
+
+def test_in_h3_cells(tmpdir):
+    dbpath = os.path.join(tmpdir, "test_sqlfcn_h3.db")
+    month = "202105"
+    discretizer = Discretizer(resolution=9)
+    lon, lat = np.linspace(-64.5, -62.5, 200), np.linspace(43.5, 45.5, 200)
+    cells = discretizer.get_h3_indexes(lat, lon)
+
+    with SQLiteDBConn(dbpath) as dbconn, open(os.path.join(sqlpath, "createtable_dynamic_clustered.sql")) as f:
+        dbconn.execute(f.read().format(month))
+        dbconn.add_h3_column(month)
+        dbconn.add_h3_column(month)
+        dbconn.executemany(f"INSERT INTO ais_{month}_dynamic (mmsi, time, longitude, latitude, source, h3) "
+                           "VALUES (?, ?, ?, ?, 'test', ?)",
+                           [(316000000 + i, i, x, y, int(c)) for i, (x, y, c) in enumerate(zip(lon, lat, cells))])
+        dbconn.create_h3_index(month, verbose=False)
+
+        polygon = box(-64, 44, -63, 45)
+        where = sqlfcn_callbacks.in_timerange_h3(alias="d", h3_resolution=9, polygon=polygon,
+                                                 start=datetime(1970, 1, 1), end=datetime(1970, 1, 2))
+        rows = dbconn.execute(f"SELECT d.mmsi FROM ais_{month}_dynamic AS d WHERE {where}").fetchall()
+        selected = set(discretizer.get_cells_from_polygon(polygon, compact=False).tolist())
+        assert sorted(r["mmsi"] - 316000000 for r in rows) == [i for i, c in enumerate(cells) if int(c) in selected]
+        assert 0 < len(rows) < len(cells)
+
+        # cells of coarser resolution given as hexadecimal strings match their descendants
+        parent = Discretizer(resolution=5).get_h3_index(44.5, -63.5)
+        where = sqlfcn_callbacks.in_h3_cells(alias="d", h3_resolution=9, cells=[parent])
+        rows = dbconn.execute(f"SELECT d.mmsi FROM ais_{month}_dynamic AS d WHERE {where}").fetchall()
+        expected = cell_to_parent(cells, 5) == int(parent, 16)
+        assert sorted(r["mmsi"] - 316000000 for r in rows) == np.flatnonzero(expected).tolist()
+
+    assert sqlfcn_callbacks.in_h3_cells(alias="d", h3_resolution=9, cells=[]) == "1 = 0"
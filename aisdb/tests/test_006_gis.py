@@ -3,7 +3,7 @@ import zipfile
 
 import geopandas as gpd
 import numpy as np
-from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry import MultiPolygon, Point, Polygon
 
 from aisdb.gis import (
     Domain,
@@ -158,3 +158,80 @@ def test_domain_from_geodataframe_default_names():
     gdf = gpd.GeoDataFrame(geometry=[mp], crs="EPSG:4326")
     domain = Domain.from_geodataframe(gdf)
     assert set(domain.zones.keys()) == {"zone_0_0", "zone_0_1"}
+
+
+def test_delta_meters_knots_vectorized():
+    from aisdb.aisdb import haversine
+    from aisdb.gis import delta_knots, delta_meters, mask_in_radius_2D
+
+    track = dict(
+        lon=np.array([-63.5, -63.4, -63.3, -63.3], dtype=np.float32),
+        lat=np.array([44.6, 44.65, 44.7, 44.7], dtype=np.float32),
+        time=np.array([0, 600, 1200, 1200], dtype=np.uint32),
+        dynamic=set(["lon", "lat", "time"]),
+        static=set(),
+    )
+    meters = delta_meters(track)
+    expected = [
+        haversine(
+            track["lon"][i], track["lat"][i], track["lon"][i + 1], track["lat"][i + 1]
+        )
+        for i in range(3)
+    ]
+    assert np.allclose(meters, expected)
+    knots = delta_knots(track)
+    assert knots.dtype == float
+    assert np.allclose(knots[:2], meters[:2] / 600 * 1.9438445)
+    assert knots[2] == 0
+    assert len(delta_meters(track, range(1, 3))) == 1
+
+    masked = list(mask_in_radius_2D([track], (-63.5, 44.6), 5000))
+    assert len(masked) == 1
+    assert len(masked[0]["time"]) == 1
+
+
+def test_domain_points_in_polygons_batched():
+    lon, lat = sample_gulfstlawrence_bbox()
+    z1 = Polygon(zip(lon, lat))
+    z2 = Polygon(zip(lon - 45, lat))
+    # z3 contains z1. overlapping zones are resolved by distance to the
+    # zone centroid minus the zone radius, which selects the larger zone
+    z3 = Polygon([(-72, 40), (-72, 53), (-40, 53), (-40, 40), (-72, 40)])
+    domain = Domain(
+        "batched",
+        zones=[
+            {"name": "z1", "geometry": z1},
+            {"name": "z2", "geometry": z2},
+            {"name": "z3", "geometry": z3},
+        ],
+    )
+    x = np.array([z1.centroid.x, z2.centroid.x, -45, 0, -41])
+    y = np.array([z1.centroid.y, z2.centroid.y, 41, 0, 41])
+    zone_codes = domain.points_in_polygons(x, y)
+    assert zone_codes.dtype == np.uint8
+    assert zone_codes.tolist() == [3, 2, 3, 0, 3]
+    assert domain.zone_ids == {"z1": 1, "z2": 2, "z3": 3}
+    assert domain.zone_names[zone_codes].tolist() == ["z3", "z2", "z3", "Z0", "z3"]
+    scalar = [domain.point_in_polygon(xx, yy) for xx, yy in zip(x, y)]
+    assert scalar == ["z3", "z2", "z3", "Z0", "z3"]
+    assert domain.points_in_polygons([], []).size == 0
+
+
+def test_domain_points_in_polygons_overlapping():
+    rng = np.random.default_rng(27)
+    # overlapping boxes of different sizes, so that the selected zone varies across the domain
+    zones = [{"name": f"z{i}", "geometry": Polygon([(x0, y0), (x0, y0 + h), (x0 + w, y0 + h), (x0 + w, y0)])}
+             for i, (x0, y0, w, h) in
+             enumerate(zip(rng.uniform(-70, -60, 12), rng.uniform(40, 50, 12), rng.uniform(1, 8, 12), rng.uniform(1, 6, 12)))]
+    domain = Domain("overlapping", zones=zones)
+    x, y = rng.uniform(-71, -51, 2000), rng.uniform(39, 57, 2000)
+    zone_codes = domain.points_in_polygons(x, y)
+    assert len(np.unique(zone_codes)) > 5
+
+    # the containing zone with the least distance to its centroid minus its radius
+    expected = []
+    for xx, yy in zip(x, y):
+        dists = domain.nearest_polygons_to_point(xx, yy)
+        containing = [z["name"] for z in zones if z["geometry"].contains(Point(xx, yy))]
+        expected.append(min(containing, key=dists.get) if containing else "Z0")
+    assert domain.zone_names[zone_codes].tolist() == expected
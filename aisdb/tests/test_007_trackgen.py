@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import numpy as np
 
 from aisdb import encode_greatcircledistance
+from aisdb.aisdb import encoder_pathway_labels
 from aisdb import track_gen, sqlfcn_callbacks
 from aisdb.database.dbconn import DBConn
 from aisdb.database.dbqry import DBQuery
@@ -50,3 +51,31 @@ def test_min_speed_filter(tmpdir):
         tracks = vesseltrack_3D_dist(tracks, *target_xy, 0)
         for track in tracks:
             assert "time" in track.keys()
+
+
+def test_encode_greatcircledistance_interleaved():
+    # two vessels sharing one identifier, reporting alternately 50km apart
+    n = 20
+    lon = np.where(np.arange(n) % 2 == 0, -63.0, -62.3) + np.arange(n) * 0.001
+    track = dict(mmsi=316000000, lon=lon, lat=np.full(n, 44.0), time=np.arange(n, dtype=np.uint32) * 60,
+                 sog=np.arange(n, dtype=float), static={"mmsi"}, dynamic={"lon", "lat", "time", "sog"}, )
+    pathways = list(encode_greatcircledistance([track], distance_threshold=10000, speed_threshold=50, minscore=0))
+    assert [p["label"] for p in pathways] == [0, 1]
+    assert pathways[0]["sog"].tolist() == list(range(0, n, 2))
+    assert pathways[1]["sog"].tolist() == list(range(1, n, 2))
+    for pathway in pathways:
+        assert pathway["mmsi"] == 316000000
+        assert pathway["static"] == {"mmsi", "label"}
+        assert np.all(np.diff(pathway["time"]) > 0)
+
+
+def test_encoder_pathway_labels():
+    # a jump of 1 degree longitude splits the track, and the third segment
+    # rejoins the first trajectory
+    lon = np.array([-63.0, -62.99, -62.0, -61.99, -62.98, -62.97])
+    lat = np.full(6, 44.0)
+    time = np.arange(6, dtype=np.int32) * 60
+    labels = encoder_pathway_labels(x=lon, y=lat, t=time, distance_threshold=10000, speed_threshold=50, minscore=0)
+    assert list(labels) == [0, 0, 1, 1, 0, 0]
+    assert list(encoder_pathway_labels(x=[], y=[], t=[], distance_threshold=10000, speed_threshold=50,
+                                       minscore=0)) == []
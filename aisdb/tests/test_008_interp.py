@@ -7,7 +7,7 @@ from pyproj import Transformer
 from aisdb import track_gen, sqlfcn, sqlfcn_callbacks
 from aisdb.database.dbconn import DBConn
 from aisdb.database.dbqry import DBQuery
-from aisdb.interp import interp_time, geo_interp_time, interp_cubic_spline
+from aisdb.interp import interp_time, geo_interp_time, interp_cubic_spline, interp_time_batch
 from aisdb.tests.create_testing_data import sample_database_file
 
 
@@ -126,3 +126,32 @@ def test_geo_interp_time_follows_projected_path():
 
     assert abs(result["lon"][1] - expected_mid[0]) < 1e-9
     assert abs(result["lat"][1] - expected_mid[1]) < 1e-9
+
+
+def _sample_tracks():
+    rng = np.random.default_rng(0)
+    tracks = []
+    for n in (5, 1, 2, 0, 8):
+        time = np.sort(rng.choice(np.arange(1_600_000_000, 1_600_020_000), n, replace=False))
+        tracks.append(dict(lon=rng.uniform(-70, -50, n), lat=rng.uniform(40, 60, n), time=time,
+                           sog=rng.uniform(0, 10, n), cog=rng.uniform(0, 360, n),
+                           dynamic=set(["lon", "lat", "time", "sog", "cog"]), static=set(), ))
+    offsets = np.cumsum([0] + [len(track["time"]) for track in tracks])
+    columns = {k: np.concatenate([track[k] for track in tracks]) for k in tracks[0]["dynamic"]}
+    return tracks, columns, offsets
+
+
+def test_interp_time_batch_matches_per_track():
+    step = timedelta(minutes=7)
+    for interp, kwargs in ((interp_time, dict()), (interp_cubic_spline, dict(kind="cubic")),
+                           (geo_interp_time, dict(crs=4269, geodesic_cog=True))):
+        tracks, columns, offsets = _sample_tracks()
+        batch, batch_offsets = interp_time_batch(columns, offsets, step=step, **kwargs)
+        expected = list(interp(filter(lambda track: len(track["time"]) > 0, tracks), step=step))
+
+        # tracks of length 0 or 1 are skipped
+        assert np.array_equal(np.diff(batch_offsets) > 0, [True, False, True, False, True])
+        for i, track in zip((0, 2, 4), expected):
+            for key in columns.keys():
+                result = batch[key][batch_offsets[i]:batch_offsets[i + 1]]
+                assert np.allclose(result, track[key], rtol=1e-9, atol=1e-6), (interp.__name__, key)
@@ -1,13 +1,16 @@
 import os
 import warnings
 from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
 
 from aisdb import encode_greatcircledistance
 from aisdb import track_gen, DBQuery, sqlfcn_callbacks, DBConn
 from aisdb.database import sqlfcn
 from aisdb.tests.create_testing_data import sample_database_file
 from aisdb.webdata.marinetraffic import vessel_info, VesselInfo
-from aisdb.wsa import wetted_surface_area
+from aisdb.wsa import _wsa, vesseltype_codes, wetted_surface_area, wsa_batch
 
 testdir = os.environ.get("AISDBTESTDIR",
                          os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "testdata", ), )
@@ -34,3 +37,25 @@ def test_wetted_surface_area_regression_marinetraffic(tmpdir):
 
         for track in tracks:
             track = next(wetted_surface_area([track]))
+
+
+def test_wsa_batch_matches_scalar():
+    dwt = np.linspace(0, 200000, 100)
+    ship_type = np.arange(100)
+    expected = [_wsa(d, int(t)) for d, t in zip(dwt, ship_type)]
+    assert np.allclose(wsa_batch(dwt, vesseltype_codes(ship_type)), expected)
+
+    generic = np.array(["Cargo", "Tanker", "Tanker", "Tug", None, "Pleasure Craft"], dtype=object)
+    detailed = np.array(["Container Ship", "LPG Tanker", "Chemical Tanker", None, None, "Yacht"], dtype=object)
+    dwt = np.array([50000, 20000, 20000, 300, 1000, 50])
+    ship_type = np.array([0, 0, 0, 0, 30, 0])
+    expected = [_wsa(d, g or int(t), t_d or "") for d, g, t_d, t in zip(dwt, generic, detailed, ship_type)]
+    assert np.allclose(wsa_batch(dwt, vesseltype_codes(ship_type, generic, detailed)), expected)
+
+
+def test_wetted_surface_area_cached_per_mmsi():
+    tracks = [dict(mmsi=316000001, static={"mmsi"}, ship_type=70, marinetraffic_info={"summer_dwt": 5000, "vesseltype_generic": None}) for _ in range(3)]
+    with patch("aisdb.wsa._track_wsa", return_value=1.5) as track_wsa:
+        results = list(wetted_surface_area(tracks))
+    track_wsa.assert_called_once()
+    assert [track["submerged_hull_m^2"] for track in results] == [1.5, 1.5, 1.5]
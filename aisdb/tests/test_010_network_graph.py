@@ -2,14 +2,18 @@ import os
 import warnings
 from datetime import datetime, timedelta
 
+import numpy as np
+import pytest
 from shapely.geometry import Polygon
 
 from aisdb.database import sqlfcn, sqlfcn_callbacks
 from aisdb.database.dbconn import DBConn
 from aisdb.database.dbqry import DBQuery
+from aisdb import network_graph
 from aisdb.gis import Domain
-from aisdb.network_graph import graph
+from aisdb.network_graph import graph, _aggregate_output, _serialize_network_edge, _transit_bounds, _transitinfo
 from aisdb.tests.create_testing_data import (sample_database_file, sample_gulfstlawrence_bbox, )
+from aisdb.webdata.marinetraffic import VesselInfo
 
 trafficDBpath = os.environ.get("AISDBMARINETRAFFIC",
     os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "testdata", "marinetraffic_test.db", ))
@@ -48,3 +52,125 @@ def test_graph_minimal(tmpdir):
     else:
         warnings.warn("no output file generated for test graph")
     # os.remove(testdbpath)
+
+
+def test_graph_parallel(tmpdir):
+    domain = Domain("gulf domain", zones=[{"name": "z1", "geometry": z1}, {"name": "z2", "geometry": z2},
+        {"name": "z3", "geometry": z3}, ])
+
+    testdbpath = os.path.join(tmpdir, "test_graph_parallel.db")
+
+    months = sample_database_file(testdbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = start + timedelta(weeks=1)
+
+    outputs = {}
+    with DBConn(testdbpath) as ais_database:
+        for workers in (1, 2):
+            qry = DBQuery(dbconn=ais_database, start=start, end=end, callback=sqlfcn_callbacks.in_bbox,
+                          fcn=sqlfcn.crawl_dynamic_static, **domain.boundary)
+            outputfile = os.path.join(tmpdir, f"output_{workers}.csv")
+            graph(qry, outputfile=outputfile, data_dir=data_dir, dbconn=ais_database, domain=domain,
+                  trafficDBpath=trafficDBpath, workers=workers)
+            if os.path.isfile(outputfile):
+                with open(outputfile) as f:
+                    header, *rows = f.read().splitlines()
+                outputs[workers] = (header, sorted(rows))
+            else:
+                outputs[workers] = None
+
+        # a query limit would apply to each MMSI partition
+        qry = DBQuery(dbconn=ais_database, start=start, end=end, callback=sqlfcn_callbacks.in_bbox,
+                      fcn=sqlfcn.crawl_dynamic_static, limit=100, **domain.boundary)
+        with pytest.raises(ValueError):
+            graph(qry, outputfile=os.path.join(tmpdir, "output_limit.csv"), data_dir=data_dir, dbconn=ais_database,
+                  domain=domain, trafficDBpath=trafficDBpath, workers=2)
+
+    assert outputs[1] == outputs[2]
+    if outputs[1] is None:
+        warnings.warn("no output file generated for test graph")
+
+
+def test_graph_edges_streaming(tmpdir, monkeypatch):
+    domain = Domain("gulf domain", zones=[{"name": "z1", "geometry": z1}, {"name": "z2", "geometry": z2}, ])
+    x, y = z1.centroid.x, z1.centroid.y
+    mmsis = [316000001, 316000002, 316000003]
+    pulled = []
+
+    def rowgen():
+        for i, mmsi in enumerate(mmsis):
+            pulled.append(mmsi)
+            yield [dict(mmsi=mmsi, ship_type=70, time=1000 * i + 60 * t, longitude=x + 0.01 * t, latitude=y, cog=0, sog=10.0,
+                        heading=0.0, rot=0.0, utc_second=0) for t in range(5)]
+
+    # record how many vessels had been read from the database when each vessel's edges were serialized
+    serialized = []
+
+    def serialize_spy(tracks, domain, edges):
+        for res in _serialize_network_edge(tracks, domain, edges):
+            serialized.append((edges[-1]["mmsi"][0], len(pulled)))
+            yield res
+
+    monkeypatch.setattr(network_graph, "_serialize_network_edge", serialize_spy)
+    with VesselInfo(os.path.join(tmpdir, "vinfo.db")) as vinfo:
+        edges = network_graph._graph_edges(rowgen(), domain=domain, vinfoDB=vinfo.metadata, data_dir=None,
+                                           maxdelta=timedelta(weeks=1), speed_threshold=50, distance_threshold=200000,
+                                           interp_delta=timedelta(minutes=10), minscore=0, decimate=False)
+
+    # each trajectory passes through the whole pipeline before the next vessel's rows are read
+    assert serialized == [(mmsi, i + 1) for i, mmsi in enumerate(mmsis)]
+    assert [batch["mmsi"][0] for batch in edges] == mmsis
+
+
+def test_transitinfo_segmented(tmpdir):
+    domain = Domain("transit domain", zones=[{"name": "a", "geometry": Polygon([(0, 0), (0, 1), (1, 1), (1, 0)])},
+        {"name": "b", "geometry": Polygon([(2, 0), (2, 1), (3, 1), (3, 0)])}, ])
+    lon = np.array([0.5, 0.6, 1.5, 2.5, 2.6, 1.5, 0.5])
+    track = dict(lon=lon, lat=np.full(lon.size, 0.5), time=np.arange(lon.size) * 600,
+                 km_from_shore=np.array([0, 1, 2, 3, 4, 5, 6.]), depth_metres=np.array([-5, 10, 20, 30, 40, 50, 60.]),
+                 in_zone=domain.points_in_polygons(lon, np.full(lon.size, 0.5)))
+
+    starts, stops = _transit_bounds(track["in_zone"])
+    assert starts.tolist() == [2, 3, 5, 6]
+    assert stops.tolist() == [4, 6, 7, 7]
+
+    stats = _transitinfo(track, starts, stops, domain)
+    assert all(len(col) == len(starts) for col in stats.values())
+    assert stats["src_zone"].tolist() == [0, 2, 0, 1]
+    assert stats["rcv_zone"].tolist() == [2, 0, 1, 1]
+    assert stats["transit_nodes"].tolist() == ["Z0_b", "b_Z0", "Z0_a", "a_a"]
+    assert stats["first_seen_in_zone"].tolist() == [1200, 1800, 3000, 3600]
+    assert stats["minutes_spent_in_zone"][:3].tolist() == [10, 20, 10]
+    assert np.isnan(stats["minutes_spent_in_zone"][3])
+    assert np.isnan(stats["velocity_knots_max"][3])
+    assert stats["cumulative_distance_meters"][3] == 0
+    assert np.allclose(stats["avg_shore_dist"], [2.5, 4, 5.5, 6])
+    assert stats["min_depth"].tolist() == [20, 30, 50, 60]
+    assert stats["minutes_within_10m_5km_shoredist"].tolist() == [2, 3, 1, 0]
+
+    # missing depths are counted as 0
+    track["depth_metres"][4] = np.nan
+    stats = _transitinfo(track, starts, stops, domain)
+    assert stats["min_depth"].tolist() == [20, 0, 50, 60]
+    assert stats["avg_depth"].tolist() == [25, 80 / 3, 55, 60]
+    assert (stats["year"] == 1970).all() and (stats["month"] == 1).all() and (stats["day"] == 1).all()
+
+
+def test_aggregate_output_filters(tmpdir):
+    domain = Domain("transit domain", zones=[{"name": "a", "geometry": Polygon([(0, 0), (0, 1), (1, 1), (1, 0)])}, ])
+    lon = np.array([0.5, 1.5, 0.5, 0.6])
+    tracks = [dict(mmsi=mmsi, lon=lon, lat=np.full(lon.size, 0.5), time=np.arange(lon.size) * 600,
+                   marinetraffic_info={"vessel_name": f"v{mmsi}"}, in_zone=domain.points_in_polygons(lon, np.full(4, 0.5)))
+              for mmsi in (222, 111)]
+    edges = []
+    for res in _serialize_network_edge(tracks, domain, edges):
+        assert res is None
+    assert len(edges) == 2
+
+    outputfile = os.path.join(tmpdir, "edges.csv")
+    _aggregate_output(outputfile, edges, filters=[lambda e: e["rcv_zone"] == "NULL"])
+    with open(outputfile) as f:
+        header, *rows = f.read().splitlines()
+    assert header.startswith("mmsi,vessel_name,src_zone,rcv_zone,transit_nodes,first_seen_in_zone")
+    assert [row.split(",")[:5] for row in rows] == [["111", "v111", "0", "1", "Z0_a"], ["222", "v222", "0", "1", "Z0_a"]]
+    assert rows[0].split(",")[5] == "1970-01-01 00:10 UTC"
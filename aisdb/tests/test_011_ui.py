@@ -1,15 +1,29 @@
+import asyncio
 import os
+import struct
+import threading
 from datetime import datetime, timedelta
 
+import numpy as np
+import orjson
 from shapely.geometry import Polygon
 
 import aisdb
-from aisdb import SQLiteDBConn, Domain, DBQuery, sqlfcn_callbacks
+from aisdb import SQLiteDBConn, Domain, DBQuery, sqlfcn, sqlfcn_callbacks
+from aisdb.database.create_tables import sql_createtable_dynamic
 from aisdb.tests.create_testing_data import (
     sample_database_file,
     sample_gulfstlawrence_bbox,
 )
-from aisdb.web_interface import client_url, serialize_zone_json, serialize_track_json
+from aisdb.web_interface import (
+    TRACK_FRAME,
+    _send_tracks,
+    _TrackStream,
+    client_url,
+    serialize_track_binary,
+    serialize_track_json,
+    serialize_zone_json,
+)
 
 
 def _add_track_color(tracks):
@@ -66,3 +80,115 @@ def test_client_url_custom_host_and_port():
     assert url == "http://0.0.0.0:8080/index.html?python=1&z=2"
     url = client_url(host="example.com", http_port=8443, visualearth=True)
     assert url == "http://example.com:8443/index.html?python=2&z=2"
+
+
+def _decode_track_frame(frame):
+    kind, flags, _, mmsi, n, scale, t0, x0, y0 = struct.unpack_from("<BBHIIIqii", frame)
+    assert kind == TRACK_FRAME
+    values, offset = [], 32
+    for bit, first in enumerate((x0, y0, t0)):
+        dtype = "<i4" if flags & (1 << bit) else "<i2"
+        delta = np.frombuffer(frame, dtype=dtype, count=max(n - 1, 0), offset=offset)
+        offset += delta.nbytes
+        values.append(np.cumsum(np.concatenate([[first], delta.astype(np.int64)]))[:n])
+    assert offset == len(frame)
+    return mmsi, values[0] / scale, values[1] / scale, values[2]
+
+
+def test_serialize_track_binary():
+    track = dict(mmsi=316000001, lon=np.array([-63.5, -63.49999, -60.0, 120.0]), lat=np.array([44.6, 44.61, 44.0, -10.0]),
+                 time=np.array([1625176725, 1625176735, 1625176795, 1625276725]))
+    frame = serialize_track_binary(track)
+    mmsi, lon, lat, time = _decode_track_frame(frame)
+    assert mmsi == 316000001
+    assert np.allclose(lon, track["lon"], atol=1e-5)
+    assert np.allclose(lat, track["lat"], atol=1e-5)
+    assert np.array_equal(time, track["time"])
+
+    # small differences are stored as 16 bit integers
+    track = dict(mmsi=316000002, lon=np.linspace(-63.5, -63.4, 50), lat=np.linspace(44.6, 44.7, 50), time=np.arange(50) * 10)
+    frame = serialize_track_binary(track)
+    assert frame[1] == 0 and len(frame) == 32 + 3 * 49 * 2
+    assert np.allclose(_decode_track_frame(frame)[1], track["lon"], atol=1e-5)
+
+    assert len(serialize_track_binary(dict(mmsi=1, lon=[], lat=[], time=[]))) == 32
+
+
+class _MockWebsocket:
+    remote_address = ("localhost", 0)
+
+    def __init__(self, *requests):
+        self.requests = [orjson.dumps(r) for r in requests]
+        self.sent = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.requests:
+            raise StopAsyncIteration
+        return self.requests.pop(0)
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def _serve_stream(stream, *websockets):
+    """ serve the stream from an event loop in a background thread, while tracks are produced on this thread """
+    loop = asyncio.new_event_loop()
+    server = threading.Thread(target=loop.run_forever, daemon=True)
+    server.start()
+    try:
+        tasks = [asyncio.run_coroutine_threadsafe(_send_tracks(websocket, stream=stream), loop) for websocket in websockets]
+        stream.produce(loop)
+        for task in tasks:
+            task.result(timeout=30)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        server.join()
+        loop.close()
+    return [websocket.sent for websocket in websockets]
+
+
+def test_send_tracks_stream():
+    threads = set()
+
+    def tracks():
+        for i in range(3):
+            threads.add(threading.get_ident())
+            yield dict(mmsi=316000000 + i, static={"mmsi"}, lon=[-63.5, -63.4], lat=[44.6, 44.7], time=[0, 60])
+
+    # the metadata socket connects first, and waits for tracks to be produced
+    meta_socket = _MockWebsocket({"msgtype": "meta"})
+    track_socket = _MockWebsocket({"msgtype": "validrange"}, {"msgtype": "zones"})
+    meta_msgs, track_msgs = _serve_stream(_TrackStream(tracks(), maxsize=1), meta_socket, track_socket)
+
+    # tracks are pulled from the generator on the calling thread only
+    assert threads == {threading.get_ident()}
+    frames = [msg for msg in track_msgs if msg[0] == TRACK_FRAME]
+    assert [_decode_track_frame(frame)[0] for frame in frames] == [316000000, 316000001, 316000002]
+    assert [orjson.loads(msg)["mmsi"] for msg in meta_msgs] == [316000000, 316000001, 316000002]
+
+
+def test_send_tracks_stream_sqlite(tmpdir):
+    testdbpath = os.path.join(tmpdir, "test_send_tracks_stream_sqlite.db")
+    mmsis = [316000001, 316000002, 316000003]
+    start = datetime(2021, 1, 1)
+    t0 = int(start.timestamp())
+    with SQLiteDBConn(testdbpath) as dbconn:
+        dbconn.execute(sql_createtable_dynamic.format("202101"))
+        dbconn.executemany(
+            "INSERT INTO ais_202101_dynamic (mmsi, time, longitude, latitude, rot, sog, cog, heading, maneuver, utc_second, source) VALUES (?, ?, ?, ?, 0, 10, 90, 90, 0, 0, 'test')",
+            [(mmsi, t0 + 60 * i, -63.5 + 0.01 * i, 44.6) for mmsi in mmsis for i in range(3)])
+        dbconn.commit()
+
+    # sqlite connections may only be used from the thread that opened them
+    with SQLiteDBConn(testdbpath) as dbconn:
+        qry = DBQuery(dbconn=dbconn, start=start, end=start + timedelta(days=1), callback=sqlfcn_callbacks.in_timerange_validmmsi)
+        tracks = aisdb.TrackGen(qry.gen_qry(fcn=sqlfcn.crawl_dynamic), decimate=False)
+        track_socket = _MockWebsocket({"msgtype": "validrange"}, {"msgtype": "zones"})
+        track_msgs, = _serve_stream(_TrackStream(tracks), track_socket)
+
+    frames = [msg for msg in track_msgs if msg[0] == TRACK_FRAME]
+    assert [_decode_track_frame(frame)[0] for frame in frames] == mmsis
+    assert all(len(_decode_track_frame(frame)[1]) == 3 for frame in frames)
@@ -1,6 +1,10 @@
 import os
+import pickle
+
 import numpy as np
-from aisdb.denoising_encoder import InlandDenoising
+import shapely
+
+from aisdb.denoising_encoder import InlandDenoising, _GeometryParts, _geometry_parts
 
 y1, x1 = 44.30350650164017, -63.255341082253146
 y2, x2 = 44.29083001133964, -64.45527328316969  # Point (y2, x2) is inland
@@ -19,3 +23,66 @@ def test_inland_denoising():
         cleaned_tracks = remover.filter_noisy_points(tracks_short)
         cleaned_tracklist.extend(cleaned_tracks)
         assert len(cleaned_tracklist[0]['time']) == len(tracks_short[0]['time']) - 1  # ensure the inland point is removed
+
+
+def _link_data_dir(tmpdir):
+    """ link the downloaded geometries into tmpdir, so that derived caches are not written to the shared data_dir """
+    for fname in (os.path.basename(InlandDenoising.data_url), "land.pkl", "water.pkl"):
+        os.symlink(os.path.join(data_dir, fname), os.path.join(tmpdir, fname))
+    return str(tmpdir)
+
+
+def test_inland_denoising_raster_mask(tmpdir):
+    rng = np.random.default_rng(17)
+    lon = np.concatenate([tracks_short[0]["lon"], rng.uniform(-66, -60, 500)])
+    lat = np.concatenate([tracks_short[0]["lat"], rng.uniform(43, 47, 500)])
+    with InlandDenoising(data_dir=data_dir) as remover:
+        noisy = remover.noisy_points(lon, lat)
+    mask_dir = _link_data_dir(tmpdir)
+    with InlandDenoising(data_dir=mask_dir, mask_resolution=0.25) as remover:
+        assert remover.mask is not None
+        assert np.array_equal(remover.noisy_points(lon, lat), noisy)
+    assert noisy[:3].tolist() == [False, True, False]
+    assert os.path.isfile(os.path.join(mask_dir, "land.pkl.mask_0.25.npy"))
+
+
+def test_inland_denoising_geometry_parts(tmpdir):
+    parts_dir = _link_data_dir(tmpdir)
+    with InlandDenoising(data_dir=parts_dir) as remover:
+        expected = remover.noisy_points(tracks_short[0]["lon"], tracks_short[0]["lat"])
+    assert os.path.isfile(os.path.join(parts_dir, "land.pkl.parts", "wkb.npy"))
+    assert os.path.isfile(os.path.join(parts_dir, "water.pkl.parts", "tile_parts.npy"))
+
+    # subsequent instances memory-map the stored parts, and share the parts parsed in this process
+    _geometry_parts.clear()
+    with InlandDenoising(data_dir=parts_dir) as remover:
+        assert isinstance(remover.land_parts.wkb, np.memmap)
+        assert np.array_equal(remover.noisy_points(tracks_short[0]["lon"], tracks_short[0]["lat"]), expected)
+        # only parts near the queried positions are parsed
+        assert 0 < np.count_nonzero(np.not_equal(remover.land_parts.parsed, None)) < len(remover.land_parts)
+        land_parts = remover.land_parts
+    with InlandDenoising(data_dir=parts_dir) as remover:
+        assert remover.land_parts is land_parts
+
+
+def test_GeometryParts(tmpdir):
+    rng = np.random.default_rng(37)
+    polygons = list(shapely.buffer(shapely.points(rng.uniform(-80, -50, 500), rng.uniform(40, 60, 500)),
+                                   rng.uniform(0.01, 0.5, 500)))
+    # a part spanning many tiles
+    polygons.append(shapely.box(-79, 41, -51, 42.5))
+    pkl_path = os.path.join(tmpdir, "land.pkl")
+    with open(pkl_path, "wb") as f:
+        pickle.dump(shapely.GeometryCollection(polygons), f)
+
+    parts = _GeometryParts(pkl_path)
+    assert len(parts) == len(polygons)
+    assert np.equal(parts.parsed, None).all()
+
+    x, y = rng.uniform(-85, -45, 5000), rng.uniform(35, 65, 5000)
+    expected = np.array([any(p.contains(shapely.Point(xi, yi)) for p in polygons) for xi, yi in zip(x, y)])
+    assert np.array_equal(_GeometryParts(pkl_path).contains_xy(x, y), expected)
+
+    # a position away from other parts only parses the parts overlapping its tile
+    parts.contains_xy(np.array([-65.0]), np.array([42.0]))
+    assert 1 <= np.count_nonzero(np.not_equal(parts.parsed, None)) < 20
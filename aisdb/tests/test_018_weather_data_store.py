@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from unittest.mock import MagicMock, patch
 
@@ -165,3 +166,179 @@ def test_close_closes_datasets(make_store):
 
     for ds in weather_ds_map.values():
         ds.close.assert_called_once()
+
+
+def _grid_dataset(values, times, lats, lons, var_name="u10"):
+    return xr.Dataset(
+        {var_name: (("time", "latitude", "longitude"), values)},
+        coords={"time": times, "latitude": lats, "longitude": lons},
+    )
+
+
+def test_yield_tracks_with_weather_matches_nearest_selection(make_store):
+    rng = np.random.default_rng(0)
+    # descending latitudes as in ERA5, and an irregular time axis
+    lats = np.arange(60, 29.75, -0.25)
+    lons = np.arange(-80, -39.75, 0.25)
+    times = np.datetime64("2023-01-01T00:00") + np.cumsum(
+        rng.integers(1, 4, 48)
+    ) * np.timedelta64(1, "h")
+    ds = _grid_dataset(
+        rng.normal(size=(len(times), len(lats), len(lons))), times, lats, lons
+    )
+    store = make_store({"10u": ds}, short_names=["10u"])
+
+    epoch = times.astype("datetime64[s]").astype(np.int64)
+    track = {
+        "lon": rng.uniform(-85, -35, 500),
+        "lat": rng.uniform(25, 65, 500),
+        "time": rng.integers(epoch[0] - 7200, epoch[-1] + 7200, 500),
+    }
+    (result,) = store.yield_tracks_with_weather(t for t in [track])
+
+    expected = (
+        ds["u10"]
+        .sel(
+            latitude=xr.DataArray(track["lat"], dims="points"),
+            longitude=xr.DataArray(track["lon"], dims="points"),
+            time=xr.DataArray(
+                track["time"].astype("datetime64[s]").astype("datetime64[ns]"),
+                dims="points",
+            ),
+            method="nearest",
+        )
+        .values
+    )
+    np.testing.assert_array_equal(result["weather_data"]["10u"], expected)
+
+    weather = store.extract_weather(track["lat"][0], track["lon"][0], track["time"][0])
+    assert weather["10u"] == expected[0]
+
+
+def test_grid_sampler_longitudes_0_360():
+    from aisdb.weather.grid import GridSampler
+
+    values = np.arange(2 * 3 * 360, dtype=np.float32).reshape(2, 3, 360)
+    sampler = GridSampler(values, [0, 3600], [1, 0, -1], np.arange(360))
+    sampled = sampler.sample([-1.2, 10.4, 359.6], [0.9, -0.2, 0.0], [0, 1800, 3599])
+    np.testing.assert_array_equal(
+        sampled, [values[0, 0, 359], values[1, 1, 10], values[1, 1, 0]]
+    )
+
+
+def test_grib_store(tmpdir):
+    from aisdb.weather import data_store
+
+    rng = np.random.default_rng(1)
+    lats, lons = np.arange(50, 39.5, -0.5), np.arange(-70, -59.5, 0.5)
+    months = {
+        "2023-01": np.arange("2023-01-01", "2023-02-01", dtype="datetime64[6h]"),
+        "2023-02": np.arange("2023-02-01", "2023-03-01", dtype="datetime64[6h]"),
+    }
+    datasets = {}
+    for month, times in months.items():
+        with open(tmpdir.join(f"{month}.grib"), "wb") as f:
+            f.write(month.encode())
+        times = times.astype("datetime64[ns]")
+        datasets[month] = _grid_dataset(
+            rng.normal(size=(len(times), len(lats), len(lons))).astype(np.float32),
+            times,
+            lats,
+            lons,
+        )
+        data_store._build_grib_store(str(tmpdir), month, "10u", datasets[month])
+
+    # stores are used without decoding the GRIB files
+    with patch.object(
+        WeatherDataStore, "_load_weather_data", side_effect=AssertionError
+    ):
+        store = WeatherDataStore(["10u"], START, END, str(tmpdir))
+    assert store.weather_ds_map == {}
+    assert all(
+        isinstance(s.values, np.memmap) for s in store._samplers["10u"].samplers
+    )
+
+    track = {
+        "lon": rng.uniform(-71, -59, 300),
+        "lat": rng.uniform(39, 51, 300),
+        "time": rng.integers(1672531200, 1677628800, 300),
+    }
+    (result,) = store.yield_tracks_with_weather(t for t in [track])
+    expected = (
+        xr.concat(list(datasets.values()), dim="time")["u10"]
+        .sel(
+            latitude=xr.DataArray(track["lat"], dims="points"),
+            longitude=xr.DataArray(track["lon"], dims="points"),
+            time=xr.DataArray(
+                track["time"].astype("datetime64[s]").astype("datetime64[ns]"),
+                dims="points",
+            ),
+            method="nearest",
+        )
+        .values
+    )
+    np.testing.assert_array_equal(result["weather_data"]["10u"], expected)
+    store.close()
+
+    # stores are ignored once the GRIB file changes
+    os.utime(tmpdir.join("2023-02.grib"), (0, 0))
+    assert data_store._read_grib_store(str(tmpdir), "2023-01", "10u") is not None
+    assert data_store._read_grib_store(str(tmpdir), "2023-02", "10u") is None
+
+
+def test_lazy_load(monkeypatch):
+    from aisdb.weather import grid
+    from aisdb.webdata.load_raster import RasterCache
+
+    rng = np.random.default_rng(2)
+    lats, lons = np.arange(90, -91, -1.0), np.arange(0, 360, 1.0)
+    datasets = []
+    for start, end in (("2023-01-01", "2023-02-01"), ("2023-02-01", "2023-03-01")):
+        times = np.arange(start, end, dtype="datetime64[D]").astype("datetime64[ns]")
+        values = rng.normal(size=(len(times), len(lats), len(lons))).astype(np.float32)
+        datasets.append(_grid_dataset(values, times, lats, lons))
+
+    cache = RasterCache(maxbytes=4 * 8 * 16 * 16 * 4)
+    monkeypatch.setattr(grid, "weather_cache", cache)
+    monkeypatch.setattr(grid, "TILE_SHAPE", (8, 16, 16))
+    with patch.object(WeatherDataStore, "_open_weather_data", return_value={"10u": datasets}), patch.object(
+        WeatherDataStore, "_load_weather_data", side_effect=AssertionError
+    ):
+        store = WeatherDataStore(["10u"], START, END, WEATHER_DATA_PATH, lazy_load=True)
+    assert store.weather_ds_map == {}
+    assert all(isinstance(s, grid.TiledGridSampler) for s in store._samplers["10u"].samplers)
+    assert len(cache.tiles) == 0
+
+    decoded = []
+    _tile = grid.TiledGridSampler._tile
+
+    def counting_tile(self, tile_idx):
+        if cache.get((self.key, *tile_idx)) is None:
+            decoded.append(tuple(int(i) for i in tile_idx))
+        return _tile(self, tile_idx)
+
+    monkeypatch.setattr(grid.TiledGridSampler, "_tile", counting_tile)
+
+    # a regional track spanning the end of january only decodes the tiles it touches
+    track = {
+        "lon": rng.uniform(-65, -60, 200),
+        "lat": rng.uniform(43, 46, 200),
+        "time": rng.integers(1674950400, 1675296000, 200),
+    }
+    (result,) = store.yield_tracks_with_weather(t for t in [track])
+    expected = (
+        xr.concat(datasets, dim="time")["u10"]
+        .sel(
+            latitude=xr.DataArray(track["lat"], dims="points"),
+            longitude=xr.DataArray(track["lon"] % 360, dims="points"),
+            time=xr.DataArray(track["time"].astype("datetime64[s]").astype("datetime64[ns]"), dims="points"),
+            method="nearest",
+        )
+        .values
+    )
+    np.testing.assert_array_equal(result["weather_data"]["10u"], expected)
+    # the last days of january fall in time tile 3, the first days of february in tile 0 of the next month
+    assert sorted(decoded) == [(0, 2, 18), (3, 2, 18)]
+    assert len(cache.tiles) == 2
+    assert cache.nbytes <= cache.maxbytes
+    store.close()
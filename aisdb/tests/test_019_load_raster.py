@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, TiffImagePlugin, TiffTags
+
+from aisdb.aisdb import binarysearch_vector
+from aisdb.webdata import load_raster
+from aisdb.webdata.bathymetry import Gebco
+from aisdb.webdata.load_raster import RasterFile
+
+
+def _write_geotiff(imgpath, pixels, compression=None, x=-10.5, y=85.5, d=0.5):
+    """write a float32 raster with GDAL georeferencing tags. by default,
+    covering longitudes (-10, 10) and latitudes (-5, 5) at 0.5 degree
+    resolution"""
+    tags = TiffImagePlugin.ImageFileDirectory_v2()
+    tags[33922] = (0.0, 0.0, 0.0, x, y, 0.0)  # ModelTiepointTag
+    tags.tagtype[33922] = TiffTags.DOUBLE
+    tags[33550] = (d, d, 0.0)  # ModelPixelScaleTag
+    tags.tagtype[33550] = TiffTags.DOUBLE
+    img = Image.fromarray(pixels.astype(np.float32), mode="F")
+    img.save(imgpath, tiffinfo=tags, compression=compression)
+
+
+def test_RasterFile_coordinate_values(tmpdir):
+    pixels = np.arange(20 * 40, dtype=np.float32).reshape(20, 40)
+    track = dict(lon=np.array([-9.9, 0.1, 9.6, 3.3]), lat=np.array([-4.9, 0.2, 4.8, -1.1]), time=[0, 1, 2, 3],
+                 dynamic={"time"})
+
+    results = []
+    for compression in (None, "tiff_deflate"):
+        imgpath = os.path.join(tmpdir, f"raster_{compression}.tif")
+        _write_geotiff(imgpath, pixels, compression=compression)
+        with RasterFile(imgpath) as raster:
+            values = raster._track_coordinate_values(track)
+            idx = zip(binarysearch_vector(raster.xy[0], track["lon"]), binarysearch_vector(raster.xy[1], track["lat"]))
+            expected = list(map(raster.img.getpixel, idx))
+            assert isinstance(raster.pixels, np.memmap) == (compression is None)
+            assert np.allclose(values, expected)
+            assert np.allclose(raster._track_coordinate_values(track, rng=range(1, 3)), expected[1:3])
+            results.append(values)
+
+    assert np.array_equal(results[0], results[1])
+
+
+def test_RasterFile_tile_cache(tmpdir, monkeypatch):
+    pixels = np.arange(20 * 40, dtype=np.float32).reshape(20, 40)
+    imgpath = os.path.join(tmpdir, "raster_cache.tif")
+    _write_geotiff(imgpath, pixels)
+    track = dict(lon=np.linspace(-9.9, 9.9, 50), lat=np.linspace(-4.9, 4.9, 50), time=range(50), dynamic={"time"})
+
+    cache = load_raster.RasterCache(maxbytes=3 * 4 * 40 * 4)
+    monkeypatch.setattr(load_raster, "raster_cache", cache)
+    monkeypatch.setattr(load_raster, "TILE_ROWS", 4)
+    with RasterFile(imgpath) as raster:
+        values = raster._track_coordinate_values(track)
+        idx = zip(binarysearch_vector(raster.xy[0], track["lon"]), binarysearch_vector(raster.xy[1], track["lat"]))
+        assert np.array_equal(values, list(map(raster.img.getpixel, idx)))
+    assert len(cache.tiles) == 3
+    assert cache.nbytes <= cache.maxbytes
+
+
+def test_RasterFile_compressed_decoded_once(tmpdir, monkeypatch):
+    pixels = np.arange(20 * 40, dtype=np.float32).reshape(20, 40)
+    imgpath = os.path.join(tmpdir, "raster_compressed.tif")
+    _write_geotiff(imgpath, pixels, compression="tiff_deflate")
+    track = dict(lon=np.linspace(-9.9, 9.9, 50), lat=np.linspace(-4.9, 4.9, 50), time=range(50), dynamic={"time"})
+
+    cache = load_raster.RasterCache(maxbytes=4 * 40 * 4)
+    monkeypatch.setattr(load_raster, "raster_cache", cache)
+    monkeypatch.setattr(load_raster, "TILE_ROWS", 4)
+    opened = []
+    image_open = load_raster.Image.open
+    monkeypatch.setattr(load_raster.Image, "open", lambda *a, **kw: opened.append(a) or image_open(*a, **kw))
+    with RasterFile(imgpath) as raster:
+        first = raster._track_coordinate_values(track)
+        assert np.array_equal(raster._track_coordinate_values(track), first)
+        # the image is opened for metadata, then decoded once
+        assert len(opened) == 2
+        assert len(cache.tiles) == 0
+        with pytest.raises(IndexError):
+            raster._tile(5)
+
+
+def test_Gebco_raster_keys(tmpdir):
+    # four 90 x 180 degree rasters at 5 degree resolution
+    for n, s, w, e in ((90, 0, -180, 0), (90, 0, 0, 180), (0, -90, -180, 0), (0, -90, 0, 180)):
+        fname = f"gebco_2022_n{n:.1f}_s{s:.1f}_w{w:.1f}_e{e:.1f}.tif"
+        pixels = np.full((18, 36), n + e, dtype=np.float32)
+        _write_geotiff(os.path.join(tmpdir, fname), pixels, x=w - 5, y=n, d=5)
+
+    track = dict(lon=np.array([-100, 100, -100, 100, 179.9]), lat=np.array([45, 45, -45, -45, -89.9]), time=range(5),
+                 dynamic={"time"})
+    with Gebco(data_dir=str(tmpdir)) as bathy:
+        keys = bathy._raster_keys(track)
+        assert [key.split("_")[2:4] for key in keys] == [["n90.0", "s0.0"], ["n90.0", "s0.0"], ["n0.0", "s-90.0"],
+                                                        ["n0.0", "s-90.0"], ["n0.0", "s-90.0"]]
+        assert [key.split("_")[4] for key in keys] == ["w-180.0", "w0.0", "w-180.0", "w0.0", "w0.0"]
+        tracks = list(bathy.merge_tracks([track]))
+    assert tracks[0]["depth_metres"].tolist() == [-90, -270, 0, -180, -180]
+
+
+def test_RasterFile_tile_store(tmpdir):
+    pixels = np.arange(20 * 40, dtype=np.float32).reshape(20, 40)
+    imgpath = os.path.join(tmpdir, "raster_store.tif")
+    _write_geotiff(imgpath, pixels, compression="tiff_deflate")
+    track = dict(lon=np.linspace(-9.9, 9.9, 50), lat=np.linspace(-4.9, 4.9, 50), time=range(50), dynamic={"time"})
+
+    with RasterFile(imgpath) as raster:
+        assert raster.store is None
+        expected = raster._track_coordinate_values(track)
+    assert not os.path.isdir(f"{imgpath}.tiles")
+
+    with RasterFile(imgpath, tile_store=True) as raster:
+        assert raster.store is not None
+        assert np.array_equal(raster._track_coordinate_values(track), expected)
+    assert os.path.isfile(os.path.join(f"{imgpath}.tiles", "tile_0.npy"))
+
+    # subsequent instances memory-map the stored tiles
+    with RasterFile(imgpath) as raster:
+        assert raster.store is not None
+        assert np.array_equal(raster._track_coordinate_values(track), expected)
+        assert all(isinstance(tile, np.memmap) for tile in raster.store_tiles.values())
+
+    # the store is ignored once the source raster changes
+    os.utime(imgpath, (0, 0))
+    with RasterFile(imgpath) as raster:
+        assert raster.store is None
+
+
+def test_RasterFile_tile_store_concurrent_build(tmpdir, monkeypatch):
+    pixels = np.arange(20 * 40, dtype=np.float32).reshape(20, 40)
+    imgpath = os.path.join(tmpdir, "raster_race.tif")
+    _write_geotiff(imgpath, pixels)
+    storepath = f"{imgpath}.tiles"
+    monkeypatch.setattr(load_raster, "TILE_ROWS", 4)
+
+    # a store that is already current, and may be in use by another process, is kept in place
+    with RasterFile(imgpath, tile_store=True) as first, RasterFile(imgpath) as second:
+        inode = os.stat(storepath).st_ino
+        second.build_tile_store()
+        assert os.stat(storepath).st_ino == inode
+        assert np.array_equal(first._tile(1), pixels[4:8])
+        assert np.array_equal(second._tile(0), pixels[:4])
+
+    # another process installs its store between this process checking the store and moving its own into place
+    os.utime(imgpath, (0, 0))
+    replace = os.replace
+
+    def replace_after_other_process(src, dst):
+        if dst == storepath and not os.path.isdir(storepath):
+            monkeypatch.setattr(os, "replace", replace)
+            with RasterFile(imgpath, tile_store=True):
+                pass
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace_after_other_process)
+    with RasterFile(imgpath, tile_store=True) as raster:
+        assert raster.store is not None
+        assert np.array_equal(raster._tile(0), pixels[:4])
+    assert os.stat(storepath).st_ino != inode
+    assert sorted(os.listdir(tmpdir)) == ["raster_race.tif", "raster_race.tif.tiles"]
@@ -0,0 +1,38 @@
+import threading
+
+import numpy as np
+from pyproj import Geod
+
+from aisdb.proj import azimuth, get_geod, get_transformer
+
+
+def test_get_transformer_cached_per_thread():
+    fwd = get_transformer(4326, 3857)
+    assert get_transformer(4326, 3857) is fwd
+    assert get_transformer(3857, 4326) is not fwd
+    assert get_geod() is get_geod()
+
+    others = []
+    thread = threading.Thread(target=lambda: others.append(get_transformer(4326, 3857)))
+    thread.start()
+    thread.join()
+    assert others[0] is not fwd
+
+    x, y = fwd.transform([-63.5], [44.6])
+    assert np.allclose(get_transformer(3857, 4326).transform(x, y), ([-63.5], [44.6]))
+
+
+def test_azimuth_approximate():
+    rng = np.random.default_rng(0)
+    lon1, lat1 = rng.uniform(-180, 180, 1000), rng.uniform(-80, 80, 1000)
+    lon2, lat2 = lon1 + rng.normal(0, 0.05, 1000), lat1 + rng.normal(0, 0.05, 1000)
+
+    exact, _, _ = Geod(ellps="WGS84").inv(lon1, lat1, lon2, lat2)
+    assert np.array_equal(azimuth(lon1, lat1, lon2, lat2), exact)
+
+    approx = azimuth(lon1, lat1, lon2, lat2, approximate=True)
+    error = np.abs((approx - exact + 180) % 360 - 180)
+    assert error.max() < 0.1
+
+    # crossing the antimeridian
+    assert abs(azimuth([179.99], [0], [-179.99], [0], approximate=True)[0] - 90) < 1e-6
@@ -0,0 +1,108 @@
+import pickle
+from datetime import timedelta
+
+import h3
+import numpy as np
+from shapely.geometry import box
+
+from aisdb.discretize.aggregate import (
+    CellAggregator,
+    cell_to_children_range,
+    cell_to_parent,
+)
+from aisdb.discretize.h3 import Discretizer
+
+
+def test_get_h3_indexes():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-89, 89, 200), rng.uniform(-180, 180, 200)
+    discretizer = Discretizer(resolution=6)
+
+    cells = discretizer.get_h3_indexes(lat, lon)
+    assert cells.dtype == np.uint64
+    assert [h3.int_to_str(int(c)) for c in cells] == [discretizer.get_h3_index(y, x) for y, x in zip(lat, lon)]
+
+    # invalid coordinates are assigned the null index
+    assert discretizer.get_h3_indexes([np.nan, 45.0], [-63.0, np.inf]).tolist() == [0, 0]
+
+
+def test_yield_tracks_discretized_by_indexes():
+    track = dict(lon=np.array([-63.5, -63.4]), lat=np.array([44.6, 44.7]), time=np.array([0, 60]), static=set(),
+                 dynamic={"lon", "lat", "time"})
+    discretizer = Discretizer(resolution=8)
+    result = next(discretizer.yield_tracks_discretized_by_indexes([track]))
+    assert result["h3_index"].dtype == np.uint64
+    assert h3.int_to_str(int(result["h3_index"][0])) == discretizer.get_h3_index(44.6, -63.5)
+
+
+def _sample_tracks(ntracks=100):
+    rng = np.random.default_rng(1)
+    tracks = []
+    for _ in range(ntracks):
+        n = int(rng.integers(1, 30))
+        tracks.append(dict(mmsi=316000000 + int(rng.integers(0, 20)), lon=-63 + np.cumsum(rng.normal(0, 0.02, n)),
+                           lat=44 + np.cumsum(rng.normal(0, 0.02, n)), time=np.cumsum(rng.integers(0, 3000, n)),
+                           sog=rng.uniform(0, 20, n), static={"mmsi"}, dynamic={"lon", "lat", "time", "sog"}, ))
+    return tracks
+
+
+def test_cell_to_parent():
+    cells = Discretizer(resolution=9).get_h3_indexes(np.linspace(-80, 80, 50), np.linspace(-179, 179, 50))
+    for res in (0, 4, 9):
+        expected = [h3.str_to_int(h3.cell_to_parent(h3.int_to_str(int(c)), res)) for c in cells]
+        assert cell_to_parent(cells, res).tolist() == expected
+
+
+def test_get_cells_from_polygon():
+    discretizer = Discretizer(resolution=7)
+    cells = discretizer.get_cells_from_polygon(box(-64, 44, -63, 45), compact=False)
+    compacted = discretizer.get_cells_from_polygon(box(-64, 44, -63, 45))
+    assert cells.dtype == compacted.dtype == np.uint64
+    assert len(compacted) < len(cells)
+
+    # every cell lies within the descendant range of exactly one compacted cell
+    lo, hi = cell_to_children_range(compacted, 7)
+    inside = (cells[:, None] >= lo) & (cells[:, None] <= hi)
+    assert (inside.sum(axis=1) == 1).all()
+    assert inside.any(axis=0).all()
+
+
+def test_CellAggregator_counts():
+    tracks = _sample_tracks()
+    agg = CellAggregator(resolutions=(6,), max_gap=timedelta(minutes=30)).update(tracks)
+    table = agg.table(6)
+
+    discretizer = Discretizer(resolution=6)
+    cells = np.concatenate([discretizer.get_h3_indexes(t["lat"], t["lon"]) for t in tracks])
+    sog = np.concatenate([t["sog"] for t in tracks])
+    mmsi = np.concatenate([np.full(len(t["time"]), t["mmsi"]) for t in tracks])
+    dwell = np.concatenate([np.append(np.minimum(np.diff(t["time"]), 1800), 0) for t in tracks])
+
+    assert table["cell"].tolist() == sorted(set(cells.tolist()))
+    for i, cell in enumerate(table["cell"]):
+        mask = cells == cell
+        assert table["points"][i] == np.count_nonzero(mask)
+        assert table["vessels"][i] == len(set(mmsi[mask]))
+        assert np.isclose(table["dwell_seconds"][i], dwell[mask].sum())
+        assert np.isclose(table["mean_sog"][i], sog[mask].mean())
+
+
+def test_CellAggregator_merge_rollup():
+    tracks = _sample_tracks()
+    for unique in ("exact", "hll"):
+        whole = CellAggregator(resolutions=(5, 7), unique=unique).update(tracks)
+        part = CellAggregator(resolutions=(5, 7), unique=unique, flush_points=100).update(tracks[:40])
+        rest = pickle.loads(pickle.dumps(CellAggregator(resolutions=(5, 7), unique=unique).update(tracks[40:])))
+        part.merge(rest)
+        for res in (5, 7):
+            for key, values in whole.table(res).items():
+                assert np.allclose(part.table(res)[key], values, equal_nan=True), (unique, res, key)
+
+        # parent roll-ups sum the counts of child cells
+        whole.rollup(3)
+        table, children = whole.table(3), whole.table(5)
+        parents = cell_to_parent(children["cell"], 3)
+        assert table["cell"].tolist() == sorted(set(parents.tolist()))
+        for i, cell in enumerate(table["cell"]):
+            assert table["points"][i] == children["points"][parents == cell].sum()
+            assert table["vessels"][i] <= 20 + (unique == "hll")
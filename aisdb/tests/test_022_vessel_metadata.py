@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from aisdb import sqlpath
+from aisdb.web_interface import serialize_track_json
+from aisdb.webdata.marinetraffic import VesselInfo, VesselMetadata, vessel_info
+from aisdb.wsa import _wsa, wetted_surface_area, wsa_from_metadata
+
+with open(os.path.join(sqlpath, "insert_webdata_marinetraffic_sqlite.sql"), "r") as f:
+    _insert_sql = f.read()
+
+
+def _insert_vessels(trafficDB, mmsis, vesseltype="Cargo"):
+    rows = [(mmsi, 9000000 + i, f"vessel {mmsi}", vesseltype, f"{vesseltype} Ship", None, "CA", 1000, 5000 + i, None, 2000,
+             None) for i, mmsi in enumerate(mmsis)]
+    with trafficDB as conn:
+        conn.executemany(_insert_sql, rows)
+
+
+def test_VesselMetadata_lookup(tmpdir):
+    with VesselInfo(os.path.join(tmpdir, "vinfo.db")) as vinfo:
+        _insert_vessels(vinfo.trafficDB, [316000003, 316000001, 316000002])
+        meta = VesselMetadata(vinfo.trafficDB)
+        assert len(meta) == 3
+
+        idx = meta.lookup([316000002, 123, 316000003])
+        assert idx[1] == -1
+        assert meta.mmsi[idx[0]] == 316000002
+        assert np.array_equal(meta.column("summer_dwt", idx), [5002, np.nan, 5000], equal_nan=True)
+        assert meta.column("vesseltype_generic", idx).tolist() == ["Cargo", None, "Cargo"]
+        assert meta.info(idx[2]) == dict(vinfo.trafficDB.execute("SELECT * FROM webdata_marinetraffic WHERE mmsi = 316000003").fetchone())
+
+        tracks = [dict(mmsi=mmsi, static={"mmsi"}, ship_type=70) for mmsi in (316000001, 123)]
+        tracks = list(wetted_surface_area(vessel_info(tracks, meta)))
+        assert tracks[0]["marinetraffic_info"]["name"] == "vessel 316000001"
+        assert tracks[1]["marinetraffic_info"]["error404"] == 1
+        assert tracks[0]["submerged_hull_m^2"] == next(wetted_surface_area([dict(mmsi=316000001, static=set(), ship_type=0)], metadata=meta))["submerged_hull_m^2"]
+
+        assert np.allclose(wsa_from_metadata([316000001, 123], meta, ship_type=[0, 30]), [_wsa(5001, "Cargo", "Cargo Ship"), 0])
+
+        track = dict(mmsi=316000001, static={"mmsi"}, time=[0], lon=[0.0], lat=[0.0])
+        _, meta_json = serialize_track_json(track, metadata=meta)
+        assert b'"summer_dwt":5001' in meta_json
+
+
+def test_VesselMetadata_store(tmpdir):
+    dbpath = os.path.join(tmpdir, "vinfo.db")
+    with VesselInfo(dbpath) as vinfo:
+        _insert_vessels(vinfo.trafficDB, [316000001, 316000002])
+        assert len(vinfo.metadata) == 2
+    assert os.path.isfile(os.path.join(f"{dbpath}.columns", "meta.json"))
+
+    # subsequent instances memory-map the stored columns
+    with VesselInfo(dbpath) as vinfo:
+        assert isinstance(vinfo.metadata.mmsi, np.memmap)
+        assert isinstance(vinfo.metadata.columns["summer_dwt"], np.memmap)
+
+        # new and removed vessels are merged into the store
+        _insert_vessels(vinfo.trafficDB, [316000000], vesseltype="Tanker")
+        with vinfo.trafficDB as conn:
+            conn.execute("UPDATE webdata_marinetraffic SET error404 = 1 WHERE mmsi = 316000002")
+    with VesselInfo(dbpath) as vinfo:
+        meta = vinfo.metadata
+        assert meta.mmsi.tolist() == [316000000, 316000001]
+        assert meta.column("vesseltype_generic", [0, 1]).tolist() == ["Tanker", "Cargo"]
+
+        # updated rows are read again when given explicitly
+        with vinfo.trafficDB as conn:
+            conn.execute("UPDATE webdata_marinetraffic SET name = 'renamed' WHERE mmsi = 316000001")
+        meta.refresh([316000001])
+        assert meta.info(meta.lookup(316000001))["name"] == "renamed"
+    with VesselInfo(dbpath) as vinfo:
+        assert vinfo.metadata.info(1)["name"] == "renamed"
+
+        # rows updated in place are read again by subsequent instances
+        with vinfo.trafficDB as conn:
+            conn.execute("UPDATE webdata_marinetraffic SET summer_dwt = 1 WHERE mmsi = 316000000")
+    with VesselInfo(dbpath) as vinfo:
+        assert vinfo.metadata.info(0)["summer_dwt"] == 1
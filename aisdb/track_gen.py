@@ -212,6 +212,7 @@ def split_tracks(
     min_speed=0.2,
     min_segment_length=15,
     min_direction_change=45,
+    approximate=False,
 ):
     """
     Segments AIS tracks based on multiple criteria such as course changes, speed, distance, and time gaps.
@@ -223,6 +224,7 @@ def split_tracks(
         min_speed (float): Minimum allowable speed (knots).
         min_segment_length (int): Minimum number of points required in a segment.
         min_direction_change (float): Minimum course change (degrees) to start a new segment.
+        approximate (bool): Calculate courses with a local equirectangular approximation instead of WGS84 geodesics.
     """
     mmsi_count = {}  # Dictionary to keep track of MMSI indices
     for track in tracks:
@@ -234,6 +236,7 @@ def split_tracks(
             min_speed,
             min_segment_length,
             min_direction_change,
+            approximate,
         ):
             assert len(rng) > 0
 
@@ -266,6 +269,10 @@ def split_tracks(
 def fence_tracks(tracks, domain):
     """compute points-in-polygons for vessel positions within domain polygons
 
+    the 'in_zone' column holds integer zone codes, where 0 indicates
+    positions outside of all zones. zone names can be looked up with
+    ``domain.zone_names[track['in_zone']]``
+
     yields track dictionaries
     """
     assert isinstance(domain, Domain), "Not a domain object"
@@ -273,13 +280,7 @@ def fence_tracks(tracks, domain):
     for track in tracks:
         assert isinstance(track, dict)
         if "in_zone" not in track.keys():
-            track["in_zone"] = np.array(
-                [
-                    domain.point_in_polygon(x, y)
-                    for x, y in zip(track["lon"], track["lat"])
-                ],
-                dtype=object,
-            )
+            track["in_zone"] = domain.points_in_polygons(track["lon"], track["lat"])
             track["dynamic"] = set(track["dynamic"]).union(set(["in_zone"]))
         yield track
 
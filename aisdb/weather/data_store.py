@@ -5,11 +5,14 @@ import shutil
 import tempfile
 import types
 from collections import defaultdict
+from functools import partial
 
 import numpy as np
 import xarray as xr
 
 from aisdb.database.decoder import fast_unzip
+from aisdb.proc_util import _install_store, _read_store_meta
+from aisdb.weather.grid import ConcatGridSampler, GridSampler, TiledGridSampler
 from aisdb.weather.utils import SHORT_NAMES_TO_VARIABLES
 from aisdb.weather.weather_fetch import ClimateDataStore
 
@@ -69,6 +72,93 @@ def get_monthly_range(start, end) -> list:
     return months
 
 
+def _grib_source_path(weather_data_path, month):
+    """
+    Path of the GRIB file for a month, either zipped or uncompressed.
+    """
+    grib_path = f"{weather_data_path}/{month}.grib"
+    zip_path = f"{grib_path}.zip"
+    if os.path.exists(zip_path):
+        return zip_path
+    if os.path.exists(grib_path):
+        return grib_path
+    raise FileNotFoundError(
+        f"Neither {zip_path} nor {grib_path} found for month: {month}"
+    )
+
+
+def _grib_store_path(weather_data_path, month, short_name):
+    return os.path.join(weather_data_path, f"{month}.store", short_name)
+
+
+def _grib_store_current(weather_data_path, month, meta):
+    try:
+        stat = os.stat(_grib_source_path(weather_data_path, month))
+    except FileNotFoundError:
+        return False
+    return meta["source_size"] == stat.st_size and meta["source_mtime"] == stat.st_mtime
+
+
+def _read_grib_store(weather_data_path, month, short_name):
+    """
+    Open the decoded store of a weather variable for one month.
+
+    Returns:
+        GridSampler over the memory-mapped values, or None if the store is
+        missing or was built from a different version of the GRIB file.
+    """
+    storepath = _grib_store_path(weather_data_path, month, short_name)
+    meta = _read_store_meta(storepath)
+    if meta is None or not _grib_store_current(weather_data_path, month, meta):
+        return None
+    return GridSampler(
+        np.load(os.path.join(storepath, "values.npy"), mmap_mode="r"),
+        np.load(os.path.join(storepath, "time.npy")),
+        np.load(os.path.join(storepath, "latitude.npy")),
+        np.load(os.path.join(storepath, "longitude.npy")),
+    )
+
+
+def _build_grib_store(weather_data_path, month, short_name, ds):
+    """
+    Decode a weather variable for one month into a directory of .npy arrays:
+    the (time, latitude, longitude) values, the coordinate axes, and a
+    meta.json recording the GRIB file it was built from.
+
+    The store is written to a temporary directory and moved into place, so
+    that concurrent processes never read a partially written store.
+
+    Returns:
+        GridSampler over the memory-mapped values
+    """
+    sampler = GridSampler.from_dataset(ds)
+    if sampler is None:
+        raise ValueError(
+            f"{short_name} is not a single (time, latitude, longitude) variable"
+        )
+
+    def save(tmppath):
+        np.save(os.path.join(tmppath, "values.npy"), sampler.values)
+        np.save(os.path.join(tmppath, "time.npy"), sampler.time)
+        np.save(os.path.join(tmppath, "latitude.npy"), sampler.latitude)
+        np.save(os.path.join(tmppath, "longitude.npy"), sampler.longitude)
+
+    stat = os.stat(_grib_source_path(weather_data_path, month))
+    meta = dict(
+        source_size=stat.st_size,
+        source_mtime=stat.st_mtime,
+        shape=list(sampler.values.shape),
+        dtype=sampler.values.dtype.str,
+    )
+    _install_store(
+        _grib_store_path(weather_data_path, month, short_name),
+        save,
+        meta,
+        is_current=partial(_grib_store_current, weather_data_path, month),
+    )
+    return _read_grib_store(weather_data_path, month, short_name)
+
+
 class WeatherDataStore:
     def __init__(
         self,
@@ -77,6 +167,8 @@ class WeatherDataStore:
         end: datetime.datetime,
         weather_data_path: str,
         download_from_cds: bool = False,
+        grib_store: bool = False,
+        lazy_load: bool = False,
         **kwargs,
     ):
         """
@@ -87,6 +179,14 @@ class WeatherDataStore:
             start (datetime): Start date for the weather data.
             end (datetime): End date for the weather data.
             weather_data_path (str): Path to the directory containing weather data files.
+            download_from_cds (bool): If True, download the GRIB files from the Climate Data Store first.
+            grib_store (bool): If True, each month of each variable is decoded once into a store of
+                memory-mapped arrays next to the GRIB files, at weather_data_path/<yyyy-mm>.store/<shortName>.
+                Existing stores are always used when they are up to date with the GRIB files, so subsequent
+                instances in any process load without decoding.
+            lazy_load (bool): If True, GRIB data is not loaded up front. Only the tiles of each variable
+                containing sampled track positions are decoded, and are kept in the least-recently-used
+                aisdb.weather.grid.weather_cache. Takes effect when no up-to-date GRIB stores exist.
 
         Example:
             >>> store = WeatherDataStore(['10u', '10v'], datetime.datetime(2023, 1, 1), datetime.datetime(2023, 2, 1), '/data/weather')
@@ -135,7 +235,16 @@ class WeatherDataStore:
 
             climateDataStore.download_grib_file(output_folder=weather_data_path)
 
-        self.weather_ds_map = self._load_weather_data()
+        self._tmp_dir = None
+        self._lazy_datasets = []
+        self._samplers = self._load_grib_stores(build=grib_store)
+        if self._samplers is not None:
+            self.weather_ds_map = {}
+        elif lazy_load:
+            self._samplers, self.weather_ds_map = self._load_tiled_samplers()
+        else:
+            self._samplers = {}
+            self.weather_ds_map = self._load_weather_data()
 
     def extract_weather(self, latitude, longitude, time) -> dict:
         """
@@ -159,7 +268,12 @@ class WeatherDataStore:
         dt = dt_to_iso8601(time)
         values = {}
 
-        for short_name, ds in self.weather_ds_map.items():
+        for short_name in self._loaded_short_names():
+            sampler = self._get_sampler(short_name)
+            if sampler is not None:
+                values[short_name] = sampler.sample([longitude], [latitude], [time])[0]
+                continue
+            ds = self.weather_ds_map[short_name]
             for var_da in ds.data_vars:
                 selected = ds[var_da].sel(
                     latitude=latitude, longitude=longitude, time=dt, method="nearest"
@@ -167,34 +281,108 @@ class WeatherDataStore:
                 values[short_name] = selected.values
         return values
 
-    def _load_weather_data(self) -> dict:
+    def _loaded_short_names(self):
         """
-        Load and extract weather data from GRIB files for the given date range,
-        organized by shortName.
+        shortNames of all loaded variables, whether from GRIB stores or datasets.
+        """
+        return list(dict.fromkeys([*self._samplers, *self.weather_ds_map]))
 
-        Returns:
-            dict: A dictionary where each key is a weather shortName and each value
-                is an xarray.Dataset merged across all months for that variable.
+    def _get_sampler(self, short_name):
+        """
+        Get the index-based sampler for a weather variable, creating it on first use.
+        Returns None if the dataset cannot be sampled as a (time, latitude, longitude)
+        grid, in which case label-based selection is used instead.
+        """
+        if short_name not in self._samplers:
+            self._samplers[short_name] = GridSampler.from_dataset(
+                self.weather_ds_map[short_name]
+            )
+        return self._samplers[short_name]
+
+    def _load_grib_stores(self, build=False):
         """
-        tmp_dir = tempfile.mkdtemp()
-        zipped_grib_files = []
+        Load every requested variable from decoded GRIB stores.
 
-        # Collect zipped files or copy .grib directly
+        Args:
+            build (bool): If True, decode and store any missing months.
+
+        Returns:
+            dict: Samplers keyed by shortName, or None if a store is missing and
+                build is False.
+        """
+        missing = {}
+        chunks = defaultdict(list)
         for month in self.months:
-            grib_path = f"{self.weather_data_path}/{month}.grib"
-            zip_path = f"{grib_path}.zip"
+            for short_name in self.short_names:
+                sampler = _read_grib_store(self.weather_data_path, month, short_name)
+                if sampler is None:
+                    if not build:
+                        return None
+                    missing.setdefault(month, []).append(short_name)
+                chunks[short_name].append(sampler)
+
+        for month, short_names in missing.items():
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                grib_file_path = self._extract_grib(month, tmp_dir)
+                for short_name in short_names:
+                    try:
+                        with xr.open_dataset(
+                            grib_file_path,
+                            engine="cfgrib",
+                            backend_kwargs={
+                                "filter_by_keys": {"shortName": short_name}
+                            },
+                        ) as ds:
+                            sampler = _build_grib_store(
+                                self.weather_data_path, month, short_name, ds
+                            )
+                    except (OSError, ValueError, KeyError) as err:
+                        logger.warning(
+                            "failed to load %s from %s: %s",
+                            short_name,
+                            grib_file_path,
+                            err,
+                        )
+                        continue
+                    chunks[short_name][self.months.index(month)] = sampler
+
+        samplers = {
+            short_name: ConcatGridSampler([c for c in chunk if c is not None])
+            for short_name, chunk in chunks.items()
+            if any(c is not None for c in chunk)
+        }
+        if not samplers:
+            raise RuntimeError("No weather datasets could be loaded or merged.")
+        return samplers
 
-            if os.path.exists(zip_path):
-                zipped_grib_files.append(zip_path)
-            elif os.path.exists(grib_path):
-                shutil.copy(grib_path, f"{tmp_dir}/{month}.grib")
-            else:
-                raise FileNotFoundError(
-                    f"Neither {zip_path} nor {grib_path} found for month: {month}"
-                )
+    def _extract_grib(self, month, tmp_dir):
+        """
+        Copy or unzip the GRIB file for a month into a temporary directory.
+
+        Returns:
+            str: Path of the extracted GRIB file.
+        """
+        source_path = _grib_source_path(self.weather_data_path, month)
+        grib_file_path = f"{tmp_dir}/{month}.grib"
+        if source_path.endswith(".zip"):
+            fast_unzip([source_path], tmp_dir)
+        else:
+            shutil.copy(source_path, grib_file_path)
+        return grib_file_path
+
+    def _open_weather_data(self) -> dict:
+        """
+        Lazily open the GRIB files for the given date range, organized by shortName.
 
-        if zipped_grib_files:
-            fast_unzip(zipped_grib_files, tmp_dir)
+        Returns:
+            dict: A dictionary where each key is a weather shortName and each value
+                is a list of xarray.Dataset, one per month.
+        """
+        # datasets are opened lazily from the extracted files, which are
+        # removed when the store is closed
+        tmp_dir = self._tmp_dir = tempfile.mkdtemp()
+        for month in self.months:
+            self._extract_grib(month, tmp_dir)
 
         # Group datasets by shortName
         shortname_to_datasets = defaultdict(list)
@@ -225,7 +413,12 @@ class WeatherDataStore:
                         err,
                     )
 
-        # Merge across time for each shortName
+        return shortname_to_datasets
+
+    def _merge_weather_data(self, shortname_to_datasets) -> dict:
+        """
+        Merge the monthly datasets of each shortName across time.
+        """
         merged_per_shortname = {}
         for short_name, datasets in shortname_to_datasets.items():
             try:
@@ -235,12 +428,51 @@ class WeatherDataStore:
                 raise RuntimeError(
                     f"could not merge weather datasets for {short_name}"
                 ) from err
+        return merged_per_shortname
+
+    def _load_weather_data(self) -> dict:
+        """
+        Load and extract weather data from GRIB files for the given date range,
+        organized by shortName.
+
+        Returns:
+            dict: A dictionary where each key is a weather shortName and each value
+                is an xarray.Dataset merged across all months for that variable.
+        """
+        merged_per_shortname = self._merge_weather_data(self._open_weather_data())
 
         if merged_per_shortname:
             return merged_per_shortname
         else:
             raise RuntimeError("No weather datasets could be loaded or merged.")
 
+    def _load_tiled_samplers(self):
+        """
+        Open the GRIB files for the given date range without loading them, and
+        create a tiled sampler over the monthly datasets of each shortName.
+
+        Variables that cannot be sampled as a (time, latitude, longitude) grid
+        are merged across time instead, as in _load_weather_data.
+
+        Returns:
+            tuple: Samplers keyed by shortName, and merged datasets keyed by shortName.
+        """
+        shortname_to_datasets = self._open_weather_data()
+        samplers, unsampled = {}, {}
+        for short_name, datasets in shortname_to_datasets.items():
+            chunks = [TiledGridSampler.from_dataset(ds) for ds in datasets]
+            if all(chunk is not None for chunk in chunks):
+                samplers[short_name] = ConcatGridSampler(chunks)
+                self._lazy_datasets.extend(datasets)
+            else:
+                unsampled[short_name] = datasets
+        merged_per_shortname = self._merge_weather_data(unsampled)
+
+        if samplers or merged_per_shortname:
+            return samplers, merged_per_shortname
+        else:
+            raise RuntimeError("No weather datasets could be loaded or merged.")
+
     def yield_tracks_with_weather(self, tracks) -> dict:
         """
         Yields tracks with weather by selecting weather variables for each point in the track.
@@ -259,17 +491,26 @@ class WeatherDataStore:
             latitudes = np.array(track["lat"])
             timestamps = np.array(track["time"])
 
-            dt = [dt_to_iso8601(t) for t in timestamps]
+            weather_data_dict = {}
+            lat_da = lon_da = time_da = None
 
-            # Prepare selection coordinates
-            lat_da = xr.DataArray(latitudes, dims="points", name="latitude")
-            lon_da = xr.DataArray(longitudes, dims="points", name="longitude")
-            time_da = xr.DataArray(dt, dims="points", name="time")
+            for short_name in self._loaded_short_names():
+                sampler = self._get_sampler(short_name)
+                if sampler is not None:
+                    weather_data_dict[short_name] = sampler.sample(
+                        longitudes, latitudes, timestamps
+                    )
+                    continue
 
-            weather_data_dict = {}
+                ds = self.weather_ds_map[short_name]
+
+                if time_da is None:
+                    # Prepare selection coordinates
+                    dt = [dt_to_iso8601(t) for t in timestamps]
+                    lat_da = xr.DataArray(latitudes, dims="points", name="latitude")
+                    lon_da = xr.DataArray(longitudes, dims="points", name="longitude")
+                    time_da = xr.DataArray(dt, dims="points", name="time")
 
-            # Iterate over the shortName → Dataset map
-            for short_name, ds in self.weather_ds_map.items():
                 try:
                     for var_da in ds.data_vars:
                         selected = ds[var_da].sel(
@@ -292,9 +533,16 @@ class WeatherDataStore:
         """
         Close the weather dataset.
         """
+        self._samplers.clear()
         for _, ds in self.weather_ds_map.items():
             if isinstance(ds, xr.Dataset):
                 ds.close()
+        for ds in self._lazy_datasets:
+            ds.close()
+        self._lazy_datasets.clear()
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
 
     def _check_available_short_names(self, short_names):
         for short_name in short_names:
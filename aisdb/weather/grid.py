@@ -0,0 +1,285 @@
+import itertools
+
+import numpy as np
+import xarray as xr
+
+from aisdb.webdata.load_raster import RasterCache
+
+# shape of each tile (time steps, latitudes, longitudes) decoded by
+# TiledGridSampler
+TILE_SHAPE = (24, 64, 64)
+
+# least-recently-used cache of decoded weather tiles, shared by all
+# TiledGridSampler instances. the memory budget may be adjusted by setting
+# weather_cache.maxbytes
+weather_cache = RasterCache(maxbytes=1024**3)
+
+_tiled_sampler_ids = itertools.count()
+
+
+def _nearest_index(axis, values, period=None):
+    """
+    Map values to the index of the nearest coordinate on a sorted axis.
+
+    Regular axes are resolved by arithmetic on the grid spacing, irregular
+    axes by binary search. Values outside of the axis are clipped to the
+    first or last index, and ties are broken towards the larger coordinate,
+    matching ``xarray.DataArray.sel(method="nearest")``.
+
+    Args:
+        axis (np.ndarray): Ascending or descending 1-D coordinate array.
+        values (np.ndarray): Coordinates to locate.
+        period (float): If given and a regular axis spans exactly one
+            period, e.g. 360 for global longitudes, indices wrap around
+            instead of being clipped.
+
+    Returns:
+        np.ndarray: Integer indices into `axis`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(axis)
+    if n == 1:
+        return np.zeros(values.shape, dtype=np.intp)
+
+    step = np.diff(axis)
+    if np.allclose(step, step[0], rtol=1e-9, atol=0):
+        pos = (values - axis[0]) / step[0]
+        if step[0] > 0:
+            idx = np.floor(pos + 0.5)
+        else:
+            idx = np.ceil(pos - 0.5)
+        idx = np.nan_to_num(idx)
+        if period is not None and np.isclose(abs(step[0]) * n, period):
+            return (idx % n).astype(np.intp)
+        return np.clip(idx, 0, n - 1).astype(np.intp)
+
+    descending = axis[0] > axis[-1]
+    asc = axis[::-1] if descending else axis
+    right = np.clip(np.searchsorted(asc, values), 1, n - 1)
+    left = right - 1
+    idx = np.where(values - asc[left] < asc[right] - values, left, right)
+    return (n - 1 - idx) if descending else idx
+
+
+class GridSampler:
+    def __init__(self, values, time, latitude, longitude):
+        """
+        Sample a gridded weather variable at track positions by nearest
+        neighbour lookup.
+
+        Grid axes are precomputed once, and each call maps coordinate arrays
+        to integer indices, then gathers values from the cube in a single
+        vectorised indexing operation.
+
+        Args:
+            values (np.ndarray): Array of shape (time, latitude, longitude).
+                May be an in-memory array or a np.memmap.
+            time (np.ndarray): Timestamps of the first axis, in seconds since epoch.
+            latitude (np.ndarray): Latitudes of the second axis, ascending or descending.
+            longitude (np.ndarray): Longitudes of the third axis, either in the
+                range [-180, 180] or [0, 360].
+
+        Example:
+            >>> sampler = GridSampler.from_dataarray(ds["u10"])
+            >>> sampler.sample(track["lon"], track["lat"], track["time"])
+        """
+        self.values = values
+        self.time = np.asarray(time, dtype=np.float64)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        assert self.values.shape == (
+            len(self.time),
+            len(self.latitude),
+            len(self.longitude),
+        ), "values must have shape (time, latitude, longitude)"
+        self.lon360 = self.longitude.max() > 180
+
+    @classmethod
+    def from_dataarray(cls, da):
+        """
+        Create a sampler from an xarray DataArray with time, latitude, and
+        longitude dimensions. The data is loaded into memory.
+
+        Args:
+            da (xr.DataArray): Gridded variable, e.g. as opened by cfgrib.
+
+        Returns:
+            GridSampler
+        """
+        da = da.transpose("time", "latitude", "longitude")
+        time = da["time"].values.astype("datetime64[s]").astype(np.int64)
+        return cls(
+            np.asarray(da.values),
+            time,
+            da["latitude"].values,
+            da["longitude"].values,
+        )
+
+    @classmethod
+    def from_dataset(cls, ds):
+        """
+        Create a sampler from an xarray Dataset holding a single variable.
+
+        Returns:
+            GridSampler, or None if the dataset does not hold exactly one
+            variable with time, latitude, and longitude dimensions.
+        """
+        if not isinstance(ds, xr.Dataset) or len(ds.data_vars) != 1:
+            return None
+        (da,) = ds.data_vars.values()
+        if set(da.dims) != {"time", "latitude", "longitude"}:
+            return None
+        return cls.from_dataarray(da)
+
+    def indices(self, lon, lat, time):
+        """
+        Map coordinate arrays to indices of the time, latitude, and
+        longitude axes of the grid.
+
+        Returns:
+            tuple: Three integer arrays (time, latitude, longitude indices).
+        """
+        return (_nearest_index(self.time, time), *self._spatial_indices(lon, lat))
+
+    def _spatial_indices(self, lon, lat):
+        lon = np.asarray(lon, dtype=np.float64)
+        if self.lon360:
+            lon = lon % 360
+        return (
+            _nearest_index(self.latitude, lat),
+            _nearest_index(self.longitude, lon, period=360),
+        )
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def _gather(self, idx_time, idx_lat, idx_lon):
+        return self.values[idx_time, idx_lat, idx_lon]
+
+    def sample(self, lon, lat, time):
+        """
+        Gather the grid values nearest to each position.
+
+        Args:
+            lon (np.ndarray): Longitudes.
+            lat (np.ndarray): Latitudes.
+            time (np.ndarray): Timestamps in seconds since epoch.
+
+        Returns:
+            np.ndarray: Sampled values, one per position.
+        """
+        return self._gather(*self.indices(lon, lat, time))
+
+
+class TiledGridSampler(GridSampler):
+    def __init__(self, da, tile_shape=None):
+        """
+        Sample a lazily opened gridded variable, decoding only the tiles of
+        the grid that contain sampled positions.
+
+        The grid is divided into tiles of TILE_SHAPE (time, latitude,
+        longitude) cells. Tiles are read from the underlying dataset on
+        first use and kept in the shared weather_cache, so memory use is
+        proportional to the spatio-temporal extent of the sampled tracks
+        rather than to the size of the dataset.
+
+        Args:
+            da (xr.DataArray): Lazily loaded variable with time, latitude,
+                and longitude dimensions, e.g. as opened by cfgrib.
+            tile_shape (tuple): Tile shape overriding TILE_SHAPE.
+        """
+        da = da.transpose("time", "latitude", "longitude")
+        self.da = da
+        self.tile_shape = np.array(tile_shape or TILE_SHAPE)
+        self.key = next(_tiled_sampler_ids)
+        self.time = da["time"].values.astype("datetime64[s]").astype(np.float64)
+        self.latitude = np.asarray(da["latitude"].values, dtype=np.float64)
+        self.longitude = np.asarray(da["longitude"].values, dtype=np.float64)
+        self.lon360 = self.longitude.max() > 180
+
+    @classmethod
+    def from_dataarray(cls, da):
+        """
+        Create a sampler from an xarray DataArray without loading its data.
+        """
+        return cls(da)
+
+    @property
+    def dtype(self):
+        return self.da.dtype
+
+    def _tile(self, tile_idx):
+        key = (self.key, *tile_idx)
+        tile = weather_cache.get(key)
+        if tile is None:
+            start = np.array(tile_idx) * self.tile_shape
+            window = tuple(slice(a, a + n) for a, n in zip(start, self.tile_shape))
+            tile = np.asarray(self.da[window].values)
+            weather_cache.put(key, tile)
+        return tile
+
+    def _gather(self, idx_time, idx_lat, idx_lon):
+        idx = np.stack([idx_time, idx_lat, idx_lon])
+        tiles = idx // self.tile_shape[:, None]
+        offsets = idx - tiles * self.tile_shape[:, None]
+        result = np.empty(idx.shape[1], dtype=self.dtype)
+        unique, inverse = np.unique(tiles, axis=1, return_inverse=True)
+        inverse = inverse.ravel()
+        for i, tile_idx in enumerate(unique.T):
+            mask = inverse == i
+            result[mask] = self._tile(tuple(tile_idx))[tuple(offsets[:, mask])]
+        return result
+
+
+class ConcatGridSampler:
+    def __init__(self, samplers):
+        """
+        Sample a gridded variable stored as consecutive chunks along the
+        time axis, e.g. one memory-mapped array per month, without copying
+        the chunks into one array.
+
+        Nearest time indices are resolved over the combined time axis, so
+        positions between the last time of one chunk and the first time of
+        the next are matched to the nearer of the two.
+
+        Args:
+            samplers (list): GridSampler objects with the same latitude and
+                longitude axes, in order of time.
+        """
+        assert len(samplers) > 0
+        self.samplers = samplers
+        self.time = np.concatenate([s.time for s in samplers])
+        self.offsets = np.cumsum([0] + [len(s.time) for s in samplers])
+        self.latitude = samplers[0].latitude
+        self.longitude = samplers[0].longitude
+        assert all(
+            np.array_equal(s.latitude, self.latitude)
+            and np.array_equal(s.longitude, self.longitude)
+            for s in samplers
+        ), "all chunks must share the same latitude and longitude axes"
+
+    def sample(self, lon, lat, time):
+        """
+        Gather the grid values nearest to each position.
+
+        Args:
+            lon (np.ndarray): Longitudes.
+            lat (np.ndarray): Latitudes.
+            time (np.ndarray): Timestamps in seconds since epoch.
+
+        Returns:
+            np.ndarray: Sampled values, one per position.
+        """
+        first = self.samplers[0]
+        idx_lat, idx_lon = first._spatial_indices(lon, lat)
+        idx_time = _nearest_index(self.time, time)
+        chunk = np.searchsorted(self.offsets, idx_time, side="right") - 1
+
+        result = np.empty(idx_time.shape, dtype=first.dtype)
+        for c in np.unique(chunk):
+            mask = chunk == c
+            result[mask] = self.samplers[c]._gather(
+                idx_time[mask] - self.offsets[c], idx_lat[mask], idx_lon[mask]
+            )
+        return result
@@ -1,20 +1,35 @@
 import asyncio
+import concurrent.futures
 import http.server
 import logging
 import multiprocessing
 import os
 import socketserver
+import struct
+import threading
 import webbrowser
 from datetime import datetime
 from functools import partial
 from tempfile import SpooledTemporaryFile
 
+import numpy as np
 import orjson
 import websockets.server
 
 logging.getLogger("websockets").setLevel(logging.WARNING)
 logging.getLogger("shapely").setLevel(logging.WARNING)
 
+# first byte of binary track frames. JSON messages begin with "{"
+TRACK_FRAME = 0xA1
+
+# default quantisation of binary track frame coordinates, in steps per
+# degree. 1e5 steps per degree is approximately one metre at the equator
+QUANTIZE_SCALE = 100000
+
+# frame type, flags, reserved, mmsi, point count, scale, first timestamp,
+# first longitude, first latitude
+_TRACK_FRAME_HEADER = struct.Struct("<BBHIIIqii")
+
 wwwpath = os.path.abspath(
     os.path.join(os.path.dirname(os.path.dirname(__file__)), "aisdb_web", "dist_map")
 )
@@ -82,18 +97,8 @@ def serialize_zone_json(name, zone) -> bytes:
     return orjson.dumps(zone_dict)
 
 
-def serialize_track_json(track) -> (bytes, bytes):
-    """serializes a single track dictionary to JSON format encoded as UTF8"""
-    vector = {
-        "msgtype": "track_vector",
-        # currently, database_server sends all metadata as strings
-        # reproduce this behaviour by coercion to string type, even for int
-        "meta": {"mmsi": str(track["mmsi"])},
-        "t": track["time"],
-        "x": track["lon"],
-        "y": track["lat"],
-    }
-
+def _serialize_track_meta(track, metadata=None) -> bytes:
+    """serializes the vesselinfo message of a single track dictionary"""
     meta = {k: track[k] for k in track["static"] if k != "marinetraffic_info"}
 
     if "color" in track.keys():
@@ -101,7 +106,11 @@ def serialize_track_json(track) -> (bytes, bytes):
 
     meta["msgtype"] = "vesselinfo"
 
-    if "marinetraffic_info" in track.keys():
+    if "marinetraffic_info" not in track.keys() and metadata is not None:
+        idx = metadata.lookup(track["mmsi"])
+        if idx >= 0:
+            meta.update(metadata.info(idx))
+    elif "marinetraffic_info" in track.keys():
         meta.update(
             {
                 k: track["marinetraffic_info"][k]
@@ -109,13 +118,152 @@ def serialize_track_json(track) -> (bytes, bytes):
             }
         )
 
+    return orjson.dumps(meta)
+
+
+def serialize_track_json(track, metadata=None) -> (bytes, bytes):
+    """serializes a single track dictionary to JSON format encoded as UTF8.
+
+    if a :class:`aisdb.webdata.marinetraffic.VesselMetadata` table is
+    given, vessel metadata is looked up for tracks without
+    'marinetraffic_info'
+    """
+    vector = {
+        "msgtype": "track_vector",
+        # currently, database_server sends all metadata as strings
+        # reproduce this behaviour by coercion to string type, even for int
+        "meta": {"mmsi": str(track["mmsi"])},
+        "t": track["time"],
+        "x": track["lon"],
+        "y": track["lat"],
+    }
+
     vector_json = orjson.dumps(vector, option=orjson.OPT_SERIALIZE_NUMPY)
-    meta_json = orjson.dumps(meta)
+    meta_json = _serialize_track_meta(track, metadata)
     return (vector_json, meta_json)
 
 
-async def _send_tracks(websocket, tmp_vectors, tmp_meta, domain=None):
-    """send tracks serialized as JSON to the connected websocket client"""
+def serialize_track_binary(track, scale: int = QUANTIZE_SCALE) -> bytes:
+    """serializes the coordinates of a single track dictionary to a
+    compact binary frame, decoded by the web client.
+
+    coordinates are quantised to ``scale`` steps per degree, and
+    timestamps to whole seconds. the first position is stored in full,
+    followed by the differences between consecutive positions.
+
+    frame layout, little-endian:
+
+    ======  ====  ==========================================
+    offset  type  value
+    ======  ====  ==========================================
+    0       u8    frame type, TRACK_FRAME
+    1       u8    flags: bits 0, 1, 2 are set if the x, y, t
+                  differences are i32, otherwise they are i16
+    2       u16   reserved
+    4       u32   MMSI
+    8       u32   number of positions n
+    12      u32   scale
+    16      i64   first timestamp
+    24      i32   first quantised longitude
+    28      i32   first quantised latitude
+    32            n - 1 x differences, then n - 1 y
+                  differences, then n - 1 t differences
+    ======  ====  ==========================================
+    """
+    x = np.round(np.asarray(track["lon"], dtype=np.float64) * scale).astype(np.int64)
+    y = np.round(np.asarray(track["lat"], dtype=np.float64) * scale).astype(np.int64)
+    t = np.round(np.asarray(track["time"], dtype=np.float64)).astype(np.int64)
+
+    flags = 0
+    deltas = []
+    for bit, values in enumerate((x, y, t)):
+        delta = np.diff(values)
+        if delta.size > 0 and np.abs(delta).max() > np.iinfo(np.int16).max:
+            flags |= 1 << bit
+            deltas.append(delta.astype("<i4").tobytes())
+        else:
+            deltas.append(delta.astype("<i2").tobytes())
+
+    first = (t[0], x[0], y[0]) if t.size > 0 else (0, 0, 0)
+    header = _TRACK_FRAME_HEADER.pack(
+        TRACK_FRAME, flags, 0, int(track["mmsi"]), t.size, scale, *first
+    )
+    return b"".join([header, *deltas])
+
+
+class _TrackStream:
+    """serializes tracks as they are produced by the track generator.
+
+    tracks are streamed once, to the first client requesting them.
+    vesselinfo messages are kept, so that they can also be sent to the
+    metadata socket, which may connect before the tracks are streamed
+    """
+
+    def __init__(self, tracks, metadata=None, scale=QUANTIZE_SCALE, maxsize=16):
+        self.tracks = tracks
+        self.metadata = metadata
+        self.scale = scale
+        self.queue = asyncio.Queue(maxsize)
+        self.meta = []
+        self.done = False
+        self.updated = asyncio.Event()
+
+    def produce(self, loop):
+        """pull tracks from the generator and serialize them on the calling
+        thread, passing each frame to the event loop running the websocket
+        server in another thread.
+
+        track generators may only be usable from the thread that created
+        their database connection, so they are never iterated on the
+        event loop thread. blocks while the queue of unsent frames is full,
+        pausing the generator while the client is not keeping up
+        """
+
+        def put(frame):
+            asyncio.run_coroutine_threadsafe(self.queue.put(frame), loop).result()
+
+        try:
+            for track in self.tracks:
+                put(
+                    (
+                        _serialize_track_meta(track, self.metadata),
+                        serialize_track_binary(track, self.scale),
+                    )
+                )
+        finally:
+            put(None)
+
+    async def frames(self):
+        while (frame := await self.queue.get()) is not None:
+            meta, data = frame
+            self.meta.append(meta)
+            self.updated.set()
+            yield data
+        self.done = True
+        self.updated.set()
+
+    async def meta_messages(self):
+        i = 0
+        while True:
+            while i < len(self.meta):
+                yield self.meta[i]
+                i += 1
+            if self.done:
+                return
+            self.updated.clear()
+            await self.updated.wait()
+
+
+async def _send_tracks(
+    websocket, tmp_vectors=None, tmp_meta=None, domain=None, stream=None
+):
+    """send tracks serialized as JSON to the connected websocket client.
+
+    if a _TrackStream is given, tracks are instead sent as binary frames
+    while they are produced by the track generator. each frame is sent
+    once the previous one has been written to the socket, so that the
+    track generator is paused while the client is not keeping up
+    """
     done = {}
     async for message_json in websocket:
         message = orjson.loads(message_json)
@@ -145,15 +293,33 @@ async def _send_tracks(websocket, tmp_vectors, tmp_meta, domain=None):
                     zone_json = serialize_zone_json(name, zone)
                     await websocket.send(zone_json)
 
-            tmp_vectors.seek(0)
-            for vector_json in tmp_vectors:
-                await websocket.send(vector_json)
+            if stream is not None:
+                async for frame in stream.frames():
+                    await websocket.send(frame)
+            else:
+                tmp_vectors.seek(0)
+                for vector_json in tmp_vectors:
+                    await websocket.send(vector_json)
 
         elif "meta" in done.keys():
             assert len(done.keys()) == 1
-            tmp_meta.seek(0)
-            for meta_json in tmp_meta:
-                await websocket.send(meta_json)
+            if stream is not None:
+                async for meta_json in stream.meta_messages():
+                    await websocket.send(meta_json)
+            else:
+                tmp_meta.seek(0)
+                for meta_json in tmp_meta:
+                    await websocket.send(meta_json)
+
+
+def _open_browser(host, http_port, visualearth):
+    print(
+        "Opening a new browser window to display track data. "
+        "Press Ctrl-C to stop the server and close the webpage"
+    )
+    url = client_url(host, http_port, visualearth)
+    if not webbrowser.open_new_tab(url):
+        print(f"Failed to open webbrowser, instead use URL: {url}")
 
 
 async def _start_webserver(
@@ -164,14 +330,34 @@ async def _start_webserver(
     host: str = "localhost",
     http_port: int = 3000,
     ws_port: int = 9924,
+    metadata=None,
+    stream=None,
+    serving=None,
 ):
-    """Display tracks in the web interface. Serves data to the web client"""
+    """Display tracks in the web interface. Serves data to the web client.
+
+    if a _TrackStream is given as stream, its frames are served instead of
+    tracks, and the running event loop is passed to the serving callback
+    once the websocket is open
+    """
+    if stream is not None:
+        if open_browser:
+            _open_browser(host, http_port, visualearth)
+        fcn = partial(_send_tracks, stream=stream, domain=domain)
+        async with websockets.server.serve(fcn, host, ws_port) as server:
+            serving(asyncio.get_running_loop())
+            stop = asyncio.Future()
+            await stop
+            await server
+        return
+
     print("Querying database...", end="\t")
     with (
         SpooledTemporaryFile(max_size=1024 * 1e6, newline=b"\n") as vectors,
         SpooledTemporaryFile(max_size=256 * 1e6, newline=b"\n") as meta,
     ):
-        for vector, info in map(serialize_track_json, tracks):
+        serialize = partial(serialize_track_json, metadata=metadata)
+        for vector, info in map(serialize, tracks):
             vectors.write(vector)
             vectors.write(b"\n")
             meta.write(info)
@@ -180,13 +366,7 @@ async def _start_webserver(
         print("done query")
 
         if open_browser:
-            print(
-                "Opening a new browser window to display track data. "
-                "Press Ctrl-C to stop the server and close the webpage"
-            )
-            url = client_url(host, http_port, visualearth)
-            if not webbrowser.open_new_tab(url):
-                print(f"Failed to open webbrowser, instead use URL: {url}")
+            _open_browser(host, http_port, visualearth)
 
         fcn = partial(_send_tracks, tmp_vectors=vectors, tmp_meta=meta, domain=domain)
         async with websockets.server.serve(fcn, host, ws_port) as server:
@@ -195,6 +375,35 @@ async def _start_webserver(
             await server
 
 
+def _stream_webserver(tracks, domain, metadata, *server_args):
+    """run the websocket server in a background thread, and feed it binary
+    track frames from the calling thread. see _TrackStream.produce()
+    """
+    stream = _TrackStream(tracks, metadata)
+    serving = concurrent.futures.Future()
+
+    def serve():
+        try:
+            asyncio.run(
+                _start_webserver(
+                    None,
+                    domain,
+                    *server_args,
+                    stream=stream,
+                    serving=serving.set_result,
+                )
+            )
+        except BaseException as err:
+            if not serving.done():
+                serving.set_exception(err)
+            raise
+
+    server = threading.Thread(target=serve, daemon=True)
+    server.start()
+    stream.produce(serving.result())
+    server.join()
+
+
 def visualize(
     tracks,
     domain=None,
@@ -203,6 +412,8 @@ def visualize(
     host: str = "localhost",
     http_port: int = 3000,
     ws_port: int = 9924,
+    metadata=None,
+    stream: bool = False,
 ):
     """Display tracks using the web interface.
 
@@ -222,6 +433,21 @@ def visualize(
     the HTTP asset server and the websocket data server. Defaults serve
     HTTP on localhost:3000 and websocket data on localhost:9924.
 
+    If a :class:`aisdb.webdata.marinetraffic.VesselMetadata` table is
+    given as metadata, e.g. from
+    :attr:`aisdb.webdata.marinetraffic.VesselInfo.metadata`, vessel
+    metadata is displayed for tracks without 'marinetraffic_info'.
+
+    If stream is True, tracks are sent to the web client as compact binary
+    frames while they are produced by the tracks generator, instead of
+    being serialized in full before the websocket is opened. Tracks are
+    then displayed as soon as the first results are available, and the
+    generator is paused while the client is not keeping up. In this mode,
+    the tracks are sent to the first connected client only. The websocket
+    server then runs in a background thread, and the tracks generator is
+    consumed on the calling thread, so that tracks can be queried from a
+    database connection opened on this thread.
+
     To customize the color of each vessel track, set the 'color' value to
     a color string or RGB value string:
 
@@ -241,11 +467,30 @@ def visualize(
     )
     proc.start()
     try:
-        asyncio.run(
-            _start_webserver(
-                tracks, domain, visualearth, open_browser, host, http_port, ws_port
+        if stream:
+            _stream_webserver(
+                tracks,
+                domain,
+                metadata,
+                visualearth,
+                open_browser,
+                host,
+                http_port,
+                ws_port,
+            )
+        else:
+            asyncio.run(
+                _start_webserver(
+                    tracks,
+                    domain,
+                    visualearth,
+                    open_browser,
+                    host,
+                    http_port,
+                    ws_port,
+                    metadata,
+                )
             )
-        )
         proc.join()
     except KeyboardInterrupt:
         print("Received KeyboardInterrupt, stopping server...")
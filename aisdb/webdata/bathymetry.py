@@ -38,13 +38,18 @@ def _segment_bounds(raster_keys: np.ndarray) -> np.ndarray:
 
 
 class Gebco:
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, tile_store=False):
         """
         args:
             data_dir (string)
                 folder where rasters should be stored
+            tile_store (bool)
+                if True, convert each raster into a memory-mappable tile
+                store when it is first loaded. see
+                :meth:`aisdb.webdata.load_raster.RasterFile.build_tile_store`
         """
         self.data_dir = data_dir
+        self.tile_store = tile_store
         assert os.path.isdir(data_dir)
 
         # download bathymetry rasters if missing, then index available files
@@ -58,6 +63,20 @@ class Gebco:
             )
         }
 
+        # the rasters tile the globe in a regular grid. index the tiles by
+        # their western and southern edges, so that positions can be
+        # assigned to tiles with a binary search
+        keys = list(self.rasterfiles.keys())
+        west = np.array([self.rasterfiles[k]["w"] for k in keys])
+        south = np.array([self.rasterfiles[k]["s"] for k in keys])
+        self._grid_w = np.unique(west)
+        self._grid_s = np.unique(south)
+        self._grid = np.full((len(self._grid_s), len(self._grid_w)), None, dtype=object)
+        for key, w, s in zip(keys, west, south):
+            self._grid[
+                np.searchsorted(self._grid_s, s), np.searchsorted(self._grid_w, w)
+            ] = key
+
     def __enter__(self):
         return self
 
@@ -111,47 +130,42 @@ class Gebco:
 
     def _load_raster(self, key):
         self.rasterfiles[key]["raster"] = RasterFile(
-            imgpath=os.path.join(self.data_dir, key)
+            imgpath=os.path.join(self.data_dir, key), tile_store=self.tile_store
         )
 
-    def _check_in_bounds(self, track):
-        for lon, lat in zip(track["lon"], track["lat"]):
-            if not (-180 <= lon <= 180) or not (-90 <= lat <= 90):  # pragma: no cover
-                warnings.warn("coordinates out of range!")
-                lon = shiftcoord([lon])[0]
-                lat = shiftcoord([lat], rng=90)[0]
-
-            if os.environ.get("DEBUG"):
-                tracer = False
-            for key, bounds in self.rasterfiles.items():
-                if (
-                    bounds["w"] <= lon <= bounds["e"]
-                    and bounds["s"] <= lat <= bounds["n"]
-                ):
-                    tracer = True
-                    if "raster" not in bounds.keys():
-                        self._load_raster(key)
-                    yield key
-                    break
-            if os.environ.get("DEBUG") and not tracer:
-                print(f"{lon = } {lat = }")
-                assert tracer
-        return
+    def _raster_keys(self, track):
+        """assign each track position to the raster file containing it"""
+        lon = np.array(track["lon"], dtype=float)
+        lat = np.array(track["lat"], dtype=float)
+        out_of_range = (np.abs(lon) > 180) | (np.abs(lat) > 90)
+        if out_of_range.any():  # pragma: no cover
+            warnings.warn("coordinates out of range!")
+            lon[out_of_range] = shiftcoord(lon[out_of_range])
+            lat[out_of_range] = shiftcoord(lat[out_of_range], rng=90)
+
+        col = np.searchsorted(self._grid_w, lon, side="right") - 1
+        row = np.searchsorted(self._grid_s, lat, side="right") - 1
+        if (col < 0).any() or (row < 0).any():
+            raise ValueError("no rasters found for track")
+
+        raster_keys = self._grid[row, col]
+        if any(key is None for key in raster_keys):
+            raise ValueError("no rasters found for track")
+        for key in set(raster_keys):
+            if "raster" not in self.rasterfiles[key].keys():
+                self._load_raster(key)
+        return raster_keys
 
     def _close_all(self):
         for filepath, bounds in self.rasterfiles.items():
             if "raster" in bounds.keys():
-                bounds["raster"].img.close()
+                bounds["raster"].close()
 
     def merge_tracks(self, tracks):
         """append `depth_metres` column to track dictionaries"""
         for track in tracks:
             # mapping of filepaths to the corresponding boundary region
-            raster_keys = np.array(list(self._check_in_bounds(track)), dtype=object)
-
-            # ensure that each vector time slice has a value
-            if len(raster_keys) != len(track["time"]):
-                raise ValueError("no rasters found for track")
+            raster_keys = self._raster_keys(track)
             bathy_segments = _segment_bounds(raster_keys)
             track["depth_metres"] = (
                 reduce(
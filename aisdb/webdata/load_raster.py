@@ -1,12 +1,131 @@
 import os
+import threading
+from collections import OrderedDict
+from functools import partial
 
 import numpy as np
 from PIL import Image
 
 from aisdb.aisdb import binarysearch_vector
+from aisdb.proc_util import _install_store, _read_store_meta
 
 Image.MAX_IMAGE_PIXELS = 650000000  # suppress DecompressionBombError warning
 
+# TIFF tags describing the storage layout of raster pixels
+_BITS_PER_SAMPLE = 258
+_COMPRESSION = 259
+_STRIP_OFFSETS = 273
+_SAMPLES_PER_PIXEL = 277
+_STRIP_BYTE_COUNTS = 279
+_TILE_WIDTH = 322
+_SAMPLE_FORMAT = 339
+
+
+def _first(value):
+    return value[0] if isinstance(value, tuple) else value
+
+
+def _memmap_pixels(img, imgpath):
+    """memory-map the pixel array of an uncompressed single band TIFF image
+    stored as contiguous strips, so that only pages containing sampled
+    pixels are read from disk.
+
+    returns None if the image is compressed, tiled, or otherwise not
+    stored as one contiguous array
+    """
+    tags = img.tag_v2
+    if (
+        _first(tags.get(_COMPRESSION, 1)) != 1
+        or _first(tags.get(_SAMPLES_PER_PIXEL, 1)) != 1
+        or _TILE_WIDTH in tags
+        or _STRIP_OFFSETS not in tags
+    ):
+        return None
+
+    offsets = np.array(tags[_STRIP_OFFSETS], dtype=np.int64)
+    counts = np.array(tags[_STRIP_BYTE_COUNTS], dtype=np.int64)
+    if np.any(offsets[1:] != offsets[:-1] + counts[:-1]):
+        return None
+
+    kind = {1: "u", 2: "i", 3: "f"}.get(_first(tags.get(_SAMPLE_FORMAT, 1)))
+    bits = _first(tags.get(_BITS_PER_SAMPLE, 8))
+    if kind is None or bits % 8 != 0:
+        return None
+    dtype = np.dtype(f"{tags._endian}{kind}{bits // 8}")
+
+    width, height = img.size
+    if counts.sum() != width * height * dtype.itemsize:
+        return None
+    return np.memmap(
+        imgpath, dtype=dtype, mode="r", offset=int(offsets[0]), shape=(height, width)
+    )
+
+
+class RasterCache:
+    """least-recently-used cache of raster tiles, shared by all raster
+    files. tiles are evicted once the total size of cached arrays exceeds
+    the memory budget
+
+    args:
+        maxbytes (int)
+            memory budget for cached tiles, in bytes
+    """
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        with self.lock:
+            if key in self.tiles:
+                self.nbytes -= self.tiles.pop(key).nbytes
+            self.tiles[key] = tile
+            self.nbytes += tile.nbytes
+            while self.nbytes > self.maxbytes and len(self.tiles) > 1:
+                _, evicted = self.tiles.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.tiles.clear()
+            self.nbytes = 0
+
+
+# number of pixel rows in each cached raster tile
+TILE_ROWS = 256
+
+# shared by all RasterFile instances. the memory budget may be adjusted by
+# setting raster_cache.maxbytes
+raster_cache = RasterCache(maxbytes=2 * 1024**3)
+
+
+def _tile_store_path(imgpath):
+    return f"{imgpath}.tiles"
+
+
+def _tile_store_current(imgpath, meta):
+    stat = os.stat(imgpath)
+    return meta["source_size"] == stat.st_size and meta["source_mtime"] == stat.st_mtime
+
+
+def _read_tile_store(imgpath):
+    """returns metadata for the tile store of a raster file, or None if
+    the store is missing or was built from a different version of the file
+    """
+    meta = _read_store_meta(_tile_store_path(imgpath))
+    if meta is None or not _tile_store_current(imgpath, meta):
+        return None
+    return meta
+
 
 class _RasterFile_generic:
     def __enter__(self):
@@ -15,6 +134,12 @@ class _RasterFile_generic:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """close raster files upon exit from context"""
+        self.close()
+
+    def close(self):
+        self.pixels = None
+        self.decoded = None
+        self.store_tiles = {}
         self.img.close()
 
     def merge_tracks(self, tracks, new_track_key: str):
@@ -48,12 +173,120 @@ class RasterFile(_RasterFile_generic):
 
         return lon, lat
 
-    def __init__(self, imgpath):
+    def __init__(self, imgpath, tile_store=False):
+        """
+        args:
+            imgpath (string)
+                path to GeoTIFF raster file
+            tile_store (bool)
+                if True, convert the raster into a tile store on first use.
+                see build_tile_store()
+        """
         self.imgpath = imgpath
         assert not hasattr(self, "img")
         assert os.path.isfile(self.imgpath), f"raster file {self.imgpath} not found!"
         self.img = Image.open(self.imgpath)
-        self.xy = self._get_img_grids(self.img)
+        self.decoded = None
+        self.store = _read_tile_store(self.imgpath)
+        if self.store is None and tile_store:
+            self.build_tile_store()
+
+        if self.store is not None:
+            storepath = _tile_store_path(self.imgpath)
+            self.xy = (
+                np.load(os.path.join(storepath, "lon.npy")),
+                np.load(os.path.join(storepath, "lat.npy")),
+            )
+            self.tile_rows = self.store["tile_rows"]
+            self.pixels = None
+            self.store_tiles = {}
+        else:
+            self.xy = self._get_img_grids(self.img)
+            self.tile_rows = TILE_ROWS
+            self.pixels = _memmap_pixels(self.img, self.imgpath)
+
+    def build_tile_store(self):
+        """convert the raster into a directory of .npy arrays, one per tile
+        of TILE_ROWS pixel rows, alongside the pixel coordinate grids.
+
+        the store is written next to the raster file, and is used by
+        subsequent instances in place of the source image. tiles are then
+        memory-mapped directly from disk without decoding
+        """
+        lon, lat = self._get_img_grids(self.img)
+        pixels = _memmap_pixels(self.img, self.imgpath)
+        if pixels is None:
+            with Image.open(self.imgpath) as img:
+                pixels = np.asarray(img)
+
+        def save(tmppath):
+            for i in range(0, pixels.shape[0], TILE_ROWS):
+                np.save(
+                    os.path.join(tmppath, f"tile_{i // TILE_ROWS}.npy"),
+                    pixels[i : i + TILE_ROWS],
+                )
+            np.save(os.path.join(tmppath, "lon.npy"), lon)
+            np.save(os.path.join(tmppath, "lat.npy"), lat)
+
+        stat = os.stat(self.imgpath)
+        meta = dict(
+            source_size=stat.st_size,
+            source_mtime=stat.st_mtime,
+            shape=list(pixels.shape),
+            dtype=pixels.dtype.str,
+            tile_rows=TILE_ROWS,
+        )
+        _install_store(
+            _tile_store_path(self.imgpath),
+            save,
+            meta,
+            is_current=partial(_tile_store_current, self.imgpath),
+        )
+        # the store installed by this or a concurrent process
+        self.store = _read_tile_store(self.imgpath)
+
+    def _tile_slice(self, pixels, tile_idx):
+        start = tile_idx * self.tile_rows
+        if not 0 <= start < pixels.shape[0]:
+            raise IndexError(
+                f"tile {tile_idx} is outside of raster {self.imgpath} "
+                f"with {pixels.shape[0]} pixel rows"
+            )
+        return pixels[start : start + self.tile_rows]
+
+    def _load_tile(self, tile_idx):
+        """read a tile of pixel rows from the memory-mapped pixel array of
+        an uncompressed raster into the raster cache
+        """
+        tile = np.array(self._tile_slice(self.pixels, tile_idx))
+        raster_cache.put((self.imgpath, tile_idx), tile)
+        return tile
+
+    def _tile(self, tile_idx):
+        if self.store is not None:
+            # tile store arrays are memory-mapped, and bypass the cache
+            if tile_idx not in self.store_tiles:
+                self.store_tiles[tile_idx] = np.load(
+                    os.path.join(
+                        _tile_store_path(self.imgpath), f"tile_{tile_idx}.npy"
+                    ),
+                    mmap_mode="r",
+                )
+            return self.store_tiles[tile_idx]
+
+        if self.pixels is None:
+            # compressed rasters can only be decoded in full. the image is
+            # decoded once and kept until the raster is closed, bypassing
+            # the cache. use tile_store=True to avoid holding it in memory
+            if self.decoded is None:
+                with Image.open(self.imgpath) as img:
+                    self.decoded = np.asarray(img)
+            return self._tile_slice(self.decoded, tile_idx)
+
+        tile = raster_cache.get((self.imgpath, tile_idx))
+        if tile is None:
+            tile = self._load_tile(tile_idx)
+        return tile
 
     def _get_coordinate_values(self, track, rng=None):
         idx_lons = np.array(
@@ -66,14 +299,17 @@ class RasterFile(_RasterFile_generic):
                 self.xy[1], track["lat"][:] if rng is None else track["lat"][rng]
             )
         )
-        return np.array(
-            list(
-                map(
-                    self.img.getpixel,
-                    zip(idx_lons, idx_lats),
-                )
-            )
-        )
+
+        # gather values from each cached tile containing track positions
+        tile_idx, inverse = np.unique(idx_lats // self.tile_rows, return_inverse=True)
+        values = None
+        for n, i in enumerate(tile_idx):
+            tile = self._tile(i)
+            if values is None:
+                values = np.empty(len(idx_lats), dtype=tile.dtype)
+            mask = inverse == n
+            values[mask] = tile[idx_lats[mask] - i * self.tile_rows, idx_lons[mask]]
+        return values if values is not None else np.array([])
 
     def _track_coordinate_values(self, track, *, rng: range = None):
         return self._get_coordinate_values(track, rng=rng)
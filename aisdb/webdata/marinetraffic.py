@@ -12,6 +12,8 @@ import sqlite3
 import numpy as np
 
 from aisdb import sqlpath
+from aisdb.database.dbconn import PostgresDBConn
+from aisdb.proc_util import _install_store, _read_store_meta
 
 _SCRAPING_REMOVED_MSG = (
     "MarineTraffic web scraping was removed from AISdb (GitHub issue #81): "
@@ -23,6 +25,37 @@ _createtable_sqlfile = os.path.join(sqlpath, "createtable_webdata_marinetraffic.
 with open(_createtable_sqlfile, "r") as f:
     _createtable_sql = f.read()
 
+# columns of the webdata_marinetraffic table, in table order.
+# integer columns are stored as float64 with NaN for null values, and
+# text columns as int32 category codes with -1 for null values
+_INT_COLUMNS = ("imo", "gross_tonnage", "summer_dwt", "year_built")
+_TEXT_COLUMNS = (
+    "name",
+    "vesseltype_generic",
+    "vesseltype_detailed",
+    "callsign",
+    "flag",
+    "length_breadth",
+    "home_port",
+)
+_COLUMNS = (
+    "imo",
+    "name",
+    "vesseltype_generic",
+    "vesseltype_detailed",
+    "callsign",
+    "flag",
+    "gross_tonnage",
+    "summer_dwt",
+    "length_breadth",
+    "year_built",
+    "home_port",
+)
+
+# maximum number of bound parameters per query. older SQLite versions
+# are limited to 999
+_CHUNKSIZE = 999
+
 
 def _nullinfo(track):
     return {
@@ -46,42 +79,318 @@ def _nullinfo(track):
     }
 
 
-def _vessel_info_dict(dbconn: sqlite3.Connection) -> dict:
-    if not isinstance(dbconn, sqlite3.Connection):
+def _check_dbconn(dbconn):
+    if not isinstance(dbconn, (sqlite3.Connection, PostgresDBConn)):
         raise ValueError(
             f"Invalid database connection type: {dbconn}. "
-            f"Requires: {sqlite3.Connection}"
+            f"Requires: {sqlite3.Connection} or {PostgresDBConn}"
+        )
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class VesselMetadata:
+    """columnar table of vessel metadata from the webdata_marinetraffic
+    table, indexed by MMSI.
+
+    rows are loaded once into one array per column, sorted by MMSI, so
+    that metadata for many vessels is looked up with a single binary
+    search. vessels marked as not found (error404) are excluded.
+
+    if ``storepath`` is given, the columns are saved there as .npy arrays
+    and memory-mapped by subsequent instances, so that processes reading
+    the same database share one copy of the table. the store is read
+    again when the database has been written since the store was saved.
+    rows of individual vessels can be updated incrementally, see
+    :meth:`refresh`.
+
+    args:
+        dbconn (sqlite3.Connection or :class:`aisdb.database.dbconn.PostgresDBConn`)
+            connection to a database containing the webdata_marinetraffic
+            table
+        storepath (string)
+            optional directory in which to store the columns
+
+    example:
+
+    >>> meta = VesselMetadata(dbconn)
+    >>> idx = meta.lookup(mmsis)
+    >>> dwt = meta.column("summer_dwt", idx)
+    """
+
+    def __init__(self, dbconn, storepath=None):
+        _check_dbconn(dbconn)
+        self.dbconn = dbconn
+        self.storepath = storepath
+        self.mmsi = np.array([], dtype=np.int64)
+        self.columns = {col: np.array([], dtype=np.float64) for col in _INT_COLUMNS}
+        self.columns.update(
+            {col: np.array([], dtype=np.int32) for col in _TEXT_COLUMNS}
         )
-    cur = dbconn.cursor()
-    res = cur.execute(
-        "SELECT * FROM webdata_marinetraffic WHERE error404 != 1"
-    ).fetchall()
-    return {r["mmsi"]: r for r in res}
+        self._set_categories({col: [] for col in _TEXT_COLUMNS})
 
+        stamp = self._stamp()
+        meta = self._read_store() if storepath is not None else None
+        if meta is None or stamp is None or meta["stamp"] != stamp:
+            self.refresh()
+
+    def __len__(self):
+        return len(self.mmsi)
+
+    def _execute(self, sql, args=()):
+        if isinstance(self.dbconn, PostgresDBConn):
+            sql = sql.replace("?", "%s")
+        cur = self.dbconn.cursor()
+        cur.execute(sql, args)
+        # psycopg returns rows as dictionaries, sqlite as tuples or Rows
+        return [
+            tuple(row.values()) if isinstance(row, dict) else tuple(row)
+            for row in cur.fetchall()
+        ]
+
+    def _stamp(self):
+        """a value that changes whenever the database is written, used to
+        detect changes since the store was written.
+
+        for SQLite, this is the size and modification time of the database
+        and write-ahead log files, and the file change counter from the
+        database header. for Postgres, it is a checksum of the table.
+        returns None for in-memory SQLite databases
+        """
+        if isinstance(self.dbconn, PostgresDBConn):
+            ((count, checksum),) = self._execute(
+                "SELECT COUNT(*), md5(string_agg(w::text, ',' ORDER BY w.mmsi)) "
+                "FROM webdata_marinetraffic AS w WHERE error404 != 1"
+            )
+            return [count, checksum]
+
+        dbpath = next(
+            (
+                row[2]
+                for row in self._execute("PRAGMA database_list")
+                if row[1] == "main"
+            ),
+            "",
+        )
+        if dbpath == "":
+            return None
+        stamp = []
+        for path in (dbpath, f"{dbpath}-wal"):
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                stamp += [stat.st_size, stat.st_mtime_ns]
+            else:
+                stamp += [None, None]
+        with open(dbpath, "rb") as f:
+            f.seek(24)
+            stamp.append(int.from_bytes(f.read(4), "big"))
+        return stamp
+
+    def _set_categories(self, categories):
+        self.categories = categories
+        # object arrays of the categories of each text column, with None
+        # appended so that missing values (code -1) map to None
+        self._category_values = {
+            col: np.array([*values, None], dtype=object)
+            for col, values in categories.items()
+        }
+
+    def _read_store(self):
+        """memory-map the columns saved at storepath. returns the store
+        metadata, or None if the store is missing"""
+        meta = _read_store_meta(self.storepath)
+        if meta is None:
+            return None
+        self.mmsi = np.load(os.path.join(self.storepath, "mmsi.npy"), mmap_mode="r")
+        self.columns = {
+            col: np.load(os.path.join(self.storepath, f"{col}.npy"), mmap_mode="r")
+            for col in (*_INT_COLUMNS, *_TEXT_COLUMNS)
+        }
+        self._set_categories(meta["categories"])
+        return meta
+
+    def _write_store(self, stamp):
+        """save the columns to storepath, replacing any existing store"""
+
+        def save(tmppath):
+            np.save(os.path.join(tmppath, "mmsi.npy"), self.mmsi)
+            for col, values in self.columns.items():
+                np.save(os.path.join(tmppath, f"{col}.npy"), values)
+
+        _install_store(
+            self.storepath,
+            save,
+            dict(stamp=stamp, categories=self.categories),
+            is_current=lambda meta: stamp is not None and meta["stamp"] == stamp,
+        )
+        self._read_store()
+
+    def _fetch_rows(self, mmsis):
+        rows = []
+        for i in range(0, len(mmsis), _CHUNKSIZE):
+            chunk = tuple(map(int, mmsis[i : i + _CHUNKSIZE]))
+            # placeholder count is structural SQL, not interpolated values
+            rows += self._execute(
+                f"SELECT mmsi, {', '.join(_COLUMNS)} FROM webdata_marinetraffic "
+                f"WHERE error404 != 1 AND mmsi IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+        return rows
 
-def vessel_info(tracks, dbconn: sqlite3.Connection):
+    def refresh(self, mmsis=None):
+        """bring the table up to date with the database.
+
+        by default, the whole table is read again with a single query. to
+        update only some vessels, e.g. after inserting or changing their
+        metadata in the database, pass their identifiers as ``mmsis``:
+        only their rows are then read, and merged into the table.
+
+        if the table has a storepath, the store is rewritten afterwards.
+
+        args:
+            mmsis (list)
+                optional MMSI identifiers of rows to read again
+        """
+        stamp = self._stamp()
+        if mmsis is None:
+            rows = self._execute(
+                f"SELECT mmsi, {', '.join(_COLUMNS)} FROM webdata_marinetraffic "
+                "WHERE error404 != 1"
+            )
+            keep = np.zeros(len(self.mmsi), dtype=bool)
+            categories = {col: [] for col in _TEXT_COLUMNS}
+        else:
+            mmsis = np.unique(np.array(mmsis, dtype=np.int64).flatten())
+            keep = ~np.isin(self.mmsi, mmsis)
+            rows = self._fetch_rows(mmsis)
+            categories = {col: list(self.categories[col]) for col in _TEXT_COLUMNS}
+
+        new = dict(zip(("mmsi", *_COLUMNS), zip(*rows))) if rows else {}
+        new_mmsi = np.array(new.get("mmsi", ()), dtype=np.int64)
+        columns = {}
+        for col in _INT_COLUMNS:
+            values = np.array([_to_float(v) for v in new.get(col, ())])
+            columns[col] = np.concatenate([self.columns[col][keep], values])
+        for col in _TEXT_COLUMNS:
+            codes = {value: i for i, value in enumerate(categories[col])}
+            values = np.empty(len(new_mmsi), dtype=np.int32)
+            for i, value in enumerate(new.get(col, ())):
+                if value is None:
+                    values[i] = -1
+                    continue
+                if value not in codes:
+                    codes[value] = len(categories[col])
+                    categories[col].append(value)
+                values[i] = codes[value]
+            columns[col] = np.concatenate([self.columns[col][keep], values])
+
+        mmsi = np.concatenate([self.mmsi[keep], new_mmsi])
+        order = np.argsort(mmsi, kind="stable")
+        self.mmsi = mmsi[order]
+        self.columns = {col: values[order] for col, values in columns.items()}
+        self._set_categories(categories)
+
+        if self.storepath is not None:
+            self._write_store(stamp)
+
+    def lookup(self, mmsis):
+        """row index of each MMSI in the table, or -1 for vessels without
+        metadata
+
+        args:
+            mmsis (array of int)
+
+        returns:
+            array of int
+        """
+        mmsis = np.asarray(mmsis, dtype=np.int64)
+        if len(self.mmsi) == 0:
+            return np.full(mmsis.shape, -1, dtype=np.intp)
+        idx = np.clip(np.searchsorted(self.mmsi, mmsis), 0, len(self.mmsi) - 1)
+        return np.where(self.mmsi[idx] == mmsis, idx, -1)
+
+    def column(self, col, idx):
+        """values of a column at the row indices returned by
+        :meth:`lookup`. missing values are NaN for integer columns, and
+        None for text columns
+
+        args:
+            col (string)
+                column name, e.g. 'summer_dwt' or 'vesseltype_generic'
+            idx (array of int)
+                row indices
+
+        returns:
+            array of float for integer columns, array of object for
+            text columns
+        """
+        if col in _TEXT_COLUMNS:
+            return self.codes_to_values(col, self.codes(col, idx))
+        idx = np.asarray(idx)
+        if len(self.mmsi) == 0:
+            return np.full(idx.shape, np.nan)
+        found = idx >= 0
+        return np.where(found, self.columns[col][np.where(found, idx, 0)], np.nan)
+
+    def codes(self, col, idx):
+        """category codes of a text column at the given row indices, with
+        -1 for missing values. see :attr:`categories` for the category
+        of each code"""
+        idx = np.asarray(idx)
+        if len(self.mmsi) == 0:
+            return np.full(idx.shape, -1, dtype=np.int32)
+        found = idx >= 0
+        return np.where(found, self.columns[col][np.where(found, idx, 0)], -1)
+
+    def codes_to_values(self, col, codes):
+        """convert category codes of a text column to strings, or None for
+        missing values"""
+        return self._category_values[col][np.asarray(codes)]
+
+    def info(self, idx):
+        """metadata for a single row index returned by :meth:`lookup`, as
+        a dictionary in the format of
+        :func:`aisdb.webdata.marinetraffic.vessel_info`"""
+        idx = int(idx)
+        info = {"mmsi": int(self.mmsi[idx])}
+        for col in _COLUMNS:
+            value = self.columns[col][idx]
+            if col in _INT_COLUMNS:
+                info[col] = None if np.isnan(value) else int(value)
+            else:
+                info[col] = self._category_values[col][value]
+        info["error404"] = 0
+        return info
+
+
+def vessel_info(tracks, dbconn):
     """append vessel metadata from a local marinetraffic database to track
     dictionaries.
 
     args:
         tracks (iter)
             collection of track dictionaries
-        dbconn (sqlite3.Connection)
-            connection to the local traffic database, e.g. the
-            :attr:`aisdb.webdata.marinetraffic.VesselInfo.trafficDB`
-            attribute
+        dbconn (:class:`VesselMetadata`, sqlite3.Connection, or :class:`aisdb.database.dbconn.PostgresDBConn`)
+            vessel metadata table, e.g. the
+            :attr:`aisdb.webdata.marinetraffic.VesselInfo.metadata`
+            attribute. if a database connection is given instead, the
+            table is loaded from it first
     """
-    if not isinstance(dbconn, sqlite3.Connection):
-        raise ValueError(
-            f"Invalid database connection type: {dbconn}. "
-            f"Requires: {sqlite3.Connection}"
-        )
-    meta = _vessel_info_dict(dbconn)
+    if isinstance(dbconn, VesselMetadata):
+        meta = dbconn
+    else:
+        meta = VesselMetadata(dbconn)
     for track in tracks:
         assert isinstance(track, dict)
         track["static"] = set(track["static"]).union({"marinetraffic_info"})
-        if track["mmsi"] in meta.keys():
-            track["marinetraffic_info"] = meta[track["mmsi"]]
+        idx = meta.lookup(track["mmsi"])
+        if idx >= 0:
+            track["marinetraffic_info"] = meta.info(idx)
         else:
             track["marinetraffic_info"] = _nullinfo(track)
         yield track
@@ -92,7 +401,8 @@ class VesselInfo:
 
     opens (creating it first if missing) the local traffic database at
     ``trafficDBpath``. the open connection is available as the
-    ``trafficDB`` attribute. use as a context manager, or call
+    ``trafficDB`` attribute, and a :class:`VesselMetadata` table as the
+    ``metadata`` attribute. use as a context manager, or call
     :meth:`close`, to release the connection.
 
     args:
@@ -106,13 +416,28 @@ class VesselInfo:
             if verbose:
                 print(f"creating directory: {wd}")
             os.makedirs(wd)
+        self.trafficDBpath = trafficDBpath
         self.trafficDB = sqlite3.Connection(trafficDBpath)
         self.trafficDB.row_factory = sqlite3.Row
+        self._metadata = None
 
         # create a new info table if it doesnt exist yet
         with self.trafficDB as conn:
             conn.execute(_createtable_sql)
 
+    @property
+    def metadata(self):
+        """:class:`VesselMetadata` table of the local database, loaded on
+        first use. the table is stored next to the database file at
+        ``trafficDBpath + '.columns'`` and memory-mapped, so that it is
+        shared by all processes reading the same database
+        """
+        if self._metadata is None:
+            self._metadata = VesselMetadata(
+                self.trafficDB, storepath=f"{self.trafficDBpath}.columns"
+            )
+        return self._metadata
+
     def __enter__(self):
         return self
 
@@ -120,6 +445,7 @@ class VesselInfo:
         self.close()
 
     def close(self):
+        self._metadata = None
         self.trafficDB.close()
 
     def vessel_info_callback(self, mmsis, retry_404=False, infotxt=""):
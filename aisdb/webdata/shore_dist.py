@@ -99,11 +99,11 @@ class ShoreDist(RasterFile):
     # This is self-stored data to easy the deployment process
     data_url = "https://github.com/MAPS-Lab/AISdb/releases/download/data-v1/raster-shore.7z"
 
-    def __init__(self, data_dir, tif_filename='distance-from-shore.tif'):
+    def __init__(self, data_dir, tif_filename='distance-from-shore.tif', tile_store=False):
         download_unzip(self.data_url, data_dir, bytesize=39911958)
         img_path = os.path.join(data_dir, tif_filename)
         assert os.path.isfile(img_path)
-        super().__init__(img_path)
+        super().__init__(img_path, tile_store=tile_store)
 
     def get_distance(self, tracks):
         """
@@ -136,11 +136,11 @@ class PortDist(RasterFile):
     # This is self-stored data to ease the deployment process
     data_url = "https://github.com/MAPS-Lab/AISdb/releases/download/data-v1/raster-ports.7z"
 
-    def __init__(self, data_dir, tif_filename='distance-from-port-v20201104.tiff'):
+    def __init__(self, data_dir, tif_filename='distance-from-port-v20201104.tiff', tile_store=False):
         download_unzip(self.data_url, data_dir, bytesize=1263005549)
         img_path = os.path.join(data_dir, tif_filename)
         assert os.path.isfile(img_path)
-        super().__init__(img_path)
+        super().__init__(img_path, tile_store=tile_store)
 
     def get_distance(self, tracks):
         """
@@ -173,11 +173,11 @@ class CoastDist(RasterFile):
     # This is self-stored data to ease the deployment process
     data_url = "https://github.com/MAPS-Lab/AISdb/releases/download/data-v1/raster-coast.7z"
 
-    def __init__(self, data_dir, tif_filename='GMT_intermediate_coast_distance_01d.tif'):
+    def __init__(self, data_dir, tif_filename='GMT_intermediate_coast_distance_01d.tif', tile_store=False):
         download_unzip(self.data_url, data_dir, bytesize=58802115)
         img_path = os.path.join(data_dir, tif_filename)
         assert os.path.isfile(img_path)
-        super().__init__(img_path)
+        super().__init__(img_path, tile_store=tile_store)
 
     def get_distance(self, tracks):
         """
@@ -10,103 +10,223 @@ Moser, Cameron S., et al. "Quantifying the total wetted surface area of the worl
 '''
 
 
-def _wsa(dwt, ship_type, ship_type_detailed='', **_):
-    ''' regression of Denny-Mumford WSA formula using ship type '''
+import numpy as np
+
+# vessel type categories used to choose regression coefficients, see
+# vesseltype_code()
+NONE = 0
+FISHING = 1
+TUG = 2
+PASSENGER = 3
+CONTAINER = 4
+BULK = 5
+CARGO = 6
+TANKER_GAS = 7
+TANKER = 8
+OTHER = 9
+
+# regression coefficient and exponent for each vessel type category
+_COEF = np.array([0, 15.58, 19.36, 14.64, 5.39, 9.57, 14.24, 5.41, 9.56, 26.2])
+_EXP = np.array([1, 0.602, 0.553, 0.671, 0.698, 0.63, 0.596, 0.699, 0.63,
+                 0.551])
+
+
+def vesseltype_code(ship_type, ship_type_detailed=''):
+    ''' vessel type category for a numeric AIS ship type, or for a
+        marinetraffic generic and detailed vessel type '''
+    if ship_type_detailed is None:
+        ship_type_detailed = ''
 
     # None, wing in ground craft, other
-    if (isinstance(ship_type, int)
-        and ship_type < 30) or ship_type == 'Wing In Grnd':
-        return 0
+    if (isinstance(ship_type, (int, np.integer))
+            and ship_type < 30) or ship_type == 'Wing In Grnd':
+        return NONE
 
     # fishing
-    elif (isinstance(ship_type, int)
+    elif (isinstance(ship_type, (int, np.integer))
           and ship_type == 30) or ship_type == 'Fishing':
-        coef = 15.58
-        exp = 0.602
+        return FISHING
 
     # tugs and port tenders
-    elif (isinstance(ship_type, int)
+    elif (isinstance(ship_type, (int, np.integer))
           and 52 <= ship_type <= 53) or ship_type == 'Tug':
-        coef = 19.36
-        exp = 0.553
+        return TUG
 
     # passenger
-    elif (isinstance(ship_type, int)
+    elif (isinstance(ship_type, (int, np.integer))
           and 60 <= ship_type < 70) or ship_type == 'Passenger':
-        coef = 14.64
-        exp = 0.671
+        return PASSENGER
 
     # container ships
     elif 'Container' in ship_type_detailed:
-        coef = 5.39
-        exp = 0.698
+        return CONTAINER
 
     # bulk carriers
     # note: cement classified as bulk carrier
     elif 'Bulk' in ship_type_detailed or 'Cement' in ship_type_detailed:
-        coef = 9.57
-        exp = 0.63
+        return BULK
 
     # NOTE: no distinction for container ships or bulk carriers when using
     # numeric ship type
     # general cargo ship regression is used for these categories
-    elif (isinstance(ship_type, int)
+    elif (isinstance(ship_type, (int, np.integer))
           and 70 <= ship_type < 80) or (isinstance(ship_type, str)
                                         and 'Cargo' in ship_type):  # cargo
-        coef = 14.24
-        exp = 0.596
+        return CARGO
 
     # tankers (LNG / LPG)
-    elif (isinstance(ship_type, int) and ship_type == 84) or (
+    elif (isinstance(ship_type, (int, np.integer)) and ship_type == 84) or (
             (isinstance(ship_type, str) and
              ('Tanker' in ship_type and
               ('Oil' in ship_type_detailed or 'LNG' in ship_type_detailed
                or 'LPG' in ship_type_detailed)))):
-        coef = 5.41
-        exp = 0.699
+        return TANKER_GAS
 
     # tankers (general)
-    elif (isinstance(ship_type, int)
+    elif (isinstance(ship_type, (int, np.integer))
           and 80 <= ship_type < 90) or (isinstance(ship_type, str)
                                         and 'Tanker' in ship_type):
-        coef = 9.56
-        exp = 0.63
+        return TANKER
 
     # SAR, law enforcement, towing, dredging, diving, military, sailing,
     # pleasure craft, etc
     else:
-        coef = 26.2
-        exp = 0.551
+        return OTHER
+
+
+# vessel type category of each numeric AIS ship type
+_SHIP_TYPE_CODES = np.array([vesseltype_code(t) for t in range(100)])
+
+
+def vesseltype_codes(ship_type=None, vesseltype_generic=None,
+                     vesseltype_detailed=None):
+    ''' vessel type categories for arrays of vessels, see vesseltype_code()
+
+        the marinetraffic vessel type is used where vesseltype_generic is
+        not None, and the numeric AIS ship type otherwise. string
+        comparisons are made once for each distinct vessel type
+
+        args:
+            ship_type (array of int)
+                numeric AIS ship types, with 0 where unknown
+            vesseltype_generic (array of object)
+                marinetraffic generic vessel types, or None where unknown
+            vesseltype_detailed (array of object)
+                marinetraffic detailed vessel types, or None where unknown
+
+        returns:
+            array of int vessel type categories
+    '''
+    if ship_type is None:
+        ship_type = np.zeros(len(vesseltype_generic), dtype=int)
+    ship_type = np.asarray(ship_type, dtype=int)
+    codes = np.where(ship_type >= 100, OTHER,
+                     _SHIP_TYPE_CODES[np.clip(ship_type, 0, 99)])
+    if vesseltype_generic is None:
+        return codes
+
+    generic = np.asarray(vesseltype_generic, dtype=object)
+    if vesseltype_detailed is None:
+        vesseltype_detailed = np.full(len(generic), None, dtype=object)
+    detailed = np.asarray(vesseltype_detailed, dtype=object)
+    known = np.array([g is not None for g in generic], dtype=bool)
+    if known.any():
+        pairs = [(g, d) for g, d in zip(generic[known], detailed[known])]
+        unique = {pair: vesseltype_code(*pair) for pair in set(pairs)}
+        codes[known] = [unique[pair] for pair in pairs]
+    return codes
+
+
+def wsa_batch(dwt, vesseltype):
+    ''' regression of Denny-Mumford WSA formula for arrays of vessels
+
+        args:
+            dwt (array of float)
+                summer deadweight tonnage
+            vesseltype (array of int)
+                vessel type categories, see vesseltype_codes()
+
+        returns:
+            array of submerged surface area in square meters
+    '''
+    vesseltype = np.asarray(vesseltype, dtype=int)
+    dwt = np.nan_to_num(np.asarray(dwt, dtype=float))
+    return _COEF[vesseltype] * np.power(dwt, _EXP[vesseltype])
 
-    return coef * pow(base=dwt, exp=exp)
+
+def _wsa(dwt, ship_type, ship_type_detailed='', **_):
+    ''' regression of Denny-Mumford WSA formula using ship type '''
+    code = vesseltype_code(ship_type, ship_type_detailed)
+    return float(_COEF[code] * pow(base=dwt, exp=_EXP[code]))
 
 
-def wetted_surface_area(tracks):
+def wsa_from_metadata(mmsis, metadata, ship_type=None):
+    ''' regression of Denny-Mumford WSA formula for arrays of vessels,
+        using summer deadweight tonnage and vessel types from a vessel
+        metadata table
+
+        args:
+            mmsis (array of int)
+                vessel MMSI identifiers
+            metadata (:class:`aisdb.webdata.marinetraffic.VesselMetadata`)
+                vessel metadata table
+            ship_type (array of int)
+                optional numeric AIS ship types, used for vessels without
+                a marinetraffic vessel type
+
+        returns:
+            array of submerged surface area in square meters
+    '''
+    idx = metadata.lookup(mmsis)
+    vesseltype = vesseltype_codes(
+        ship_type,
+        metadata.column('vesseltype_generic', idx),
+        metadata.column('vesseltype_detailed', idx),
+    )
+    return wsa_batch(metadata.column('summer_dwt', idx), vesseltype)
+
+
+def _track_wsa(track, metadata=None):
+    info = track.get('marinetraffic_info')
+    if info is None and metadata is not None:
+        idx = metadata.lookup(track['mmsi'])
+        info = metadata.info(idx) if idx >= 0 else None
+    dwt = (info['summer_dwt'] if info is not None else None) or 0
+    if info is not None and info['vesseltype_generic'] is not None:
+        return _wsa(dwt, info['vesseltype_generic'],
+                    info['vesseltype_detailed'])
+    if 'ship_type' not in track.keys():
+        raise KeyError(
+            "'ship_type' not in track: try using "
+            "aisdb.database.sqlfcn.crawl_dynamic_static as 'fcn' arg "
+            "for DBQuery.gen_qry()")
+    return _wsa(dwt, track['ship_type'] or 0)
+
+
+def wetted_surface_area(tracks, metadata=None):
     ''' regression of Denny-Mumford WSA formula using ship type
 
+        the surface area is computed once for each MMSI, and reused for
+        subsequent tracks of the same vessel, e.g. the segments yielded by
+        :func:`aisdb.track_gen.split_timedelta`
+
         args:
             tracks (:func:`aisdb.webdata.marinetraffic.vessel_info`)
                 track generator with vessel_info appended
+            metadata (:class:`aisdb.webdata.marinetraffic.VesselMetadata`)
+                optional vessel metadata table, used for tracks without
+                vessel_info appended
 
         yields:
             track dicts with submerged surface area in square meters appended
             to key 'submerged_hull_m^2'
     '''
+    hulls = {}
     for track in tracks:
-        dwt = track['marinetraffic_info']['summer_dwt'] or 0
-        if 'marinetraffic_info' in track.keys(
-        ) and track['marinetraffic_info']['vesseltype_generic'] is not None:
-            hull = _wsa(dwt, track['marinetraffic_info']['vesseltype_generic'],
-                        track['marinetraffic_info']['vesseltype_detailed'])
-        else:
-            if 'ship_type' not in track.keys():
-                raise KeyError(
-                    "'ship_type' not in track: try using "
-                    "aisdb.database.sqlfcn.crawl_dynamic_static as 'fcn' arg "
-                    "for DBQuery.gen_qry()")
-            hull = _wsa(dwt, track['ship_type'] or 0)
-
-        track['submerged_hull_m^2'] = hull
+        if track['mmsi'] not in hulls:
+            hulls[track['mmsi']] = _track_wsa(track, metadata)
+
+        track['submerged_hull_m^2'] = hulls[track['mmsi']]
         track['static'] = set(track['static']).union(
             set([
                 'submerged_hull_m^2',
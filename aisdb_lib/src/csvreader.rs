@@ -8,6 +8,7 @@ pub use std::{
 
 use chrono::{DateTime, NaiveDateTime, TimeZone, Utc};
 use csv::StringRecord;
+use h3o::Resolution;
 use nmea_parser::ais::{
     AisClass, CargoType, NavigationStatus, ShipType, Station, VesselDynamicData, VesselStaticData,
 };
@@ -112,6 +113,7 @@ pub fn sqlite_decodemsgs_ee_csv(
     filename: std::path::PathBuf,
     source: &str,
     verbose: bool,
+    h3_resolution: Option<Resolution>,
 ) -> Result<(), Box<dyn std::error::Error>> {
     assert_eq!(&filename.extension().expect("getting file ext"), &"csv");
 
@@ -195,7 +197,7 @@ pub fn sqlite_decodemsgs_ee_csv(
         }
 
         if positions.len() >= BATCHSIZE {
-            sqlite_prepare_tx_dynamic(&mut c, source, positions)?;
+            sqlite_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
             positions = vec![];
         };
         if stat_msgs.len() >= BATCHSIZE {
@@ -205,7 +207,7 @@ pub fn sqlite_decodemsgs_ee_csv(
     }
 
     if !positions.is_empty() {
-        sqlite_prepare_tx_dynamic(&mut c, source, positions)?;
+        sqlite_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
     }
     if !stat_msgs.is_empty() {
         sqlite_prepare_tx_static(&mut c, source, stat_msgs)?;
@@ -223,6 +225,7 @@ pub fn postgres_decodemsgs_ee_csv(
     filename: &std::path::PathBuf,
     source: &str,
     verbose: bool,
+    h3_resolution: Option<Resolution>,
 ) -> Result<(), Box<dyn std::error::Error>> {
     assert_eq!(&filename.extension().expect("getting file ext"), &"csv");
 
@@ -306,7 +309,7 @@ pub fn postgres_decodemsgs_ee_csv(
         }
 
         if positions.len() >= BATCHSIZE {
-            postgres_prepare_tx_dynamic(&mut c, source, positions)?;
+            postgres_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
             positions = vec![];
         };
         if stat_msgs.len() >= BATCHSIZE {
@@ -316,7 +319,7 @@ pub fn postgres_decodemsgs_ee_csv(
     }
 
     if !positions.is_empty() {
-        postgres_prepare_tx_dynamic(&mut c, source, positions)?;
+        postgres_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
     }
 
     if !stat_msgs.is_empty() {
@@ -335,6 +338,7 @@ pub fn sqlite_decodemsgs_noaa_csv(
     filename: std::path::PathBuf,
     source: &str,
     verbose: bool,
+    h3_resolution: Option<Resolution>,
 ) -> Result<(), Box<dyn std::error::Error>> {
     assert_eq!(&filename.extension().expect("getting file ext"), &"csv");
 
@@ -449,7 +453,7 @@ pub fn sqlite_decodemsgs_noaa_csv(
         }
 
         if positions.len() >= BATCHSIZE {
-            sqlite_prepare_tx_dynamic(&mut c, source, positions)?;
+            sqlite_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
             positions = vec![];
         };
         if stat_msgs.len() >= BATCHSIZE {
@@ -459,7 +463,7 @@ pub fn sqlite_decodemsgs_noaa_csv(
     }
 
     if !positions.is_empty() {
-        sqlite_prepare_tx_dynamic(&mut c, source, positions)?;
+        sqlite_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
     }
     if !stat_msgs.is_empty() {
         sqlite_prepare_tx_static(&mut c, source, stat_msgs)?;
@@ -477,6 +481,7 @@ pub fn postgres_decodemsgs_noaa_csv(
     filename: &std::path::PathBuf,
     source: &str,
     verbose: bool,
+    h3_resolution: Option<Resolution>,
 ) -> Result<(), Box<dyn std::error::Error>> {
     assert_eq!(&filename.extension().expect("getting file ext"), &"csv");
 
@@ -592,7 +597,7 @@ pub fn postgres_decodemsgs_noaa_csv(
         }
 
         if positions.len() >= BATCHSIZE {
-            postgres_prepare_tx_dynamic(&mut c, source, positions)?;
+            postgres_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
             positions = vec![];
         };
         if stat_msgs.len() >= BATCHSIZE {
@@ -602,7 +607,7 @@ pub fn postgres_decodemsgs_noaa_csv(
     }
 
     if !positions.is_empty() {
-        postgres_prepare_tx_dynamic(&mut c, source, positions)?;
+        postgres_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
     }
 
     if !stat_msgs.is_empty() {
@@ -2,6 +2,7 @@ use crate::decode::VesselData;
 use crate::util::epoch_2_dt;
 
 use chrono::{DateTime, Utc};
+use h3o::{LatLng, Resolution};
 use include_dir::{include_dir, Dir};
 
 #[cfg(feature = "postgres")]
@@ -74,6 +75,44 @@ pub fn sqlite_createtable_dynamicreport(
         .unwrap_or_else(|e| panic!("creating dynamic table\n{}\n{}", sql, e)))
 }
 
+/// H3 cell index of a position as a signed 64-bit integer, for storage in
+/// an INTEGER or BIGINT column. Missing and out of range coordinates,
+/// including the AIS "not available" values (longitude 181, latitude 91),
+/// are stored as NULL
+pub fn h3_cell(
+    longitude: Option<f64>,
+    latitude: Option<f64>,
+    resolution: Resolution,
+) -> Option<i64> {
+    let (lon, lat) = (longitude?, latitude?);
+    if lon.abs() > 180.0 || lat.abs() > 90.0 {
+        return None;
+    }
+    LatLng::new(lat, lon)
+        .ok()
+        .map(|ll| u64::from(ll.to_cell(resolution)) as i64)
+}
+
+#[cfg(feature = "sqlite")]
+/// add the H3 cell column to a position reports table if it is missing
+pub fn sqlite_add_h3_column(tx: &SqliteTransaction, mstr: &str) -> SqliteResult<()> {
+    let exists: bool = tx.query_row(
+        &format!(
+            "SELECT COUNT(*) > 0 FROM pragma_table_info('ais_{}_dynamic') WHERE name = 'h3'",
+            mstr
+        ),
+        [],
+        |row| row.get(0),
+    )?;
+    if !exists {
+        tx.execute(
+            &format!("ALTER TABLE ais_{}_dynamic ADD COLUMN h3 INTEGER", mstr),
+            [],
+        )?;
+    }
+    Ok(())
+}
+
 #[cfg(feature = "sqlite")]
 /// create SQLite table for monthly static vessel reports
 pub fn sqlite_createtable_staticreport(
@@ -186,8 +225,13 @@ pub fn sqlite_insert_dynamic(
     msgs: Vec<VesselData>,
     mstr: &str,
     source: &str,
+    h3_resolution: Option<Resolution>,
 ) -> SqliteResult<()> {
-    let sql = sql_from_file("insert_dynamic_clusteredidx.sql").replace("{}", mstr);
+    let sql = match h3_resolution {
+        Some(_) => sql_from_file("insert_dynamic_h3_clusteredidx.sql"),
+        None => sql_from_file("insert_dynamic_clusteredidx.sql"),
+    }
+    .replace("{}", mstr);
 
     let mut stmt = tx
         .prepare_cached(sql.as_str())
@@ -195,12 +239,16 @@ pub fn sqlite_insert_dynamic(
 
     for msg in msgs {
         let (p, e) = msg.dynamicdata();
-        let _ = stmt
-            .execute(params![
+        let (lon, lat) = (
+            p.longitude.unwrap_or_default(),
+            p.latitude.unwrap_or_default(),
+        );
+        let _ = match h3_resolution {
+            Some(res) => stmt.execute(params![
                 p.mmsi,
                 e,
-                p.longitude.unwrap_or_default(),
-                p.latitude.unwrap_or_default(),
+                lon,
+                lat,
                 p.rot.unwrap_or_default(),
                 p.sog_knots.unwrap_or_default(),
                 p.cog.unwrap_or_default(),
@@ -208,8 +256,23 @@ pub fn sqlite_insert_dynamic(
                 p.special_manoeuvre.unwrap_or_default(),
                 p.timestamp_seconds,
                 source,
-            ])
-            .unwrap_or_else(|e| panic!("executing prepared row\n{}", e));
+                h3_cell(p.longitude, p.latitude, res),
+            ]),
+            None => stmt.execute(params![
+                p.mmsi,
+                e,
+                lon,
+                lat,
+                p.rot.unwrap_or_default(),
+                p.sog_knots.unwrap_or_default(),
+                p.cog.unwrap_or_default(),
+                p.heading_true.unwrap_or_default(),
+                p.special_manoeuvre.unwrap_or_default(),
+                p.timestamp_seconds,
+                source,
+            ]),
+        }
+        .unwrap_or_else(|e| panic!("executing prepared row\n{}", e));
     }
 
     Ok(())
@@ -222,62 +285,106 @@ pub fn postgres_insert_dynamic(
     msgs: Vec<VesselData>,
     mstr: &str,
     source: &str,
+    h3_resolution: Option<Resolution>,
 ) -> Result<(), postgres::Error> {
-    let sql = sql_from_file("insert_dynamic_clusteredidx.sql").replace("{}", mstr);
+    let sql = match h3_resolution {
+        Some(_) => sql_from_file("insert_dynamic_h3_clusteredidx.sql"),
+        None => sql_from_file("insert_dynamic_clusteredidx.sql"),
+    }
+    .replace("{}", mstr);
 
     let stmt = tx.prepare(&sql)?;
 
     for msg in msgs {
         let (p, e) = msg.dynamicdata();
-        let _ = tx.execute(
-            &stmt,
-            &[
-                &(p.mmsi as i32),
-                &e,
-                &(p.longitude.unwrap_or_default() as f32),
-                &(p.latitude.unwrap_or_default() as f32),
-                &(p.rot.unwrap_or_default() as f32),
-                &(p.sog_knots.unwrap_or_default() as f32),
-                &(p.cog.unwrap_or_default() as f32),
-                &(p.heading_true.unwrap_or_default() as f32),
-                &p.special_manoeuvre.unwrap_or_default(),
-                &(p.timestamp_seconds as i32),
-                &source,
-            ],
-        )?;
+        let (lon, lat) = (
+            p.longitude.unwrap_or_default(),
+            p.latitude.unwrap_or_default(),
+        );
+        let mmsi = p.mmsi as i32;
+        let lon32 = lon as f32;
+        let lat32 = lat as f32;
+        let rot = p.rot.unwrap_or_default() as f32;
+        let sog = p.sog_knots.unwrap_or_default() as f32;
+        let cog = p.cog.unwrap_or_default() as f32;
+        let heading = p.heading_true.unwrap_or_default() as f32;
+        let maneuver = p.special_manoeuvre.unwrap_or_default();
+        let utc_second = p.timestamp_seconds as i32;
+        let _ = match h3_resolution {
+            Some(res) => tx.execute(
+                &stmt,
+                &[
+                    &mmsi,
+                    &e,
+                    &lon32,
+                    &lat32,
+                    &rot,
+                    &sog,
+                    &cog,
+                    &heading,
+                    &maneuver,
+                    &utc_second,
+                    &source,
+                    &h3_cell(p.longitude, p.latitude, res),
+                ],
+            ),
+            None => tx.execute(
+                &stmt,
+                &[
+                    &mmsi,
+                    &e,
+                    &lon32,
+                    &lat32,
+                    &rot,
+                    &sog,
+                    &cog,
+                    &heading,
+                    &maneuver,
+                    &utc_second,
+                    &source,
+                ],
+            ),
+        }?;
     }
 
     Ok(())
 }
 
 #[cfg(feature = "sqlite")]
-/// prepare a new transaction, ensure tables are created, and insert dynamic messages
+/// prepare a new transaction, ensure tables are created, and insert dynamic messages.
+/// If `h3_resolution` is given, the H3 cell of each position is stored in column `h3`
 pub fn sqlite_prepare_tx_dynamic(
     c: &mut SqliteConnection,
     source: &str,
     positions: Vec<VesselData>,
+    h3_resolution: Option<Resolution>,
 ) -> SqliteResult<()> {
     let mstr = epoch_2_dt(*positions[positions.len() - 1].epoch.as_ref().unwrap() as i64)
         .format("%Y%m")
         .to_string();
     let t = c.transaction().unwrap();
     sqlite_createtable_dynamicreport(&t, &mstr).expect("creating dynamic table");
-    sqlite_insert_dynamic(&t, positions, &mstr, source).expect("insert dynamic");
+    if h3_resolution.is_some() {
+        sqlite_add_h3_column(&t, &mstr).expect("adding h3 column");
+    }
+    sqlite_insert_dynamic(&t, positions, &mstr, source, h3_resolution).expect("insert dynamic");
     t.commit()
 }
 
 #[cfg(feature = "postgres")]
-/// prepare a new transaction, ensure tables are created, and insert dynamic messages
+/// prepare a new transaction and insert dynamic messages.
+/// If `h3_resolution` is given, the H3 cell of each position is stored in column `h3`
 pub fn postgres_prepare_tx_dynamic(
     c: &mut PGClient,
     source: &str,
     positions: Vec<VesselData>,
+    h3_resolution: Option<Resolution>,
 ) -> Result<(), postgres::Error> {
     let mstr = epoch_2_dt(*positions[positions.len() - 1].epoch.as_ref().unwrap() as i64)
         .format("%Y%m")
         .to_string();
     let mut t = c.transaction()?;
-    postgres_insert_dynamic(&mut t, positions, &mstr, source)?;
+    postgres_insert_dynamic(&mut t, positions, &mstr, source, h3_resolution)?;
     t.commit()
 }
 
@@ -351,4 +458,28 @@ mod tests {
 
         Ok(())
     }
+
+    #[test]
+    fn test_add_h3_column() -> SqliteResult<()> {
+        let mstr = "00test00";
+        let mut conn = get_db_conn(Path::new(":memory:").to_path_buf()).expect("getting db conn");
+
+        let tx = conn.transaction().expect("begin transaction");
+        let _ = sqlite_createtable_dynamicreport(&tx, mstr).expect("creating tables");
+        // adding the column is idempotent
+        sqlite_add_h3_column(&tx, mstr)?;
+        sqlite_add_h3_column(&tx, mstr)?;
+        tx.commit().expect("commit to DB!");
+
+        let cell = h3_cell(Some(-63.5), Some(44.6), Resolution::Seven);
+        assert_eq!(cell, Some(0x872b0c580ffffff));
+        assert_eq!(h3_cell(Some(f64::NAN), Some(44.6), Resolution::Seven), None);
+        assert_eq!(h3_cell(None, Some(44.6), Resolution::Seven), None);
+        assert_eq!(h3_cell(Some(-63.5), None, Resolution::Seven), None);
+        // AIS "not available" values
+        assert_eq!(h3_cell(Some(181.0), Some(44.6), Resolution::Seven), None);
+        assert_eq!(h3_cell(Some(-63.5), Some(91.0), Resolution::Seven), None);
+
+        Ok(())
+    }
 }
@@ -6,6 +6,7 @@ pub use std::{
     time::{Duration, Instant},
 };
 
+use h3o::Resolution;
 use nmea_parser::{
     ais::{VesselDynamicData, VesselStaticData},
     NmeaParser, ParsedMessage,
@@ -266,6 +267,7 @@ pub fn sqlite_decode_insert_msgs(
     source: &str,
     mut parser: NmeaParser,
     verbose: bool,
+    h3_resolution: Option<Resolution>,
 ) -> Result<NmeaParser, Box<dyn std::error::Error>> {
     validate_file_ext(filename.clone())?;
     let mut c = get_db_conn(dbpath)?;
@@ -301,7 +303,7 @@ pub fn sqlite_decode_insert_msgs(
         }
 
         if positions.len() >= BATCHSIZE {
-            sqlite_prepare_tx_dynamic(&mut c, source, positions)?;
+            sqlite_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
             positions = vec![];
         };
         if stat_msgs.len() >= BATCHSIZE {
@@ -311,7 +313,7 @@ pub fn sqlite_decode_insert_msgs(
     }
 
     if !positions.is_empty() {
-        sqlite_prepare_tx_dynamic(&mut c, source, positions)?;
+        sqlite_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
     }
     if !stat_msgs.is_empty() {
         sqlite_prepare_tx_static(&mut c, source, stat_msgs)?;
@@ -332,6 +334,7 @@ pub fn postgres_decode_insert_msgs(
     source: &str,
     mut parser: NmeaParser,
     verbose: bool,
+    h3_resolution: Option<Resolution>,
 ) -> Result<NmeaParser, Box<dyn std::error::Error>> {
     validate_file_ext(filename.clone())?;
     let mut c = get_postgresdb_conn(connect_str)?;
@@ -368,7 +371,7 @@ pub fn postgres_decode_insert_msgs(
         }
 
         if positions.len() >= BATCHSIZE {
-            postgres_prepare_tx_dynamic(&mut c, source, positions)?;
+            postgres_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
             positions = vec![];
         };
         if stat_msgs.len() >= BATCHSIZE {
@@ -378,7 +381,7 @@ pub fn postgres_decode_insert_msgs(
     }
 
     if !positions.is_empty() {
-        postgres_prepare_tx_dynamic(&mut c, source, positions)?;
+        postgres_prepare_tx_dynamic(&mut c, source, positions, h3_resolution)?;
     }
     if !stat_msgs.is_empty() {
         postgres_prepare_tx_static(&mut c, source, stat_msgs)?;
@@ -22,7 +22,7 @@ import {
 } from './constants.js';
 
 
-import init, { process_response } from './pkg/client.js?init';
+import init, { decode_track_frame, process_response } from './pkg/client.js?init';
 
 
 window.statusmsg = null;
@@ -139,6 +139,10 @@ function convert_js_utf8(object) {
 }
 
 const utf8decode = new TextDecoder();
+
+/**@constant {number} TRACK_FRAME first byte of binary track frames. JSON
+ * messages begin with '{' */
+const TRACK_FRAME = 0xA1;
 /**Convert UTF8 integer array to Object. Used for receiving values from
  * WebAssembly scripts
  * @param {Array} array UTF8 integer Array
@@ -166,14 +170,22 @@ function handle_zone(response) {
    */
 async function handle_server_response(event) {
   let response = null;
-  let txt = null;
+  let data = null;
   try {
-    txt = await event.data.text();
+    data = new Uint8Array(await event.data.arrayBuffer());
   } catch (e) {
     console.error('could not get event data!\n', e);
     return;
   }
-  response = JSON.parse(txt);
+
+  // binary track frames streamed by python visualize(stream=True)
+  if (data[0] === TRACK_FRAME) {
+    const track = decode_track_frame(data);
+    newTrackFeature(convert_utf8_js(track.rawdata), track.mmsi);
+    return;
+  }
+
+  response = JSON.parse(utf8decode.decode(data));
 
 
   if (!('msgtype' in response)) {
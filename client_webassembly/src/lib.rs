@@ -63,6 +63,20 @@ pub struct GeometryVector {
     pub meta: HashMap<String, String>,
 }
 
+/// first byte of binary track frames, see aisdb.web_interface.serialize_track_binary
+const TRACK_FRAME: u8 = 0xA1;
+
+/// size of the binary track frame header in bytes
+const TRACK_FRAME_HEADER: usize = 32;
+
+/// decoded binary track frame
+#[derive(Serialize)]
+struct DecodedTrack {
+    pub mmsi: String,
+    pub t: Vec<f64>,
+    pub rawdata: Vec<u8>,
+}
+
 #[wasm_bindgen]
 extern "C" {
     #[wasm_bindgen(js_namespace = console)]
@@ -108,3 +122,67 @@ pub fn process_response(txt: JsValue) -> JsValue {
 
     serde_wasm_bindgen::to_value(&payload.rawdata).unwrap()
 }
+
+fn read_u32(frame: &[u8], offset: usize) -> u32 {
+    u32::from_le_bytes(frame[offset..offset + 4].try_into().unwrap())
+}
+
+fn read_i32(frame: &[u8], offset: usize) -> i32 {
+    i32::from_le_bytes(frame[offset..offset + 4].try_into().unwrap())
+}
+
+/// read n - 1 differences as i16 or i32 from the frame, and accumulate
+/// them starting from the first value
+fn read_deltas(frame: &[u8], offset: &mut usize, first: i64, n: usize, wide: bool) -> Vec<i64> {
+    let mut values = Vec::with_capacity(n);
+    if n == 0 {
+        return values;
+    }
+    let mut value = first;
+    values.push(value);
+    for _ in 1..n {
+        if wide {
+            value += read_i32(frame, *offset) as i64;
+            *offset += 4;
+        } else {
+            value += i16::from_le_bytes(frame[*offset..*offset + 2].try_into().unwrap()) as i64;
+            *offset += 2;
+        }
+        values.push(value);
+    }
+    values
+}
+
+/// decode a binary track frame into the MMSI, timestamps, and a GeoJSON
+/// LineString geometry encoded as UTF8, as in process_response()
+#[wasm_bindgen]
+pub fn decode_track_frame(frame: &[u8]) -> JsValue {
+    #[cfg(debug_assertions)]
+    panic::set_hook(Box::new(console_error_panic_hook::hook));
+
+    assert!(frame.len() >= TRACK_FRAME_HEADER && frame[0] == TRACK_FRAME);
+    let flags = frame[1];
+    let mmsi = read_u32(frame, 4);
+    let n = read_u32(frame, 8) as usize;
+    let scale = read_u32(frame, 12) as f64;
+    let t0 = i64::from_le_bytes(frame[16..24].try_into().unwrap());
+    let x0 = read_i32(frame, 24) as i64;
+    let y0 = read_i32(frame, 28) as i64;
+
+    let mut offset = TRACK_FRAME_HEADER;
+    let x = read_deltas(frame, &mut offset, x0, n, flags & 1 != 0);
+    let y = read_deltas(frame, &mut offset, y0, n, flags & 2 != 0);
+    let t = read_deltas(frame, &mut offset, t0, n, flags & 4 != 0);
+
+    let coords = zip!(&x, &y)
+        .map(|(xx, yy)| vec![*xx as f64 / scale, *yy as f64 / scale])
+        .collect::<Vec<Vec<f64>>>();
+    let linegeojs = Geometry::new(Value::LineString(coords));
+    let decoded = DecodedTrack {
+        mmsi: mmsi.to_string(),
+        t: t.into_iter().map(|tt| tt as f64).collect(),
+        rawdata: linegeojs.to_string().into_bytes(),
+    };
+
+    serde_wasm_bindgen::to_value(&decoded).unwrap()
+}
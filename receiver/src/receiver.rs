@@ -230,12 +230,12 @@ fn serialize_dynamic_buffer(
 ) {
     println!("Inserting {} dynamic messages ...", dynamic_msgs.len());
     if let Some(ref mut conn) = sqlite_dbconn {
-        if let Err(e) = sqlite_prepare_tx_dynamic(conn, "rx", dynamic_msgs.to_vec()) {
+        if let Err(e) = sqlite_prepare_tx_dynamic(conn, "rx", dynamic_msgs.to_vec(), None) {
             eprintln!("Error inserting vessel dynamic data: {}", e);
         }
     }
     if let Some(ref mut conn) = postgres_dbconn {
-        if let Err(e) = postgres_prepare_tx_dynamic(conn, "rx", dynamic_msgs) {
+        if let Err(e) = postgres_prepare_tx_dynamic(conn, "rx", dynamic_msgs, None) {
             eprintln!("Error inserting vessel dynamic data: {}", e);
         }
     }
@@ -10,6 +10,7 @@ use std::time::Duration;
 use futures::executor::ThreadPool;
 use geo::{point, HaversineDistance, SimplifyVwIdx};
 use geo_types::{Coord, LineString};
+use h3o::{LatLng, Resolution};
 use nmea_parser::NmeaParser;
 use pyo3::exceptions::{PyRuntimeError, PyValueError};
 use pyo3::types::{PyModule, PyModuleMethods};
@@ -72,6 +73,112 @@ fn haversine_impl(x1: f64, y1: f64, x2: f64, y2: f64) -> f64 {
     p1.haversine_distance(&p2)
 }
 
+fn check_equal_lengths(x: &[f64], y: &[f64]) -> PyResult<()> {
+    if x.len() != y.len() {
+        return Err(PyValueError::new_err(format!(
+            "coordinate arrays must have equal length (got {} and {})",
+            x.len(),
+            y.len()
+        )));
+    }
+    Ok(())
+}
+
+fn haversine_consecutive_impl(x: &[f64], y: &[f64]) -> Vec<f64> {
+    if x.len() < 2 {
+        return Vec::new();
+    }
+    zip!(&x[..], &y[..])
+        .zip(zip!(&x[1..], &y[1..]))
+        .map(|((x1, y1), (x2, y2))| haversine_impl(*x1, *y1, *x2, *y2))
+        .collect()
+}
+
+/// great circle distance between consecutive positions of a track.
+/// the GIL is released while distances are computed
+///
+/// args:
+///     x (array of float64)
+///         longitudes
+///     y (array of float64)
+///         latitudes
+///
+/// returns:
+///     distances in metres (array of float64), of length ``len(x) - 1``
+///
+#[pyfunction]
+pub fn haversine_consecutive(x: Vec<f64>, y: Vec<f64>, py: Python) -> PyResult<Vec<f64>> {
+    catch_ffi_panic(|| {
+        check_equal_lengths(&x, &y)?;
+        Ok(py.detach(|| haversine_consecutive_impl(&x, &y)))
+    })
+}
+
+/// great circle distance from each position to a single coordinate pair.
+/// the GIL is released while distances are computed
+///
+/// args:
+///     x (array of float64)
+///         longitudes
+///     y (array of float64)
+///         latitudes
+///     x0 (float64)
+///         longitude of the target point
+///     y0 (float64)
+///         latitude of the target point
+///
+/// returns:
+///     distances in metres (array of float64), of length ``len(x)``
+///
+#[pyfunction]
+pub fn haversine_to_point(
+    x: Vec<f64>,
+    y: Vec<f64>,
+    x0: f64,
+    y0: f64,
+    py: Python,
+) -> PyResult<Vec<f64>> {
+    catch_ffi_panic(|| {
+        check_equal_lengths(&x, &y)?;
+        Ok(py.detach(|| {
+            zip!(&x, &y)
+                .map(|(xx, yy)| haversine_impl(*xx, *yy, x0, y0))
+                .collect()
+        }))
+    })
+}
+
+/// speed over ground in knots between consecutive positions of a track,
+/// computed as great circle distance divided by elapsed time. elapsed time
+/// is clamped to a minimum of one second.
+/// the GIL is released while speeds are computed
+///
+/// args:
+///     x (array of float64)
+///         longitudes
+///     y (array of float64)
+///         latitudes
+///     t (array of float64)
+///         timestamps in epoch seconds
+///
+/// returns:
+///     speeds in knots (array of float64), of length ``len(x) - 1``
+///
+#[pyfunction]
+pub fn knots_consecutive(x: Vec<f64>, y: Vec<f64>, t: Vec<f64>, py: Python) -> PyResult<Vec<f64>> {
+    catch_ffi_panic(|| {
+        check_equal_lengths(&x, &y)?;
+        check_equal_lengths(&x, &t)?;
+        Ok(py.detach(|| {
+            haversine_consecutive_impl(&x, &y)
+                .into_iter()
+                .zip(t.windows(2))
+                .map(|(dm, dt)| dm / (dt[1] - dt[0]).max(1.0) * 1.9438445)
+                .collect()
+        }))
+    })
+}
+
 /// Parse NMEA-formatted strings, and create databases
 /// from raw AIS transmissions
 ///
@@ -86,12 +193,26 @@ fn haversine_impl(x1: f64, y1: f64, x2: f64, y2: f64) -> f64 {
 ///         data source text. Will be used as a primary key index in database
 ///     verbose (bool)
 ///         enables logging
+///     h3_resolution (Option<int>)
+///         if given, the H3 cell of each position at this resolution will be
+///         stored in the ``h3`` column of the position reports tables
 ///
 /// returns:
 ///     None
 ///
 #[pyfunction]
 #[allow(clippy::too_many_arguments)]
+#[pyo3(signature = (
+    dbpath,
+    psql_conn_string,
+    files,
+    source,
+    verbose,
+    workers,
+    allow_swap,
+    type_preference,
+    h3_resolution=None,
+))]
 pub fn decoder(
     dbpath: PathBuf,
     psql_conn_string: String,
@@ -101,9 +222,14 @@ pub fn decoder(
     workers: u64,
     allow_swap: bool,
     type_preference: String,
+    h3_resolution: Option<u8>,
     py: Python,
 ) -> PyResult<Vec<PathBuf>> {
     catch_ffi_panic(|| {
+        let h3_resolution = h3_resolution
+            .map(Resolution::try_from)
+            .transpose()
+            .map_err(|e| PyValueError::new_err(format!("invalid H3 resolution: {e}")))?;
         decoder_impl(
             dbpath,
             psql_conn_string,
@@ -113,6 +239,7 @@ pub fn decoder(
             workers,
             allow_swap,
             type_preference,
+            h3_resolution,
             py,
         )
     })
@@ -135,6 +262,7 @@ fn decoder_impl(
     workers: u64,
     allow_swap: bool,
     type_preference: String,
+    h3_resolution: Option<Resolution>,
     py: Python,
 ) -> PyResult<Vec<PathBuf>> {
     if files.is_empty() {
@@ -269,6 +397,7 @@ fn decoder_impl(
                                 &source,
                                 parser,
                                 verbose,
+                                h3_resolution,
                             )
                             .map_err(|e| {
                                 PyRuntimeError::new_err(format!("decoding {}: {}", f.display(), e))
@@ -285,6 +414,7 @@ fn decoder_impl(
                                     &source,
                                     parser,
                                     verbose,
+                                    h3_resolution,
                                 ) {
                                     Err(_) => {
                                         sender
@@ -304,9 +434,21 @@ fn decoder_impl(
                 Some("csv") | Some("CSV") => {
                     if !dbpath.as_os_str().is_empty() {
                         if source.to_lowercase().contains("noaa") {
-                            sqlite_decodemsgs_noaa_csv(d.to_path_buf(), f.clone(), &source, verbose)
+                            sqlite_decodemsgs_noaa_csv(
+                                d.to_path_buf(),
+                                f.clone(),
+                                &source,
+                                verbose,
+                                h3_resolution,
+                            )
                         } else {
-                            sqlite_decodemsgs_ee_csv(d.to_path_buf(), f.clone(), &source, verbose)
+                            sqlite_decodemsgs_ee_csv(
+                                d.to_path_buf(),
+                                f.clone(),
+                                &source,
+                                verbose,
+                                h3_resolution,
+                            )
                         }
                         .map_err(|e| {
                             PyRuntimeError::new_err(format!("decoding {}: {}", f.display(), e))
@@ -322,6 +464,7 @@ fn decoder_impl(
                                     &f,
                                     &source,
                                     verbose,
+                                    h3_resolution,
                                 ) {
                                     Err(e) => {
                                         eprintln!("CSV decoder error: {}\n", e);
@@ -347,6 +490,7 @@ fn decoder_impl(
                                     &f,
                                     &source,
                                     verbose,
+                                    h3_resolution,
                                 ) {
                                     Err(e) => {
                                         eprintln!("CSV decoder error: {}\n", e);
@@ -483,19 +627,162 @@ pub fn encoder_score_fcn(
     dist_thresh: f64,
 ) -> PyResult<f64> {
     catch_ffi_panic(|| {
-        // distance in meters, elapsed time in seconds, speed in knots
-        let dm = haversine_impl(x1, y1, x2, y2).max(1.0);
-        let dt = max(t2.saturating_sub(t1), 10) as f64;
-        let ds = (dm / dt) * 1.9438444924406;
-
-        if ds < speed_thresh && dm < dist_thresh * 2.0 {
-            Ok(dist_thresh / ds)
-        } else {
-            Ok(-1.0)
-        }
+        Ok(encoder_score_impl(
+            x1,
+            y1,
+            t1,
+            x2,
+            y2,
+            t2,
+            speed_thresh,
+            dist_thresh,
+        ))
     })
 }
 
+#[allow(clippy::too_many_arguments)]
+fn encoder_score_impl(
+    x1: f64,
+    y1: f64,
+    t1: i32,
+    x2: f64,
+    y2: f64,
+    t2: i32,
+    speed_thresh: f64,
+    dist_thresh: f64,
+) -> f64 {
+    // distance in meters, elapsed time in seconds, speed in knots
+    let dm = haversine_impl(x1, y1, x2, y2).max(1.0);
+    let dt = max(t2.saturating_sub(t1), 10) as f64;
+    let ds = (dm / dt) * 1.9438444924406;
+
+    if ds < speed_thresh && dm < dist_thresh * 2.0 {
+        dist_thresh / ds
+    } else {
+        -1.0
+    }
+}
+
+fn check_time_length(x: &[f64], t: &[i32]) -> PyResult<()> {
+    if x.len() != t.len() {
+        return Err(PyValueError::new_err(format!(
+            "coordinate and time arrays must have equal length (got {} and {})",
+            x.len(),
+            t.len()
+        )));
+    }
+    Ok(())
+}
+
+/// Segment a track where the speed or distance between consecutive
+/// positions exceeds the given thresholds, and join each segment to the
+/// preceding trajectory whose last position gives the highest
+/// encoder_score_fcn score for the segment's first position. If no
+/// trajectory scores at least minscore, the segment begins a new
+/// trajectory. Ties are resolved in favour of the most recently created
+/// trajectory. The GIL is released while labels are computed
+///
+/// args:
+///     x (Vec<f64>)
+///         longitudes
+///     y (Vec<f64>)
+///         latitudes
+///     t (Vec<i32>)
+///         timestamps in epoch seconds
+///     distance_threshold (float)
+///         Maximum distance in meters between consecutive positions of
+///         a segment, also used as the score numerator
+///     speed_threshold (float)
+///         Maximum speed in knots between consecutive positions of
+///         a segment
+///     minscore (float)
+///         Minimum score required to join a segment to a trajectory
+///
+/// returns:
+///     labels (Vec<i32>)
+///         trajectory label for each position, numbered in order of
+///         first appearance
+#[pyfunction]
+pub fn encoder_pathway_labels(
+    x: Vec<f64>,
+    y: Vec<f64>,
+    t: Vec<i32>,
+    distance_threshold: f64,
+    speed_threshold: f64,
+    minscore: f64,
+    py: Python,
+) -> PyResult<Vec<i32>> {
+    catch_ffi_panic(|| {
+        check_equal_lengths(&x, &y)?;
+        check_time_length(&x, &t)?;
+        Ok(py.detach(|| {
+            encoder_pathway_labels_impl(&x, &y, &t, distance_threshold, speed_threshold, minscore)
+        }))
+    })
+}
+
+fn encoder_pathway_labels_impl(
+    x: &[f64],
+    y: &[f64],
+    t: &[i32],
+    distance_threshold: f64,
+    speed_threshold: f64,
+    minscore: f64,
+) -> Vec<i32> {
+    let n = x.len();
+    let mut labels = vec![0; n];
+    if n == 0 {
+        return labels;
+    }
+
+    // segment boundaries, as indexes of the first position in each segment
+    let mut heads = vec![0];
+    for (i, dm) in haversine_consecutive_impl(x, y).into_iter().enumerate() {
+        let knots = dm / (t[i + 1] as f64 - t[i] as f64).max(1.0) * 1.9438445;
+        if knots > speed_threshold || dm > distance_threshold {
+            heads.push(i + 1);
+        }
+    }
+    heads.push(n);
+
+    // index of the last position in each trajectory
+    let mut tails: Vec<usize> = Vec::new();
+    for segment in heads.windows(2) {
+        let (head, end) = (segment[0], segment[1]);
+        let mut best: Option<(usize, f32)> = None;
+        for (label, &tail) in tails.iter().enumerate() {
+            // scores are compared at single precision, matching the
+            // python implementation's tie breaking
+            let score = encoder_score_impl(
+                x[tail],
+                y[tail],
+                t[tail],
+                x[head],
+                y[head],
+                t[head],
+                speed_threshold,
+                distance_threshold,
+            ) as f32;
+            match best {
+                Some((_, highscore)) if score < highscore => {}
+                _ => best = Some((label, score)),
+            }
+        }
+        let label = match best {
+            Some((label, highscore)) if highscore as f64 >= minscore => {
+                tails[label] = end - 1;
+                label
+            }
+            _ => {
+                tails.push(end - 1);
+                tails.len() - 1
+            }
+        };
+        labels[head..end].fill(label as i32);
+    }
+    labels
+}
+
 /// Vectorized implementation of binary search for fast array indexing.
 /// In out-of-bounds or missing value cases, the nearest search index
 /// will be returned
@@ -538,6 +825,38 @@ pub fn binarysearch_vector(mut arr: Vec<f64>, search: Vec<f64>) -> PyResult<Vec<
     })
 }
 
+/// H3 cell index of each position at the given resolution, as 64-bit
+/// integers. Positions with invalid coordinates are assigned the null
+/// index 0. The GIL is released while cells are computed
+///
+/// args:
+///     x (array of float64)
+///         longitudes
+///     y (array of float64)
+///         latitudes
+///     resolution (int)
+///         H3 resolution, from 0 to 15
+///
+/// returns:
+///     cells (array of uint64)
+///
+#[pyfunction]
+pub fn latlng_to_cells(x: Vec<f64>, y: Vec<f64>, resolution: u8, py: Python) -> PyResult<Vec<u64>> {
+    catch_ffi_panic(|| {
+        check_equal_lengths(&x, &y)?;
+        let resolution = Resolution::try_from(resolution)
+            .map_err(|e| PyValueError::new_err(format!("invalid H3 resolution: {e}")))?;
+        Ok(py.detach(|| {
+            zip!(&x, &y)
+                .map(|(lon, lat)| match LatLng::new(*lat, *lon) {
+                    Ok(ll) => u64::from(ll.to_cell(resolution)),
+                    Err(_) => 0,
+                })
+                .collect()
+        }))
+    })
+}
+
 /// Receive raw AIS data from an upstream UDP data source, parse the data into
 /// JSON format, and create a websocket listener to send parsed results downstream.
 /// If dbpath is given, parsed data will be stored in an SQLite database.
@@ -628,7 +947,12 @@ pub fn aisdb(module: &Bound<'_, PyModule>) -> PyResult<()> {
     module.add_function(wrap_pyfunction!(decoder, module)?)?;
     module.add_function(wrap_pyfunction!(binarysearch_vector, module)?)?;
     module.add_function(wrap_pyfunction!(encoder_score_fcn, module)?)?;
+    module.add_function(wrap_pyfunction!(encoder_pathway_labels, module)?)?;
     module.add_function(wrap_pyfunction!(haversine, module)?)?;
+    module.add_function(wrap_pyfunction!(haversine_consecutive, module)?)?;
+    module.add_function(wrap_pyfunction!(haversine_to_point, module)?)?;
+    module.add_function(wrap_pyfunction!(knots_consecutive, module)?)?;
+    module.add_function(wrap_pyfunction!(latlng_to_cells, module)?)?;
     module.add_function(wrap_pyfunction!(receiver, module)?)?;
     module.add_function(wrap_pyfunction!(simplify_linestring_idx, module)?)?;
     Ok(())